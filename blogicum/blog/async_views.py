@@ -0,0 +1,241 @@
+"""
+Async versions of the read-only blog views, routed under ASGI.
+
+Django 3.2 has no async ORM, so the queries of a request are sent to a
+dedicated thread pool (``BLOG_ASYNC_DB_WORKERS`` threads, each with its
+own connection) and the independent ones are awaited together: the page
+of posts with its count and the category or profile, the post with its
+comments. Templates are rendered in the same pool, so the event loop
+never blocks and the single thread Django keeps for sync code is not a
+bottleneck.
+"""
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, update_wrapper
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db import close_old_connections
+from django.db.models import Count
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+
+from core import timing
+
+from .forms import CommentForm
+from .models import Category, Comment, Post
+from .rows import post_rows
+
+User = get_user_model()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BLOG_ASYNC_DB_WORKERS,
+                thread_name_prefix='async-db'
+            )
+        return _executor
+
+
+def _call(func, *args, **kwargs):
+    # Pool threads live across requests; drop connections that are
+    # broken or older than CONN_MAX_AGE, as request_started does.
+    close_old_connections()
+    return func(*args, **kwargs)
+
+
+async def run_query(func, *args, **kwargs):
+    """
+    Run ``func`` in the database thread pool and await its result.
+    """
+    loop = asyncio.get_running_loop()
+    # Run in a copy of the request context so per-request timing
+    # (core.timing) sees the queries.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _get_executor(),
+        partial(context.run, _call, func, *args, **kwargs))
+
+
+class AsyncView:
+    """
+    Minimal class-based view whose ``as_view`` returns a coroutine function.
+
+    Django 3.2 only runs a view natively under ASGI when the callable
+    itself is a coroutine function, which ``View.as_view`` never is.
+    """
+    template_name = None
+
+    def __init__(self, request, **kwargs):
+        self.request = request
+        self.kwargs = kwargs
+
+    @classmethod
+    def as_view(cls):
+        async def view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return HttpResponseNotAllowed(['GET', 'HEAD'])
+            return await cls(request, **kwargs).get()
+
+        view.view_class = cls
+        update_wrapper(view, cls, updated=())
+        return view
+
+    async def render(self, context: dict) -> HttpResponse:
+        context['view'] = self
+        content = await run_query(self._render, context)
+        return HttpResponse(content)
+
+    def _render(self, context: dict) -> str:
+        with timing.measure('tpl'):
+            return render_to_string(
+                self.template_name, context, self.request)
+
+
+class PostsPublicListView(AsyncView):
+    """
+    Paginated list of public posts.
+    """
+    paginate_by = 10
+    context_object_name = 'post_list'
+
+    def get_queryset(self):
+        return Post.public_objects.annotate(comment_count=Count('comments'))
+
+    def get_page_posts(self, posts):
+        """
+        The sliced queryset of a page, as the template gets it.
+        """
+        return posts
+
+    def get_context_queries(self) -> dict:
+        """
+        Context entries loaded alongside the posts, as callables.
+        """
+        return {}
+
+    def get_page_number(self):
+        page = self.kwargs.get('page') or self.request.GET.get('page') or 1
+        if page == 'last':
+            return page
+        try:
+            return int(page)
+        except ValueError:
+            raise Http404('Неверный номер страницы')
+
+    async def get(self):
+        paginator = Paginator(self.get_queryset(), self.paginate_by)
+        number = self.get_page_number()
+        if number == 'last':
+            number = await run_query(lambda: paginator.num_pages)
+        bottom = max(number - 1, 0) * self.paginate_by
+        queries = self.get_context_queries()
+        count, posts, *extra = await asyncio.gather(
+            run_query(lambda: paginator.count),
+            run_query(list, self.get_page_posts(paginator.object_list[
+                bottom:bottom + self.paginate_by])),
+            *(run_query(query) for query in queries.values())
+        )
+        # Seed the cached count so the template does not query it again.
+        paginator.__dict__['count'] = count
+        try:
+            number = paginator.validate_number(number)
+        except InvalidPage as error:
+            raise Http404(f'Неверная страница ({number}): {error}')
+        page = Page(posts, number, paginator)
+        context = {
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': page.has_other_pages(),
+            'object_list': posts,
+            self.context_object_name: posts,
+        }
+        context.update(zip(queries, extra))
+        return await self.render(context)
+
+
+class BlogListView(PostsPublicListView):
+    """
+    Async list of public posts on the blog's index page.
+    """
+    template_name = 'blog/index.html'
+
+    def get_page_posts(self, posts):
+        if settings.BLOG_FEED_ROWS:
+            return post_rows(posts)
+        return posts
+
+
+class ByCategoryListView(PostsPublicListView):
+    """
+    Async list of public posts filtered by category.
+    """
+    template_name = 'blog/category.html'
+
+    def get_queryset(self):
+        return Post.public_objects.all().filter(
+            category__slug=self.kwargs.get('category_slug')
+        ).order_by('-pub_date')
+
+    def get_context_queries(self):
+        return {
+            'category': partial(
+                get_object_or_404,
+                Category.objects.all().filter(is_published=True),
+                slug=self.kwargs.get('category_slug')
+            ),
+        }
+
+
+class ByProfileListView(PostsPublicListView):
+    """
+    Async list of the posts of one author.
+    """
+    template_name = 'blog/profile.html'
+
+    def get_queryset(self):
+        return Post.objects.select_related(
+            'location', 'category', 'author', 'image_meta'
+        ).filter(
+            author__username=self.kwargs.get('username')
+        ).annotate(comment_count=Count('comments')).order_by('-pub_date')
+
+    def get_context_queries(self):
+        return {
+            'profile': partial(
+                get_object_or_404,
+                User.objects.filter(username__exact=self.kwargs.get(
+                    'username'))
+            ),
+        }
+
+
+class PostDetailView(AsyncView):
+    """
+    Async details of a single post, loaded together with its comments.
+    """
+    template_name = 'blog/detail.html'
+
+    async def get(self):
+        pk = self.kwargs['pk']
+        post, comments = await asyncio.gather(
+            run_query(get_object_or_404, Post, pk=pk),
+            run_query(list, Comment.objects.filter(
+                post_id=pk).select_related('author'))
+        )
+        return await self.render({
+            'object': post,
+            'post': post,
+            'form': CommentForm(),
+            'comments': comments,
+        })
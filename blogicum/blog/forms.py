@@ -1,13 +1,67 @@
+import warnings
+
 from django import forms
+from django.conf import settings
+from PIL import Image
 
+from .images import ImageRejected, check_header, image_format
 from .models import Post, Comment
 
 
+class ImageHeaderField(forms.ImageField):
+    """
+    Image field that validates only the image header.
+
+    Format and dimensions are checked before any pixel data is decoded,
+    so oversized images and decompression bombs never reach memory.
+    """
+    default_error_messages = {
+        'too_large': 'Файл больше %(max)s МБ.',
+        'too_many_pixels': 'Изображение слишком большое.',
+    }
+
+    def to_python(self, data):
+        f = forms.FileField.to_python(self, data)
+        if f is None:
+            return None
+        if getattr(f, 'truncated', False):
+            raise forms.ValidationError(
+                self.error_messages['too_large'],
+                code='too_large',
+                params={'max': settings.FILE_UPLOAD_MAX_SIZE // 2 ** 20},
+            )
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+                with Image.open(f) as image:
+                    check_header(image)
+                    f.content_type = Image.MIME.get(image_format(image))
+        except ImageRejected as error:
+            raise forms.ValidationError(str(error), code=error.code)
+        except Image.DecompressionBombError:
+            raise forms.ValidationError(
+                self.error_messages['too_many_pixels'],
+                code='too_many_pixels',
+            )
+        except OSError:
+            raise forms.ValidationError(
+                self.error_messages['invalid_image'],
+                code='invalid_image',
+            )
+        finally:
+            if hasattr(f, 'seek') and callable(f.seek):
+                f.seek(0)
+        return f
+
+
 class PostForm(forms.ModelForm):
 
     class Meta:
         model = Post
         exclude = ('author',)
+        field_classes = {
+            'image': ImageHeaderField
+        }
         widgets = {
             'pub_date': forms.DateInput(attrs={'type': 'date'})
         }
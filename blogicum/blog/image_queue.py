@@ -0,0 +1,136 @@
+"""
+Background processing of post images.
+
+Saving a post only records an ``ImageJob`` and defers a
+``process_image`` task for it in the same transaction; the workers of
+``core.tasks`` generate the renditions. With ``BLOG_IMAGE_INLINE`` the
+job runs in the saving process once the transaction commits instead.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image
+
+from core.tasks import task
+
+from .images import process_post_image, store_image_info
+from .models import ImageJob, Post, PostImage
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+
+
+def schedule(post: Post):
+    """
+    Record the metadata of a new post image and queue its processing.
+    """
+    if not post.image:
+        PostImage.objects.filter(post=post).delete()
+        return None
+    source = post.image.name
+    if PostImage.objects.filter(post=post, source=source).exists():
+        return None
+    try:
+        store_image_info(post)
+    except (OSError, Image.DecompressionBombError) as error:
+        logger.warning('Cannot read image %s: %s', source, error)
+    job = ImageJob.objects.create(post=post, source=source)
+    if settings.BLOG_IMAGE_INLINE:
+        transaction.on_commit(lambda: run_job(job.pk, inline=True))
+    else:
+        process_image.defer(job.pk)
+    return job
+
+
+def _start(job_id: int) -> bool:
+    # A running job is one whose worker died: the task runs it again.
+    return bool(ImageJob.objects.filter(
+        pk=job_id, status__in=(ImageJob.PENDING, ImageJob.RUNNING)
+    ).update(
+        status=ImageJob.RUNNING,
+        started_at=timezone.now(),
+        attempts=F('attempts') + 1
+    ))
+
+
+def _finish(job: ImageJob, status: str, error: str = ''):
+    job.status = status
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=('status', 'error', 'finished_at'))
+
+
+def run_job(job_id: int, inline: bool = False):
+    """
+    Generate the renditions of a job that is not finished yet.
+
+    Unexpected errors are raised for the task to be retried; inline,
+    after the post was committed, they only fail the job.
+    """
+    if not _start(job_id):
+        return
+    job = ImageJob.objects.select_related('post').get(pk=job_id)
+    if job.post.image.name != job.source:
+        # A newer upload replaced this image and has its own job.
+        _finish(job, ImageJob.DONE)
+        return
+    try:
+        process_post_image(job.post)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        # The file itself is broken, retrying will not help.
+        logger.warning('Cannot process image %s: %s', job.source, error)
+        _finish(job, ImageJob.FAILED, str(error))
+        return
+    except Exception as error:
+        if inline:
+            logger.exception('Cannot process image %s', job.source)
+            _finish(job, ImageJob.FAILED, repr(error))
+            return
+        # The task is retried with backoff until it runs out of attempts.
+        if job.attempts >= MAX_ATTEMPTS:
+            _finish(job, ImageJob.FAILED, repr(error))
+        else:
+            ImageJob.objects.filter(pk=job.pk).update(
+                status=ImageJob.PENDING, error=repr(error))
+        raise
+    _finish(job, ImageJob.DONE)
+    logger.info(
+        'Processed image %s in %.2fs after waiting %.2fs',
+        job.source,
+        (job.finished_at - job.started_at).total_seconds(),
+        (job.started_at - job.created_at).total_seconds()
+    )
+
+
+@task(max_attempts=MAX_ATTEMPTS)
+def process_image(job_id: int):
+    run_job(job_id)
+
+
+def queue_stats(sample: int = 100) -> dict:
+    """
+    Queue depth and latency of the most recent finished jobs, in seconds.
+    """
+    depth = {
+        status: ImageJob.objects.filter(status=status).count()
+        for status in (ImageJob.PENDING, ImageJob.RUNNING, ImageJob.FAILED)
+    }
+    finished = ImageJob.objects.filter(
+        status=ImageJob.DONE, started_at__isnull=False
+    ).order_by('-finished_at').values_list(
+        'created_at', 'started_at', 'finished_at'
+    )[:sample]
+    waits, runs = [], []
+    for created_at, started_at, finished_at in finished:
+        waits.append((started_at - created_at).total_seconds())
+        runs.append((finished_at - started_at).total_seconds())
+    return {
+        **depth,
+        'wait': sum(waits) / len(waits) if waits else 0.0,
+        'processing': sum(runs) / len(runs) if runs else 0.0,
+        'processing_max': max(runs, default=0.0),
+    }
@@ -0,0 +1,231 @@
+"""
+Metadata and resized variants (renditions) of post images.
+
+On upload only the image header is read to record its size and format.
+The image is then decoded once, in the background, and downscaled to the
+widths used by the templates. Each width is stored in WebP and in JPEG as
+a fallback, next to the original file, and described in a ``PostImage``
+row together with a dominant colour and a tiny blurred preview, so
+templates can lay out images without touching the files.
+"""
+import base64
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .models import Post, PostImage
+
+# Widths in pixels; a post card is 40rem (640px) wide.
+CARD_WIDTH = 640
+DETAIL_WIDTH = 960
+CARD_2X_WIDTH = 1280
+RENDITION_WIDTHS = (CARD_WIDTH, DETAIL_WIDTH, CARD_2X_WIDTH)
+
+# (extension, Pillow format, save options)
+RENDITION_FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+PREVIEW_WIDTH = 16
+PREVIEW_QUALITY = 40
+
+ORIENTATION_TAG = 0x0112
+# EXIF orientations that swap width and height.
+ROTATED = (5, 6, 7, 8)
+# Pillow reads many phone and camera JPEGs as MPO, a JPEG with extra
+# frames appended.
+FORMAT_ALIASES = {'MPO': 'JPEG'}
+
+
+class ImageRejected(ValueError):
+    """
+    Image whose header is outside the configured limits.
+    """
+
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.code = code
+
+
+def rendition_name(source: str, width: int, extension: str) -> str:
+    """
+    Build the storage name of a rendition stored next to the source image.
+    """
+    stem, _ = os.path.splitext(source)
+    return f'{stem}_{width}w.{extension}'
+
+
+def _target_widths(width: int) -> list:
+    """
+    Widths to generate for an image, never upscaling the original.
+    """
+    return sorted({min(target, width) for target in RENDITION_WIDTHS})
+
+
+def _prepare(image: Image.Image) -> Image.Image:
+    """
+    Apply EXIF orientation and flatten the image to RGB.
+    """
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def _encode(image: Image.Image, pil_format: str, options: dict) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def _oriented_size(image: Image.Image) -> tuple:
+    width, height = image.size
+    if image.getexif().get(ORIENTATION_TAG) in ROTATED:
+        return height, width
+    return width, height
+
+
+def image_format(image: Image.Image) -> str:
+    """
+    Format of the image, with JPEG variants reported as JPEG.
+    """
+    return FORMAT_ALIASES.get(image.format, image.format or '')
+
+
+def check_header(image: Image.Image):
+    """
+    Reject formats and dimensions outside the configured limits.
+
+    Only header fields are used: nothing is decoded, so a decompression
+    bomb is refused before it can allocate memory.
+    """
+    if image_format(image) not in settings.BLOG_IMAGE_FORMATS:
+        raise ImageRejected(
+            f'Формат {image.format} не поддерживается, загрузите '
+            + ', '.join(settings.BLOG_IMAGE_FORMATS) + '.',
+            'unsupported_format'
+        )
+    width, height = image.size
+    max_side = settings.BLOG_IMAGE_MAX_SIDE
+    max_pixels = settings.BLOG_IMAGE_MAX_PIXELS
+    if max(width, height) > max_side or width * height > max_pixels:
+        raise ImageRejected(
+            f'Изображение {width}×{height} слишком большое: не больше '
+            f'{max_side} точек по стороне и {max_pixels // 10 ** 6} '
+            'мегапикселей.',
+            'too_many_pixels'
+        )
+
+
+def read_image_info(image_field) -> dict:
+    """
+    Read size and format from the image header without decoding pixels.
+    """
+    with image_field.open('rb') as fh:
+        with Image.open(fh) as image:
+            width, height = _oriented_size(image)
+            format_name = image_format(image)
+    return {
+        'width': width,
+        'height': height,
+        'format': format_name,
+        'size': image_field.size,
+    }
+
+
+def _dominant_color(image: Image.Image) -> str:
+    quantized = image.quantize(colors=4)
+    _, index = max(quantized.getcolors())
+    red, green, blue = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def _preview(image: Image.Image) -> str:
+    preview = image.copy()
+    preview.thumbnail((PREVIEW_WIDTH, PREVIEW_WIDTH))
+    data = _encode(preview, 'JPEG', {'quality': PREVIEW_QUALITY})
+    return 'data:image/jpeg;base64,' + base64.b64encode(data).decode()
+
+
+def generate_renditions(image_field) -> dict:
+    """
+    Decode the image behind ``image_field`` and store its renditions.
+
+    Returns the rendition descriptions with the dominant colour
+    and the blurred preview computed from the smallest one.
+    """
+    storage = image_field.storage
+    with image_field.open('rb') as fh:
+        with Image.open(fh) as original:
+            check_header(original)
+            width, _ = _oriented_size(original)
+            # Let JPEG decode directly at a reduced scale: draft keeps both
+            # sides at least as large as the widest rendition.
+            largest = min(CARD_2X_WIDTH, width)
+            original.draft('RGB', (largest, largest))
+            image = _prepare(original)
+
+    renditions = []
+    # Downscale from the largest width so each step resizes a smaller image.
+    for target in reversed(_target_widths(image.width)):
+        size = (target, max(1, round(image.height * target / image.width)))
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+        for extension, pil_format, options in RENDITION_FORMATS:
+            name = storage.save(
+                rendition_name(image_field.name, target, extension),
+                ContentFile(_encode(image, pil_format, options))
+            )
+            renditions.append({
+                'name': name,
+                'width': size[0],
+                'height': size[1],
+                'format': extension,
+            })
+    renditions.sort(key=lambda item: (item['format'], item['width']))
+    return {
+        'renditions': renditions,
+        'color': _dominant_color(image),
+        'placeholder': _preview(image),
+    }
+
+
+def store_image_info(post: Post) -> PostImage:
+    """
+    Record the header metadata of a new post image; renditions come later.
+    """
+    meta, _ = PostImage.objects.update_or_create(
+        post=post,
+        defaults={
+            'source': post.image.name,
+            'renditions': [],
+            'color': '',
+            'placeholder': '',
+            **read_image_info(post.image),
+        }
+    )
+    return meta
+
+
+def process_post_image(post: Post) -> PostImage:
+    """
+    Create or refresh the ``PostImage`` of a post from its current image.
+    """
+    meta, _ = PostImage.objects.update_or_create(
+        post=post,
+        defaults={
+            'source': post.image.name,
+            **read_image_info(post.image),
+            **generate_renditions(post.image),
+        }
+    )
+    return meta
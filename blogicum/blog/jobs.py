@@ -0,0 +1,13 @@
+"""
+Periodic maintenance of blog data.
+"""
+from datetime import timedelta
+
+from django.core.management import call_command
+
+from core.scheduler import periodic
+
+
+@periodic(timedelta(days=1))
+def collect_media():
+    call_command('gc_media')
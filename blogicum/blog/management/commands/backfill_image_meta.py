@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image
+
+from blog.image_queue import process_image
+from blog.images import read_image_info
+from blog.models import ImageJob, Post, PostImage
+
+
+class Command(BaseCommand):
+    help = (
+        'Record header metadata for post images uploaded before it was '
+        'stored and queue their renditions. Walks posts in primary key '
+        'chunks, so it can be interrupted and restarted at any time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of posts read and written per transaction.')
+        parser.add_argument(
+            '--no-jobs', action='store_true',
+            help='Only store metadata, do not queue rendition jobs.')
+
+    def handle(self, *args, **options):
+        last_pk = 0
+        stored = skipped = 0
+        while True:
+            posts = list(
+                Post.objects.exclude(image='').filter(pk__gt=last_pk)
+                .select_related('image_meta').order_by('pk')
+                [:options['batch_size']]
+            )
+            if not posts:
+                break
+            last_pk = posts[-1].pk
+            metas = []
+            for post in posts:
+                meta = getattr(post, 'image_meta', None)
+                if meta is not None and meta.source == post.image.name:
+                    continue
+                try:
+                    info = read_image_info(post.image)
+                except (OSError, Image.DecompressionBombError) as error:
+                    self.stderr.write(f'{post.image.name}: {error}')
+                    skipped += 1
+                    continue
+                metas.append(
+                    PostImage(post=post, source=post.image.name, **info))
+            if not metas:
+                continue
+            with transaction.atomic():
+                PostImage.objects.filter(
+                    post__in=[meta.post for meta in metas]).delete()
+                PostImage.objects.bulk_create(metas)
+                if not options['no_jobs']:
+                    # The tasks need the keys, which bulk_create does
+                    # not return on SQLite.
+                    for meta in metas:
+                        process_image.defer(ImageJob.objects.create(
+                            post=meta.post, source=meta.source).pk)
+            stored += len(metas)
+            self.stdout.write(f'Stored metadata for {stored} image(s)...')
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {stored} stored, {skipped} skipped. '
+            'run_workers generates the renditions.'
+        ))
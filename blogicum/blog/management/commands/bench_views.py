@@ -0,0 +1,183 @@
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import (
+    override_settings, setup_databases, teardown_databases)
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import Category, Post
+from core import bench
+
+User = get_user_model()
+
+
+def rows(request):
+    def call():
+        with override_settings(BLOG_FEED_ROWS=True):
+            return request()
+
+    return call
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the blog views on a seeded throwaway database: latency '
+        'percentiles, queries and peak allocations per request, with the '
+        'top allocation sites at -v 2. Results '
+        'go to --output as JSON and can be compared with a --baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=50,
+            help='Measured requests per scenario.')
+        parser.add_argument(
+            '--only', nargs='+', metavar='SCENARIO',
+            help='Run only these scenarios.')
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--output', help='Write the results to this JSON file.')
+        parser.add_argument(
+            '--baseline',
+            help='Compare with the results stored in this JSON file and '
+                 'fail on regressions.')
+        parser.add_argument(
+            '--results',
+            help='Compare this results file with --baseline instead of '
+                 'running the benchmarks.')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.1,
+            help='Relative growth of timings and allocations tolerated '
+                 'by the comparison.')
+        parser.add_argument(
+            '--no-allocations', action='store_true',
+            help='Skip the tracemalloc pass.')
+
+    def handle(self, *args, **options):
+        if options['results']:
+            if not options['baseline']:
+                raise CommandError('--results needs a --baseline.')
+            self.compare(options, bench.read(options['results']))
+            return
+        old_config = setup_databases(
+            verbosity=0, interactive=False, aliases={'default'})
+        try:
+            self.seed(options)
+            data = {
+                'environment': bench.environment(),
+                'dataset': {
+                    name: options[name]
+                    for name in ('posts', 'comments', 'users', 'seed')
+                },
+                'results': self.run(options),
+            }
+        finally:
+            teardown_databases(old_config, verbosity=0)
+        if options['output']:
+            bench.write(options['output'], data)
+        if options['baseline']:
+            self.compare(options, data)
+
+    def seed(self, options):
+        self.stdout.write('Seeding the benchmark database...')
+        call_command(
+            'seed_bench', posts=options['posts'],
+            comments=options['comments'], users=options['users'],
+            seed=options['seed'], today=timezone.localtime().replace(
+                tzinfo=None),
+            stdout=self.stdout if options['verbosity'] > 1 else StringIO())
+
+    def scenarios(self) -> dict:
+        """
+        Requests measured by the benchmark, by name.
+        """
+        author = User.objects.annotate(
+            posts=Count('post')).order_by('-posts').first()
+        category = Category.objects.filter(is_published=True).annotate(
+            posts=Count('post')).order_by('-posts').first()
+        commented = Post.public_objects.annotate(
+            comment_total=Count('comments')
+        ).order_by('-comment_total').first()
+        reader = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        writer = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        writer.force_login(author)
+        post_data = {
+            'title': 'Заголовок', 'text': 'Текст публикации',
+            'pub_date': timezone.localdate().isoformat(),
+            'category': category.pk, 'is_published': 'on',
+        }
+        index = reverse('blog:index')
+        return {
+            'index': lambda: reader.get(index),
+            'index_deep': lambda: reader.get(index, {'page': 'last'}),
+            # The feed rendered from blog.rows instead of Post instances.
+            'index_rows': rows(lambda: reader.get(index)),
+            'index_deep_rows': rows(
+                lambda: reader.get(index, {'page': 'last'})),
+            'category': lambda: reader.get(reverse(
+                'blog:category_posts', args=(category.slug,))),
+            'profile': lambda: reader.get(reverse(
+                'blog:profile', args=(author.username,))),
+            'detail_many_comments': lambda: reader.get(reverse(
+                'blog:post_detail', args=(commented.pk,))),
+            'create_post': lambda: writer.post(
+                reverse('blog:create_post'), post_data),
+            'add_comment': lambda: writer.post(
+                reverse('blog:add_comment', args=(commented.pk,)),
+                {'text': 'Комментарий'}),
+        }
+
+    def run(self, options) -> dict:
+        scenarios = self.scenarios()
+        only = options['only'] or scenarios
+        unknown = set(only) - set(scenarios)
+        if unknown:
+            raise CommandError(
+                f'Unknown scenarios: {", ".join(sorted(unknown))}. '
+                f'Available: {", ".join(scenarios)}.')
+        results = {}
+        for name in only:
+            result = bench.run(
+                scenarios[name], options['iterations'],
+                allocations=not options['no_allocations'])
+            results[name] = result
+            self.stdout.write(
+                f'{name:<22} {result["status"]} '
+                f'p50 {result["p50_ms"]:>8.2f} ms  '
+                f'p90 {result["p90_ms"]:>8.2f} ms  '
+                f'p99 {result["p99_ms"]:>8.2f} ms  '
+                f'{result["queries"]:>3} queries  '
+                + (f'{result["alloc_peak_kib"]:>9.1f} KiB peak'
+                   if 'alloc_peak_kib' in result else ''))
+            if options['verbosity'] > 1:
+                for site in result.get('alloc_sites', ()):
+                    self.stdout.write(
+                        f'{"":<22} {site["size_kib"]:>9.1f} KiB '
+                        f'{site["site"]}'
+                        + (f' from {site["caller"]}'
+                           if site['caller'] else ''))
+        return results
+
+    def compare(self, options, data):
+        baseline = bench.read(options['baseline'])
+        rows, regressions = bench.compare(
+            baseline['results'], data['results'], options['tolerance'])
+        self.stdout.write(
+            f'Compared with {options["baseline"]} '
+            f'({baseline["environment"].get("revision") or "?"}):')
+        for name, metric, old, new, change in rows:
+            self.stdout.write(
+                f'  {name:<22} {metric:<15} {old!s:>10} -> {new!s:>10} '
+                f'{change}')
+        if regressions:
+            raise CommandError(
+                'Regressions:\n  ' + '\n  '.join(regressions))
@@ -0,0 +1,121 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blog.models import Post, PostImage
+from blog.utils import BloomFilter
+from core.models import MediaFile
+
+CHUNK_SIZE = 2000
+RENDITIONS_PER_IMAGE = 6
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete media files no longer referenced by any post image '
+        'or rendition. References are loaded into a set (or a Bloom '
+        'filter) once, then the media directory is streamed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directory', default='blog_images',
+            help='Directory inside MEDIA_ROOT to collect.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report what would be deleted.')
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Keep files modified within this many hours.')
+        parser.add_argument(
+            '--rate', type=float, default=100,
+            help='Maximum deletions per second, 0 for no limit.')
+        parser.add_argument(
+            '--bloom', action='store_true',
+            help='Keep references in a Bloom filter instead of a set.')
+
+    def handle(self, *args, **options):
+        referenced = self.collect_references(options['bloom'])
+        root = os.path.join(settings.MEDIA_ROOT, options['directory'])
+        cutoff = time.time() - options['grace_hours'] * 3600
+        interval = 1 / options['rate'] if options['rate'] else 0
+        scanned = deleted = freed = 0
+        for path, entry in self.walk(root):
+            scanned += 1
+            name = os.path.relpath(path, settings.MEDIA_ROOT).replace(
+                os.sep, '/')
+            if name in referenced:
+                continue
+            stat = entry.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            deleted += 1
+            freed += stat.st_size
+            if options['dry_run']:
+                self.stdout.write(f'Would delete {name}')
+                continue
+            self.delete(root, path, name, cutoff)
+            if interval:
+                time.sleep(interval)
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {scanned} file(s). {verb} {deleted} file(s), '
+            f'{freed / 2 ** 20:.1f} MB.'
+        ))
+
+    def collect_references(self, bloom: bool):
+        images = Post.objects.exclude(image='')
+        if bloom:
+            capacity = (
+                images.count()
+                + PostImage.objects.count() * RENDITIONS_PER_IMAGE)
+            referenced = BloomFilter(capacity)
+        else:
+            referenced = set()
+        for name in images.values_list('image', flat=True).iterator(
+                chunk_size=CHUNK_SIZE):
+            referenced.add(name)
+        for source, renditions in PostImage.objects.values_list(
+                'source', 'renditions').iterator(chunk_size=CHUNK_SIZE):
+            referenced.add(source)
+            for item in renditions:
+                referenced.add(item['name'])
+        return referenced
+
+    def walk(self, root: str):
+        """
+        Yield files below ``root`` without listing the whole tree at once.
+        """
+        stack = [root]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry.path, entry
+
+    def delete(self, root: str, path: str, name: str, cutoff: float):
+        try:
+            # The file may have been reused by a deduplicated upload
+            # since it was scanned.
+            if os.stat(path).st_mtime > cutoff:
+                return
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        MediaFile.objects.filter(name=name).delete()
+        # Drop shard directories left empty, never the root itself.
+        directory = os.path.dirname(path)
+        while directory.startswith(root) and directory != root:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
@@ -0,0 +1,338 @@
+import asyncio
+import importlib.util
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import Resolver404, resolve, reverse
+from django.utils import timezone
+
+from blog.models import Category, Comment, Post
+from blog.views import BlogListView
+from core import bench, loadgen
+
+User = get_user_model()
+
+MIX = 'feed=60,detail=25,login=3,create=4,comment=8'
+SERVERS = ('wsgi', 'asgi')
+STARTUP_TIMEOUT = 30
+# Feed pages past this are rarely read.
+FEED_PAGES = 10
+
+
+def parse_mix(value: str) -> dict:
+    try:
+        mix = {
+            name.strip(): float(weight)
+            for name, weight in (
+                item.split('=') for item in value.split(',') if item)
+        }
+    except ValueError:
+        raise CommandError(
+            f'Bad --mix {value!r}, expected e.g. {MIX}.') from None
+    unknown = set(mix) - set(Command.actions)
+    if unknown:
+        raise CommandError(
+            f'Unknown actions in --mix: {", ".join(sorted(unknown))}.')
+    return mix
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a locally started server (runserver for WSGI, uvicorn for '
+        'ASGI) or a running one with virtual users reading the feed and '
+        'posts anonymously, logging in, creating posts and commenting, '
+        'and report throughput, latency histograms and error rates. With '
+        '--replay the GET requests of an access log are sent instead.'
+    )
+    actions = ('feed', 'detail', 'login', 'create', 'comment')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--server', choices=SERVERS, default='wsgi',
+            help='Server started for the test.')
+        parser.add_argument(
+            '--url',
+            help='Load a server already running at this URL instead.')
+        parser.add_argument(
+            '--users', type=int, default=20,
+            help='Virtual users running actions in a loop.')
+        parser.add_argument(
+            '--connections', type=int, default=10,
+            help='Size of the connection pool: requests in flight at once.')
+        parser.add_argument(
+            '--duration', type=float, default=30,
+            help='Seconds to run for.')
+        parser.add_argument(
+            '--requests', type=int,
+            help='Stop after this many actions.')
+        parser.add_argument(
+            '--mix', type=parse_mix, default=MIX,
+            help=f'Weights of the actions, {MIX} by default.')
+        parser.add_argument(
+            '--accounts', type=int, default=10,
+            help='Accounts created for the virtual users to log in with.')
+        parser.add_argument('--prefix', default='loadtest')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the posts and comments written during the test.')
+        parser.add_argument(
+            '--replay', metavar='ACCESS_LOG',
+            help='Replay the GET requests of an access log in the combined '
+                 'or runserver format.')
+        parser.add_argument(
+            '--speed', type=float, default=1.0,
+            help='Replay speed-up; 0 sends the requests without pauses.')
+        parser.add_argument(
+            '--timeout', type=float, default=30,
+            help='Seconds to wait for a response.')
+        parser.add_argument(
+            '--output', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        if isinstance(options['mix'], str):
+            options['mix'] = parse_mix(options['mix'])
+        self.options = options
+        if options['replay']:
+            with open(options['replay'], encoding='utf-8',
+                      errors='replace') as fh:
+                self.entries = loadgen.parse_access_log(fh)
+            if not self.entries:
+                raise CommandError(
+                    f'No requests found in {options["replay"]}.')
+        else:
+            self.prepare()
+        server = None
+        if options['url']:
+            url = urlsplit(options['url'])
+            host, port = url.hostname, url.port or 80
+        else:
+            host, port = '127.0.0.1', free_port()
+            server = self.start_server(options['server'], host, port)
+        try:
+            stats, skipped = asyncio.run(self.run(host, port))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+            if not options['replay'] and not options['keep']:
+                self.clean()
+        summary = stats.summary()
+        summary['connections_opened'] = self.connections_opened
+        if skipped:
+            summary['skipped'] = skipped
+        self.report(summary)
+        if options['output']:
+            bench.write(options['output'], {
+                'environment': {
+                    **bench.environment(),
+                    'server': options['url'] or options['server'],
+                },
+                'options': {
+                    name: options[name] for name in (
+                        'users', 'connections', 'duration', 'requests',
+                        'mix', 'replay', 'speed')
+                },
+                'results': summary,
+            })
+
+    def prepare(self):
+        """
+        Create the accounts and collect the posts and categories the
+        actions pick from.
+        """
+        prefix = self.options['prefix']
+        self.usernames = [
+            f'{prefix}_{number}' for number in range(self.options['accounts'])
+        ]
+        self.password = User.objects.make_random_password(16)
+        password = make_password(self.password)
+        existing = set(User.objects.filter(
+            username__in=self.usernames).values_list('username', flat=True))
+        User.objects.bulk_create(
+            User(username=username) for username in self.usernames
+            if username not in existing)
+        User.objects.filter(username__in=self.usernames).update(
+            password=password, is_active=True)
+        self.post_ids = list(
+            Post.public_objects.values_list('pk', flat=True)[:10000])
+        self.category_ids = list(Category.objects.filter(
+            is_published=True).values_list('pk', flat=True))
+        if not self.post_ids or not self.category_ids:
+            raise CommandError(
+                'Load tests need published posts and categories, '
+                'fill the database with seed_bench first.')
+        self.feed_pages = max(1, min(FEED_PAGES, math.ceil(
+            Post.public_objects.count() / BlogListView.paginate_by)))
+        self.started = timezone.now()
+
+    def clean(self):
+        written = {'author__username__in': self.usernames,
+                   'created_at__gte': self.started}
+        comments = Comment.objects.filter(**written).delete()[1].get(
+            Comment._meta.label, 0)
+        posts = Post.objects.filter(**written).delete()[1].get(
+            Post._meta.label, 0)
+        self.stdout.write(
+            f'Deleted {posts} post(s) and {comments} comment(s) written '
+            f'by the test.')
+
+    def start_server(self, kind: str, host: str, port: int):
+        env = dict(
+            os.environ,
+            BLOG_ASYNC_VIEWS='1' if kind == 'asgi' else '0',
+            DJANGO_SETTINGS_MODULE=os.environ.get(
+                'DJANGO_SETTINGS_MODULE', 'blogicum.settings'),
+        )
+        if kind == 'asgi':
+            if importlib.util.find_spec('uvicorn') is None:
+                raise CommandError(
+                    'The ASGI server needs uvicorn: pip install uvicorn, '
+                    'or start a server yourself and pass --url.')
+            command = [
+                sys.executable, '-m', 'uvicorn', 'blogicum.asgi:application',
+                '--host', host, '--port', str(port), '--no-access-log']
+        else:
+            command = [
+                sys.executable, '-m', 'django', 'runserver', '--noreload',
+                f'{host}:{port}']
+        log = tempfile.TemporaryFile()
+        server = subprocess.Popen(
+            command, env=env, cwd=settings.BASE_DIR,
+            stdout=subprocess.DEVNULL, stderr=log)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                log.seek(0)
+                raise CommandError(
+                    f'The {kind} server exited:\n'
+                    + log.read().decode(errors='replace'))
+            try:
+                socket.create_connection((host, port), timeout=1).close()
+                return server
+            except OSError:
+                time.sleep(0.1)
+        server.terminate()
+        raise CommandError(f'The {kind} server did not start in time.')
+
+    async def run(self, host: str, port: int) -> tuple:
+        options = self.options
+        pool = loadgen.Pool(
+            host, port, options['connections'], options['timeout'])
+        try:
+            if options['replay']:
+                return await loadgen.replay(
+                    pool, self.entries, options['speed'], self.route)
+            actions = {name: getattr(self, name) for name in self.actions}
+            stats = await loadgen.run_mix(
+                pool, actions, options['mix'], options['users'],
+                options['duration'], options['requests'], options['seed'],
+                setup=self.setup, setup_action='login')
+            return stats, 0
+        finally:
+            self.connections_opened = pool.opened
+            pool.close()
+
+    @staticmethod
+    def route(method: str, target: str) -> str:
+        try:
+            return resolve(urlsplit(target).path).view_name
+        except Resolver404:
+            return 'unmatched'
+
+    async def setup(self, session, number: int):
+        """
+        Give the virtual user an account and log it in, without timing
+        it, if it is going to write.
+        """
+        session.username = self.usernames[number % len(self.usernames)]
+        mix = self.options['mix']
+        if mix.get('create') or mix.get('comment'):
+            await self.login(session)
+
+    async def login(self, session, rng=None):
+        url = reverse('login')
+        await session.get(url)
+        response = await session.post(url, {
+            'username': session.username, 'password': self.password})
+        if response.status != 302:
+            raise loadgen.UnexpectedResponse(response)
+        return response
+
+    async def feed(self, session, rng):
+        page = min(int(rng.expovariate(1)) + 1, self.feed_pages)
+        url = reverse('blog:index')
+        return await session.pool.request(
+            'GET', url if page == 1 else f'{url}?page={page}')
+
+    async def detail(self, session, rng):
+        return await session.pool.request('GET', reverse(
+            'blog:post_detail', args=(rng.choice(self.post_ids),)))
+
+    async def create(self, session, rng):
+        response = await session.post(reverse('blog:create_post'), {
+            'title': 'Нагрузочный тест',
+            'text': 'Публикация нагрузочного теста.',
+            'pub_date': timezone.localdate().isoformat(),
+            'category': rng.choice(self.category_ids),
+            'is_published': 'on',
+        })
+        return self.expect_redirect(response)
+
+    async def comment(self, session, rng):
+        response = await session.post(reverse(
+            'blog:add_comment', args=(rng.choice(self.post_ids),)),
+            {'text': 'Комментарий нагрузочного теста.'})
+        return self.expect_redirect(response)
+
+    @staticmethod
+    def expect_redirect(response):
+        # Invalid forms and lost sessions come back as 200 pages.
+        if response.status != 302 or response.headers.get(
+                'location', '').startswith(reverse('login')):
+            raise loadgen.UnexpectedResponse(response)
+        return response
+
+    def report(self, summary: dict):
+        self.stdout.write(
+            f'{summary["requests"]} requests in {summary["elapsed_s"]} s: '
+            f'{summary["throughput_rps"]} req/s, '
+            f'{summary["errors"]} errors ({summary["error_rate"]:.2%}), '
+            f'{summary["connections_opened"]} connections opened'
+            + (f', {summary["skipped"]} log entries without bodies skipped'
+               if 'skipped' in summary else ''))
+        bounds = [f'<={bound * 1000:g}ms' for bound in summary['buckets']]
+        bounds.append('more')
+        for action, result in sorted(summary['actions'].items()):
+            self.stdout.write(
+                f'\n{action}: {result["requests"]} requests, '
+                f'{result["errors"]} errors, p50 {result["p50_ms"]} ms, '
+                f'p90 {result["p90_ms"]} ms, p99 {result["p99_ms"]} ms, '
+                f'max {result["max_ms"]} ms')
+            if result['errors']:
+                statuses = ', '.join(
+                    f'{status}: {count}'
+                    for status, count in result['statuses'].items())
+                self.stdout.write(f'  responses: {statuses}')
+            most = max(result['histogram'])
+            for bound, count in zip(bounds, result['histogram']):
+                if count:
+                    self.stdout.write(
+                        f'  {bound:>10} {count:>7} '
+                        + '#' * math.ceil(40 * count / most))
@@ -0,0 +1,84 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from blog.models import ImageJob, Post, PostImage
+from core.storage import ContentAddressedStorage, is_hashed_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Move post images and their renditions from flat upload names '
+        'to content-addressed storage, batch by batch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='Number of posts moved per transaction.')
+        parser.add_argument(
+            '--keep-originals', action='store_true',
+            help='Do not delete the old files after moving them.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only count the files that would be moved.')
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, ContentAddressedStorage):
+            raise CommandError(
+                'DEFAULT_FILE_STORAGE must be ContentAddressedStorage.')
+        self.options = options
+        last_pk = 0
+        moved = missing = 0
+        while True:
+            posts = list(
+                Post.objects.exclude(image='').filter(pk__gt=last_pk)
+                .order_by('pk').only('pk', 'image')
+                [:options['batch_size']]
+            )
+            if not posts:
+                break
+            last_pk = posts[-1].pk
+            legacy = [
+                post for post in posts if not is_hashed_name(post.image.name)]
+            if options['dry_run']:
+                moved += len(legacy)
+                continue
+            obsolete = []
+            with transaction.atomic():
+                for post in legacy:
+                    old_name = post.image.name
+                    if not default_storage.exists(old_name):
+                        self.stderr.write(f'Missing file: {old_name}')
+                        missing += 1
+                        continue
+                    new_name = self.move(old_name, obsolete)
+                    Post.objects.filter(pk=post.pk).update(image=new_name)
+                    ImageJob.objects.filter(
+                        post=post, source=old_name).update(source=new_name)
+                    self.move_renditions(post, old_name, new_name, obsolete)
+                    moved += 1
+            if not options['keep_originals']:
+                for name in obsolete:
+                    default_storage.delete(name)
+            self.stdout.write(f'Moved {moved} image(s)...')
+        verb = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {moved} image(s), {missing} missing.'))
+
+    def move(self, name: str, obsolete: list) -> str:
+        with default_storage.open(name, 'rb') as fh:
+            new_name = default_storage.save(name, fh)
+        obsolete.append(name)
+        return new_name
+
+    def move_renditions(self, post, old_name, new_name, obsolete):
+        meta = PostImage.objects.filter(post=post, source=old_name).first()
+        if meta is None:
+            return
+        for item in meta.renditions:
+            if (not is_hashed_name(item['name'])
+                    and default_storage.exists(item['name'])):
+                item['name'] = self.move(item['name'], obsolete)
+        meta.source = new_name
+        meta.save(update_fields=('source', 'renditions'))
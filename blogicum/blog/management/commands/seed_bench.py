@@ -0,0 +1,341 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from blog.models import Category, Comment, ImageJob, Location, Post, PostImage
+
+User = get_user_model()
+
+WORDS = (
+    'город река утро дорога лес море вечер гора поезд дом окно свет '
+    'небо ветер сад зима лето осень весна путь берег поле мост улица '
+    'кофе книга музей парк огонь снег дождь звезда остров ночь тропа'
+).split()
+CHUNK = 2000
+SQLITE_CACHE_KIB = 256 * 1024
+# Texts are drawn from pools: building each one from words would cost
+# more than inserting it.
+TEXT_POOL = 1000
+# Pareto shape of comments per post: most posts get few, some get many.
+COMMENTS_ALPHA = 1.5
+# Zipf exponent of posts per author and per category.
+ZIPF = 1.1
+
+
+def zipf_weights(count: int, exponent: float = ZIPF) -> list:
+    """
+    Cumulative weights of ranks 1..count under Zipf's law.
+    """
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with a synthetic dataset for benchmarks. '
+        'The same --seed and --today give the same rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--locations', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=500000)
+        parser.add_argument(
+            '--future', type=float, default=0.02,
+            help='Share of posts scheduled for the next 60 days.')
+        parser.add_argument(
+            '--unpublished', type=float, default=0.03,
+            help='Share of hidden posts, categories and locations.')
+        parser.add_argument(
+            '--age', type=float, default=90,
+            help='Mean age of published posts in days.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--today', type=datetime.fromisoformat,
+            help='Date the post dates are counted from, YYYY-MM-DD. '
+                 'Defaults to the current date.')
+        parser.add_argument(
+            '--prefix', default='bench',
+            help='Prefix of generated user names and category slugs.')
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete the users, posts, comments and categories '
+                 'generated earlier with this prefix.')
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['categories']) < 1:
+            raise CommandError('Posts need at least one user and category.')
+        self.rng = random.Random(options['seed'])
+        self.prefix = options['prefix']
+        today = options['today'] or timezone.localtime().replace(
+            tzinfo=None)
+        # Dates are generated as naive UTC, which the database adapters
+        # take without converting every value.
+        self.today = timezone.make_naive(
+            timezone.make_aware(today.replace(
+                hour=0, minute=0, second=0, microsecond=0)),
+            timezone.utc)
+        self.options = options
+        self.pools = {}
+        if options['clear']:
+            self.clear()
+        if User.objects.filter(
+                username__startswith=f'{self.prefix}_').exists():
+            raise CommandError(
+                f'Rows with prefix {self.prefix} exist, use --clear.')
+        started = time.perf_counter()
+        # Foreign keys point at rows generated just before, checking
+        # them would cost as much as inserting.
+        with self.fast_inserts(), connection.constraint_checks_disabled(), \
+                transaction.atomic():
+            total = (
+                self.create(User, self.users)
+                + self.create(Category, self.categories)
+                + self.create(Location, self.locations)
+                + self.insert(Post, (
+                    'id', 'title', 'text', 'pub_date', 'author',
+                    'category', 'location', 'is_published', 'created_at',
+                    'image'), self.posts)
+                + self.insert(Comment, (
+                    'id', 'post', 'author', 'text', 'created_at'),
+                    self.comments)
+            )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{total} rows in {elapsed:.1f}s, '
+            f'{total / elapsed:,.0f} rows/s')
+
+    @contextmanager
+    def fast_inserts(self):
+        """
+        Skip fsync on SQLite and give it a page cache large enough for
+        the indexes being filled; the data can be regenerated any time.
+        """
+        if connection.vendor != 'sqlite':
+            yield
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            cache_size = cursor.fetchone()[0]
+            cursor.execute('PRAGMA synchronous = OFF')
+            cursor.execute(f'PRAGMA cache_size = {-SQLITE_CACHE_KIB}')
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = FULL')
+                cursor.execute(f'PRAGMA cache_size = {cache_size}')
+
+    @staticmethod
+    def next_id(model) -> int:
+        # Primary keys are assigned here: SQLite does not return them
+        # from bulk inserts, and later tables need them.
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def report(self, model, count: int, started: float) -> int:
+        self.stdout.write(
+            f'{model._meta.verbose_name_plural}: {count} in '
+            f'{time.perf_counter() - started:.2f}s')
+        return count
+
+    def deleted(self, model, count: int):
+        self.stdout.write(
+            f'{model._meta.verbose_name_plural}: {count} deleted')
+
+    def create(self, model, generate) -> int:
+        started = time.perf_counter()
+        instances = list(generate(self.next_id(model)))
+        model.objects.bulk_create(instances, batch_size=CHUNK)
+        return self.report(model, len(instances), started)
+
+    def insert(self, model, fields, generate) -> int:
+        """
+        Insert the value tuples from ``generate`` with ``executemany``.
+
+        This is the statement ``bulk_create`` builds, without its per-field
+        preparation of every value, which is slower than SQLite itself.
+        """
+        started = time.perf_counter()
+        quote = connection.ops.quote_name
+        columns = ', '.join(
+            quote(model._meta.get_field(name).column) for name in fields)
+        sql = (
+            f'INSERT INTO {quote(model._meta.db_table)} ({columns}) '
+            f'VALUES ({", ".join(["%s"] * len(fields))})')
+        rows = generate(self.next_id(model))
+        count = 0
+        with connection.cursor() as cursor:
+            while True:
+                chunk = list(islice(rows, CHUNK))
+                if not chunk:
+                    break
+                cursor.executemany(sql, chunk)
+                count += len(chunk)
+        return self.report(model, count, started)
+
+    @staticmethod
+    def datetime_adapter():
+        if connection.vendor == 'sqlite':
+            # What the backend does with naive values, minus the checks.
+            return str
+        return connection.ops.adapt_datetimefield_value
+
+    def hidden(self) -> bool:
+        return self.rng.random() < self.options['unpublished']
+
+    def pool(self, low: int, high: int) -> list:
+        pool = self.pools.get((low, high))
+        if pool is None:
+            rng = self.rng
+            pool = self.pools[low, high] = [
+                ' '.join(rng.choices(WORDS, k=rng.randint(low, high)))
+                for _ in range(TEXT_POOL)
+            ]
+        return pool
+
+    def text(self, low: int, high: int) -> str:
+        return self.pool(low, high)[self.rng.randrange(TEXT_POOL)]
+
+    def users(self, first_id):
+        # One unusable password for all: hashing per user dominates.
+        password = '!' + 'x' * 40
+        self.user_ids = range(first_id, first_id + self.options['users'])
+        for user_id in self.user_ids:
+            yield User(
+                id=user_id, username=f'{self.prefix}_{user_id}',
+                password=password, first_name=self.rng.choice(WORDS))
+
+    def categories(self, first_id):
+        self.category_ids = range(
+            first_id, first_id + self.options['categories'])
+        for category_id in self.category_ids:
+            yield Category(
+                id=category_id, title=self.text(1, 3).capitalize(),
+                description=self.text(5, 20),
+                slug=f'{self.prefix}-{category_id}',
+                is_published=not self.hidden())
+
+    def locations(self, first_id):
+        self.location_ids = range(
+            first_id, first_id + self.options['locations'])
+        for location_id in self.location_ids:
+            yield Location(
+                id=location_id,
+                name=f'{self.prefix}-{location_id} {self.text(1, 2)}',
+                is_published=not self.hidden())
+
+    def pub_date(self) -> datetime:
+        rng = self.rng
+        if rng.random() < self.options['future']:
+            return self.today + timedelta(days=rng.uniform(1, 60))
+        # Exponential ages: most posts are recent, a long tail is old.
+        return self.today - timedelta(
+            days=rng.expovariate(1 / self.options['age']))
+
+    def posts(self, first_id):
+        rng = self.rng
+        count = self.options['posts']
+        adapt = self.datetime_adapter()
+        authors = rng.choices(
+            self.user_ids, cum_weights=zipf_weights(len(self.user_ids)),
+            k=count)
+        categories = rng.choices(
+            self.category_ids,
+            cum_weights=zipf_weights(len(self.category_ids)), k=count)
+        locations = self.location_ids
+        self.post_ids = range(first_id, first_id + count)
+        # Comments are dated after their post.
+        self.post_dates = []
+        titles = rng.choices(
+            [title.capitalize() for title in self.pool(2, 8)], k=count)
+        texts = rng.choices(self.pool(20, 200), k=count)
+        for post_id, author_id, category_id, title, text in zip(
+                self.post_ids, authors, categories, titles, texts):
+            pub_date = self.pub_date()
+            created_at = min(pub_date, self.today)
+            self.post_dates.append(created_at)
+            yield (
+                post_id, title, text, adapt(pub_date), author_id,
+                category_id,
+                rng.choice(locations)
+                if locations and rng.random() < 0.7 else None,
+                not self.hidden(), adapt(created_at), '')
+
+    def comment_counts(self) -> list:
+        """
+        Comments per post following a Pareto law, summing to --comments.
+        """
+        rng = self.rng
+        target = self.options['comments'] if self.post_ids else 0
+        scale = target / max(len(self.post_ids), 1) * (COMMENTS_ALPHA - 1)
+        counts = [
+            int((rng.paretovariate(COMMENTS_ALPHA) - 1) * scale)
+            for _ in self.post_ids
+        ]
+        difference = target - sum(counts)
+        while difference:
+            index = rng.randrange(len(counts))
+            if difference > 0:
+                counts[index] += 1
+                difference -= 1
+            elif counts[index]:
+                counts[index] -= 1
+                difference += 1
+        return counts
+
+    def comments(self, first_id):
+        rng = self.rng
+        adapt = self.datetime_adapter()
+        expovariate = rng.expovariate
+        comment_id = first_id
+        authors = self.user_ids
+        texts = self.pool(3, 40)
+        for post_id, created_at, count in zip(
+                self.post_ids, self.post_dates, self.comment_counts()):
+            if not count:
+                continue
+            # Draws for a whole post at once are cheaper than per row.
+            for author_id, text in zip(
+                    rng.choices(authors, k=count),
+                    rng.choices(texts, k=count)):
+                created_at += timedelta(minutes=expovariate(1 / 30))
+                yield (
+                    comment_id, post_id, author_id, text, adapt(created_at))
+                comment_id += 1
+
+    def clear(self):
+        users = User.objects.filter(username__startswith=f'{self.prefix}_')
+        posts = Post.objects.filter(author__in=users)
+        with transaction.atomic():
+            # Comments and posts run into the millions and delete() would
+            # load every row to run cascades and signals. Image rows are
+            # the only other tables pointing at posts, so once they are
+            # gone a single DELETE each is enough. _raw_delete is private;
+            # test_clear_with_dependent_rows pins it.
+            for queryset in (
+                    ImageJob.objects.filter(post__in=posts),
+                    PostImage.objects.filter(post__in=posts),
+                    Comment.objects.filter(post__in=posts),
+                    posts):
+                self.deleted(queryset.model, queryset._raw_delete(queryset.db))
+            # The rest are few: delete() takes care of profiles, groups,
+            # comments on other posts and posts of other authors.
+            for queryset in (
+                    users,
+                    Category.objects.filter(
+                        slug__startswith=f'{self.prefix}-'),
+                    Location.objects.filter(
+                        name__startswith=f'{self.prefix}-')):
+                _, deleted = queryset.delete()
+                self.deleted(
+                    queryset.model, deleted.get(queryset.model._meta.label, 0))
@@ -0,0 +1,26 @@
+"""
+Blog gauges reported by the metrics endpoint.
+"""
+from core.metrics import GaugeFamily, registry
+
+from .image_queue import queue_stats
+
+
+@registry.collector
+def image_queue():
+    stats = queue_stats()
+    jobs = GaugeFamily(
+        'blog_image_jobs', 'Post image jobs by status.', ('status',))
+    for status in ('pending', 'running', 'failed'):
+        jobs.add(stats[status], status=status)
+    return [
+        jobs,
+        GaugeFamily(
+            'blog_image_job_wait_seconds',
+            'Average wait of recent image jobs before processing.'
+        ).add(stats['wait']),
+        GaugeFamily(
+            'blog_image_job_processing_seconds',
+            'Average processing time of recent image jobs.'
+        ).add(stats['processing']),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.24 on 2026-10-19 08:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_alter_comment_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, verbose_name='Исходный файл')),
+                ('width', models.PositiveIntegerField(verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='Высота')),
+                ('renditions', models.JSONField(default=list, help_text='Список уменьшенных копий: имя файла, размеры и формат.', verbose_name='Варианты')),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='image_meta', to='blog.post', verbose_name='Публикация')),
+            ],
+            options={
+                'verbose_name': 'изображение публикации',
+                'verbose_name_plural': 'Изображения публикаций',
+            },
+        ),
+    ]
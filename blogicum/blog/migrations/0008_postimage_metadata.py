@@ -0,0 +1,33 @@
+# Generated by Django 3.2.24 on 2026-10-19 08:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_imagejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postimage',
+            name='color',
+            field=models.CharField(blank=True, max_length=7, verbose_name='Основной цвет'),
+        ),
+        migrations.AddField(
+            model_name='postimage',
+            name='format',
+            field=models.CharField(blank=True, max_length=16, verbose_name='Формат'),
+        ),
+        migrations.AddField(
+            model_name='postimage',
+            name='placeholder',
+            field=models.TextField(blank=True, help_text='Крошечная размытая копия изображения в виде data URI.', verbose_name='Превью'),
+        ),
+        migrations.AddField(
+            model_name='postimage',
+            name='size',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Размер файла, байт'),
+        ),
+    ]
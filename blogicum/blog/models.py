@@ -76,7 +76,8 @@ class PublicPostsManager(models.Manager):
         return super().get_queryset().select_related(
             'location',
             'category',
-            'author'
+            'author',
+            'image_meta'
         ).filter(
             pub_date__lte=date.today(),
             is_published=True,
@@ -118,7 +119,8 @@ class Post(BaseModel):
     image = models.ImageField(
         verbose_name='Изображение',
         blank=True,
-        upload_to='blog_images'
+        upload_to='blog_images',
+        db_index=True
     )
     objects = models.Manager()
     public_objects = PublicPostsManager()
@@ -156,3 +158,106 @@ class Comment(models.Model):
 
     def __str__(self) -> str:
         return f'{self.created_at}: {self.text[:20]}...'
+
+
+class PostImage(models.Model):
+    """
+    Model storing the metadata and resized variants (renditions)
+    of a post image, so pages never open the image files.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_meta',
+        verbose_name='Публикация'
+    )
+    source = models.CharField(
+        max_length=255,
+        verbose_name='Исходный файл'
+    )
+    width = models.PositiveIntegerField(verbose_name='Ширина')
+    height = models.PositiveIntegerField(verbose_name='Высота')
+    size = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Размер файла, байт'
+    )
+    format = models.CharField(
+        max_length=16,
+        blank=True,
+        verbose_name='Формат'
+    )
+    color = models.CharField(
+        max_length=7,
+        blank=True,
+        verbose_name='Основной цвет'
+    )
+    placeholder = models.TextField(
+        blank=True,
+        verbose_name='Превью',
+        help_text='Крошечная размытая копия изображения в виде data URI.'
+    )
+    renditions = models.JSONField(
+        default=list,
+        verbose_name='Варианты',
+        help_text='Список уменьшенных копий: имя файла, размеры и формат.'
+    )
+
+    class Meta:
+        verbose_name = 'изображение публикации'
+        verbose_name_plural = 'Изображения публикаций'
+
+    def __str__(self) -> str:
+        return self.source
+
+
+class ImageJob(models.Model):
+    """
+    Model representing a queued processing job for a post image.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_jobs',
+        verbose_name='Публикация'
+    )
+    source = models.CharField(
+        max_length=255,
+        verbose_name='Исходный файл'
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        db_index=True,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попытки'
+    )
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Добавлено'
+    )
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('created_at',)
+        verbose_name = 'обработка изображения'
+        verbose_name_plural = 'Обработка изображений'
+
+    def __str__(self) -> str:
+        return f'{self.source}: {self.get_status_display()}'
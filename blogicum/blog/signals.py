@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .image_queue import schedule
+from .models import Post
+
+
+@receiver(post_save, sender=Post)
+def post_image_changed(sender, instance: Post, raw: bool = False, **kwargs):
+    """
+    Queue rendition generation when a post is saved with a new image.
+    """
+    if raw:
+        return
+    schedule(instance)
@@ -0,0 +1,69 @@
+from django import template
+
+from blog.images import CARD_WIDTH, DETAIL_WIDTH
+
+register = template.Library()
+
+ROLE_WIDTHS = {
+    'card': CARD_WIDTH,
+    'detail': DETAIL_WIDTH,
+}
+# Both the feed card and the detail card are 40rem wide.
+IMAGE_SIZES = '(max-width: 40rem) 100vw, 40rem'
+# Grey 4:3 box shown while the renditions are being generated, if the
+# image has no preview.
+PLACEHOLDER = (
+    "data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' "
+    "viewBox='0 0 4 3'%3E%3Crect width='4' height='3' fill='%23e9ecef'/%3E"
+    "%3C/svg%3E"
+)
+
+
+def _srcset(storage, renditions) -> str:
+    return ', '.join(
+        f'{storage.url(item["name"])} {item["width"]}w'
+        for item in renditions
+    )
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(post, role='card'):
+    """
+    Render the post image from its stored renditions.
+
+    Shows a placeholder of the right proportions while the renditions
+    are being generated. Only stored metadata is used, the image files
+    are never opened.
+
+    The metadata is stored when the post is saved, before the job is
+    queued. Without metadata for the current image its header could not
+    be read, so its job fails too, or it predates the metadata: the
+    original image is shown as is.
+    """
+    meta = getattr(post, 'image_meta', None)
+    if meta is None or meta.source != post.image.name:
+        return {'original': True, 'src': post.image.url}
+    if not meta.renditions:
+        width = min(meta.width, CARD_WIDTH)
+        return {
+            'src': meta.placeholder or PLACEHOLDER,
+            'width': width,
+            'height': max(1, round(meta.height * width / meta.width)),
+            'color': meta.color,
+        }
+    storage = post.image.storage
+    target = ROLE_WIDTHS.get(role, CARD_WIDTH)
+    jpeg = [item for item in meta.renditions if item['format'] == 'jpg']
+    webp = [item for item in meta.renditions if item['format'] == 'webp']
+    fallback = next(
+        (item for item in jpeg if item['width'] >= target), jpeg[-1])
+    return {
+        'src': storage.url(fallback['name']),
+        'srcset': _srcset(storage, jpeg),
+        'webp_srcset': _srcset(storage, webp),
+        'sizes': IMAGE_SIZES,
+        'width': fallback['width'],
+        'height': fallback['height'],
+        'color': meta.color,
+        'placeholder': meta.placeholder,
+    }
@@ -1,12 +1,16 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Read-only pages have async versions for ASGI deployments.
+read_views = async_views if settings.BLOG_ASYNC_VIEWS else views
 
 app_name = 'blog'
 urlpatterns = [
-    path('', views.BlogListView.as_view(),
+    path('', read_views.BlogListView.as_view(),
          name='index'),
     path('posts/<int:pk>/',
-         views.PostDetailView.as_view(),
+         read_views.PostDetailView.as_view(),
          name='post_detail'),
     path('posts/<int:pk>/comment/',
          views.CommentCreateView.as_view(),
@@ -21,7 +25,7 @@ urlpatterns = [
          views.UserUpdateView.as_view(),
          name='edit_profile'),
     path('profile/<slug:username>/',
-         views.ByProfileListView.as_view(),
+         read_views.ByProfileListView.as_view(),
          name='profile'),
     path('posts/create/',
          views.PostCreateView.as_view(),
@@ -33,6 +37,6 @@ urlpatterns = [
          views.PostDeleteView.as_view(),
          name='delete_post'),
     path('category/<slug:category_slug>/',
-         views.ByCategoryListView.as_view(),
+         read_views.ByCategoryListView.as_view(),
          name='category_posts')
 ]
@@ -1,4 +1,5 @@
 from typing import Any
+from django.conf import settings
 from django.db.models import Count
 from django.db.models.query import QuerySet
 from django.http import HttpRequest
@@ -16,6 +17,7 @@ from django.views.generic import (
 
 from .models import Post, Category, Comment
 from .forms import PostForm, CommentForm
+from .rows import post_rows
 
 User = get_user_model()
 
@@ -36,6 +38,15 @@ class BlogListView(PostsPublicListView):
     """
     template_name = 'blog/index.html'
 
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, object_list, is_paginated = (
+            super().paginate_queryset(queryset, page_size))
+        if settings.BLOG_FEED_ROWS:
+            # Only the page is fetched as rows: the paginator counts the
+            # model queryset, without the card columns and their joins.
+            page.object_list = object_list = post_rows(page.object_list)
+        return paginator, page, object_list, is_paginated
+
 
 class ByCategoryListView(PostsPublicListView):
     """
@@ -66,9 +77,11 @@ class ByProfileListView(PostsPublicListView):
         Get the queryset of posts filtered by category.
         """
         username = self.kwargs.get('username')
-        post_list = Post.objects.all().filter(
+        post_list = Post.objects.select_related(
+            'location', 'category', 'author', 'image_meta'
+        ).filter(
             author__username=username
-        ).order_by('-pub_date')
+        ).annotate(comment_count=Count('comments')).order_by('-pub_date')
         return post_list
 
     def get_context_data(self, **kwargs):
@@ -132,7 +145,7 @@ class PostUpdateView(LoginRequiredMixin, UpdateView):
     View to update an existing blog post.
     """
     model = Post
-    fields = '__all__'
+    form_class = PostForm
     template_name = 'blog/create.html'
     success_url = reverse_lazy('blog:index')
 
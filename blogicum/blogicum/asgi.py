@@ -2,6 +2,10 @@
 ASGI config for blogicum project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The read-only blog pages are served by the async views in
+``blog.async_views`` unless ``BLOG_ASYNC_VIEWS`` is set to another value.
+Collected static files are served by ``ASGIStaticFilesMiddleware`` in
+front of Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -12,5 +16,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogicum.settings')
+os.environ.setdefault('BLOG_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+from core.static import ASGIStaticFilesMiddleware  # noqa: E402
+
+application = ASGIStaticFilesMiddleware(application)
@@ -46,21 +46,32 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'debug_toolbar',
     'django_bootstrap5'
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestContextMiddleware',
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.NPlusOneMiddleware',
+    'core.middleware.MemoryProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware'
 ]
 
+# The toolbar middleware is sync only and would force every request
+# served under ASGI back through a thread.
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'blogicum.urls'
 
 TEMPLATES_DIR = BASE_DIR / 'templates'
@@ -137,6 +148,13 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static_dev'
 ]
 
+STATIC_ROOT = BASE_DIR / 'static'
+
+# collectstatic writes content-hashed names and gzip/brotli copies,
+# served by core.static.StaticFilesMiddleware (see wsgi.py) and its ASGI
+# counterpart (see asgi.py).
+STATICFILES_STORAGE = 'core.static.CompressedManifestStaticFilesStorage'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -152,7 +170,105 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 LOGIN_REDIRECT_URL = 'blog:index'
 LOGIN_URL = 'login'
 
+MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# How media is handed to the front server: '' streams files from Django,
+# 'x-accel-redirect' for nginx (internal location MEDIA_ACCEL_PREFIX)
+# or 'x-sendfile' for Apache and lighttpd.
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE', '')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Uploads are named by content hash, sharded and deduplicated.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+
+# Uploads always go to a temporary file, never into memory.
+FILE_UPLOAD_HANDLERS = ['core.uploads.HashingTemporaryFileUploadHandler']
+FILE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+
+# Post image renditions are generated by run_workers; BLOG_IMAGE_INLINE=1
+# generates them in the saving process after the commit instead.
+BLOG_IMAGE_INLINE = os.getenv('BLOG_IMAGE_INLINE', '') == '1'
+# Limits checked against the image header before anything is decoded.
+BLOG_IMAGE_MAX_SIDE = 10000
+BLOG_IMAGE_MAX_PIXELS = 40_000_000
+BLOG_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+# Route the feed, profile, category and post pages to the async views;
+# asgi.py turns this on. Their queries run in a pool of
+# BLOG_ASYNC_DB_WORKERS threads, each holding one database connection.
+BLOG_ASYNC_VIEWS = os.getenv('BLOG_ASYNC_VIEWS', '') == '1'
+BLOG_ASYNC_DB_WORKERS = int(os.getenv('BLOG_ASYNC_DB_WORKERS', 8))
+
+# The feed renders lightweight rows (blog.rows) instead of Post instances.
+# Off by default: code reading the context, such as the course tests,
+# expects models.
+BLOG_FEED_ROWS = os.getenv('BLOG_FEED_ROWS', '') == '1'
+
+# Share of requests whose DB, template and total time are measured,
+# sent as a Server-Timing header and logged as JSON by core.timing.
+# One request in a hundred by default; set SERVER_TIMING_SAMPLE_RATE=1
+# to measure them all.
+SERVER_TIMING_SAMPLE_RATE = float(
+    os.getenv('SERVER_TIMING_SAMPLE_RATE', 0.01))
+SERVER_TIMING_HEADER = True
+SERVER_TIMING_LOG = os.getenv('SERVER_TIMING_LOG', '') == '1'
+
+# Queries slower than this are logged with their plan by
+# core.slow_queries; see manage.py slow_queries.
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 100))
+SLOW_QUERY_EXPLAIN_INTERVAL = 60
+SLOW_QUERY_LOG_FILE = BASE_DIR / 'slow_queries.log'
+
+# Request and query metrics of all worker processes are merged into
+# METRICS_FILE and served at /metrics to holders of METRICS_TOKEN
+# and to staff users.
+METRICS_FILE = BASE_DIR / 'metrics.json'
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# A statement run NPLUSONE_THRESHOLD times from one template line or
+# line of code within a request is logged, or raised with NPLUSONE_RAISE.
+# Every request is checked in development, none elsewhere unless
+# NPLUSONE_SAMPLE_RATE is set: the check hooks every query.
+NPLUSONE_SAMPLE_RATE = float(
+    os.getenv('NPLUSONE_SAMPLE_RATE', 1 if DEBUG else 0))
+NPLUSONE_THRESHOLD = 3
+NPLUSONE_RAISE = False
+
+# Profiles of single requests taken with ?_profile= by staff users.
+PROFILE_DIR = BASE_DIR / 'profiles'
+PROFILE_SAMPLE_INTERVAL = 0.001
+PROFILE_TOP = 30
+PROFILE_TOKEN_MAX_AGE = 3600
+
+# Share of requests traced with tracemalloc by core.memory, none by
+# default: tracing makes requests several times slower. Peaks go to
+# /metrics; requests peaking above MEMORY_PROFILE_LOG_KIB are logged with
+# their MEMORY_PROFILE_TOP allocation sites.
+MEMORY_PROFILE_SAMPLE_RATE = float(
+    os.getenv('MEMORY_PROFILE_SAMPLE_RATE', 0))
+MEMORY_PROFILE_LOG_KIB = 16 * 1024
+MEMORY_PROFILE_TOP = 10
+MEMORY_PROFILE_FRAMES = 1
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.timing': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# Seconds a worker holds a claimed task; after that the task is
+# considered lost and runs again. Keep it above the longest task.
+TASK_LEASE = 300
+
+# Views only queue messages in the outbox; run_workers delivers them
+# in batches through OUTBOX_EMAIL_BACKEND.
+EMAIL_BACKEND = 'core.mail.OutboxBackend'
+OUTBOX_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
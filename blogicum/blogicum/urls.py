@@ -21,7 +21,8 @@ from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
 from django.views.generic.edit import CreateView
 
-from django.conf.urls.static import static
+from core.media import serve_media
+from core.views import metrics
 
 urlpatterns = [
     path('', include('blog.urls', namespace='blog')),
@@ -30,6 +31,7 @@ urlpatterns = [
     path('pages/', include('pages.urls', namespace='pages')),
     path('auth/', include('django.contrib.auth.urls')),
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path(
         'auth/registration/',
         CreateView.as_view(
@@ -45,7 +47,13 @@ if settings.DEBUG:
     import debug_toolbar
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+urlpatterns += (
+    path(
+        f'{settings.MEDIA_URL.strip("/")}/<path:path>',
+        serve_media,
+        name='media'
+    ),
+)
 
 handler404 = 'pages.views.page_not_found'
 handler500 = 'pages.views.page_forbidden'
@@ -2,6 +2,8 @@
 WSGI config for blogicum project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
+Collected static files are served by ``StaticFilesMiddleware`` in front of
+Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
@@ -14,3 +16,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogicum.settings')
 
 application = get_wsgi_application()
+
+from core.static import StaticFilesMiddleware  # noqa: E402
+
+application = StaticFilesMiddleware(application)
@@ -0,0 +1,70 @@
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+
+from .models import Profile
+from .profiling import stacks_path
+
+
+@admin.register(Profile)
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'created_at', 'method', 'path', 'view', 'status', 'mode',
+        'duration_ms', 'user')
+    list_filter = ('mode', 'view')
+    search_fields = ('path',)
+    fields = (
+        'created_at', 'user', 'method', 'path', 'view', 'status', 'mode',
+        'duration_ms', 'samples', 'stacks', 'top_table')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Длительность, мс', ordering='duration')
+    def duration_ms(self, profile):
+        return round(profile.duration * 1000, 1)
+
+    @admin.display(description='Файл стеков')
+    def stacks(self, profile):
+        url = reverse('admin:core_profile_stacks', args=(profile.pk,))
+        return format_html('<a href="{}">{}</a>', url, profile.stacks_file)
+
+    @admin.display(description='Самые затратные функции')
+    def top_table(self, profile):
+        rows = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>',
+            (
+                (row['function'], row['calls'] or '', row['self_ms'],
+                 row['total_ms'])
+                for row in profile.top
+            ))
+        return format_html(
+            '<table><thead><tr><th>Функция</th><th>Вызовов</th>'
+            '<th>Собственное время, мс</th><th>Всего, мс</th></tr></thead>'
+            '<tbody>{}</tbody></table>', rows)
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/stacks/',
+                self.admin_site.admin_view(self.stacks_view),
+                name='core_profile_stacks'),
+        ] + super().get_urls()
+
+    def stacks_view(self, request, pk):
+        profile = get_object_or_404(Profile, pk=pk)
+        if not self.has_view_permission(request, profile):
+            raise Http404
+        try:
+            fh = open(stacks_path(profile), 'rb')
+        except FileNotFoundError:
+            raise Http404('Файл стеков удалён')
+        return FileResponse(
+            fh, as_attachment=True, filename=profile.stacks_file,
+            content_type='text/plain; charset=utf-8')
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        # mail registers the send_emails task for the workers.
+        from . import mail, metrics, nplusone, slow_queries, timing  # noqa
+
+        connection_created.connect(metrics.instrument_new_connection)
+        connection_created.connect(timing.instrument_new_connection)
+        connection_created.connect(slow_queries.instrument_new_connection)
+        connection_created.connect(nplusone.instrument_new_connection)
@@ -0,0 +1,153 @@
+"""
+Measurement of requests for the benchmark commands.
+
+``run`` times a request callable, counts its queries and traces its
+allocations with ``core.memory`` in a separate pass, since tracing
+slows the interpreter down several times. Results are plain dicts, written as
+JSON by the commands and compared with ``compare``.
+"""
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import memory
+
+# Metrics a larger value of which is a regression, with the relative
+# change tolerated by default.
+COMPARED = {
+    'p50_ms': None,
+    'p90_ms': None,
+    'queries': 0,
+    'alloc_peak_kib': None,
+}
+# Allocation sites kept in the results of each request.
+ALLOCATION_SITES = 5
+
+
+def percentile(values: list, share: float) -> float:
+    """
+    Nearest-rank percentile of values sorted in ascending order.
+    """
+    index = max(0, min(len(values) - 1, round(share * len(values)) - 1))
+    return values[index]
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def call_rolled_back(request, counter=None):
+    """
+    Make the request inside a transaction that is rolled back, so
+    requests writing data leave the dataset as it was.
+    """
+    if counter is None:
+        counter = QueryCounter()
+    with transaction.atomic(), connection.execute_wrapper(counter):
+        response = request()
+        transaction.set_rollback(True)
+    return response
+
+
+def run(request, iterations: int, warmup: int = 3,
+        allocations: bool = True) -> dict:
+    """
+    Latency percentiles, queries and allocations of ``request``.
+    """
+    for _ in range(warmup):
+        response = call_rolled_back(request)
+    latencies = []
+    counter = QueryCounter()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = call_rolled_back(request, counter)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    result = {
+        'status': response.status_code,
+        'iterations': iterations,
+        'min_ms': round(latencies[0] * 1000, 3),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 0.9) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'queries': counter.count // iterations,
+        'bytes': len(getattr(response, 'content', b'')),
+    }
+    if allocations:
+        with memory.Tracing() as traced:
+            call_rolled_back(request)
+        result['alloc_peak_kib'] = round(traced.peak / 1024, 1)
+        result['alloc_retained_kib'] = round(traced.retained / 1024, 1)
+        result['alloc_sites'] = traced.top(ALLOCATION_SITES)
+    return result
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def environment() -> dict:
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+    }
+
+
+def write(path: str, data: dict):
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(data, fh, indent=2, ensure_ascii=False)
+        fh.write('\n')
+
+
+def read(path: str) -> dict:
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> tuple:
+    """
+    Table rows comparing two result sets and the regressions found.
+
+    Timings and allocations regress when they grow by more than
+    ``tolerance`` (a share), query counts on any growth.
+    """
+    rows, regressions = [], []
+    for name, result in current.items():
+        before = baseline.get(name)
+        if before is None:
+            rows.append((name, '', '', '', 'new'))
+            continue
+        for metric, allowed in COMPARED.items():
+            if metric not in result or metric not in before:
+                continue
+            old, new = before[metric], result[metric]
+            change = (new - old) / old if old else 0.0
+            limit = tolerance if allowed is None else allowed
+            regressed = new > old and (change > limit if old else new > 0)
+            rows.append((
+                name, metric, old, new,
+                f'{change:+.1%}' + (' !' if regressed else '')))
+            if regressed:
+                regressions.append(f'{name} {metric}: {old} -> {new}')
+    return rows, regressions
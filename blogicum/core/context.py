@@ -0,0 +1,32 @@
+"""
+The request handled in the current context, for code far from the view
+such as database execute wrappers.
+"""
+from contextvars import ContextVar
+
+_request = ContextVar('current_request', default=None)
+
+
+def get_request():
+    return _request.get()
+
+
+def activate(request):
+    return _request.set(request)
+
+
+def deactivate(token):
+    _request.reset(token)
+
+
+def view_name() -> str:
+    """
+    URL name of the current view, its path before resolving, or ''.
+    """
+    request = _request.get()
+    if request is None:
+        return ''
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return request.path
+    return match.view_name
@@ -0,0 +1,122 @@
+"""
+Removal of unused rules from a stylesheet.
+
+The parser only understands what a minified framework stylesheet needs:
+rule sets, nested ``@media``/``@supports`` blocks and other at-rules, which
+are kept as they are. A selector is kept when every class it requires is
+in the given set; selectors without classes (elements, ``:root``) always
+stay.
+"""
+import re
+
+CLASS_RE = re.compile(r'\.(-?[_a-zA-Z][_a-zA-Z0-9-]*)')
+NOT_RE = re.compile(r':not\([^)]*\)')
+COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+CLASS_ATTR_RE = re.compile(r'class="([^"]*)"')
+TOKEN_RE = re.compile(r'^-?[_a-zA-Z][_a-zA-Z0-9-]*$')
+TEMPLATE_TAG_RE = re.compile(r'{[{%].*?[%}]}')
+NESTED_AT_RULES = ('@media', '@supports')
+
+
+def _closing_brace(css: str, start: int) -> int:
+    """
+    Index of the brace closing the block opened right before ``start``.
+    """
+    depth = 1
+    quote = None
+    for index in range(start, len(css)):
+        char = css[index]
+        if quote:
+            if char == quote and css[index - 1] != '\\':
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if not depth:
+                return index
+    raise ValueError('Unbalanced braces in stylesheet')
+
+
+def parse_rules(css: str):
+    """
+    Yield ``(prelude, body)`` for the top-level rules of ``css``.
+
+    Statements without a block, such as ``@charset``, have a None body.
+    """
+    position = 0
+    while position < len(css):
+        brace = css.find('{', position)
+        semicolon = css.find(';', position)
+        if brace == -1 and semicolon == -1:
+            break
+        if semicolon != -1 and (brace == -1 or semicolon < brace):
+            yield css[position:semicolon].strip(), None
+            position = semicolon + 1
+            continue
+        end = _closing_brace(css, brace + 1)
+        yield css[position:brace].strip(), css[brace + 1:end]
+        position = end + 1
+
+
+def split_selectors(prelude: str) -> list:
+    """
+    Split a selector list on commas outside of parentheses.
+    """
+    selectors, depth, current = [], 0, []
+    for char in prelude:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and not depth:
+            selectors.append(''.join(current))
+            current = []
+            continue
+        current.append(char)
+    selectors.append(''.join(current))
+    return [selector.strip() for selector in selectors if selector.strip()]
+
+
+def selector_used(selector: str, used: set) -> bool:
+    required = CLASS_RE.findall(NOT_RE.sub('', selector))
+    return all(name in used for name in required)
+
+
+def purge(css: str, used: set) -> str:
+    """
+    Return ``css`` without the selectors that need classes not in ``used``.
+    """
+    css = COMMENT_RE.sub('', css)
+    output = []
+    for prelude, body in parse_rules(css):
+        if body is None:
+            output.append(prelude + ';')
+        elif prelude.startswith(NESTED_AT_RULES):
+            inner = purge(body, used)
+            if inner:
+                output.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            output.append(f'{prelude}{{{body}}}')
+        else:
+            selectors = [
+                selector for selector in split_selectors(prelude)
+                if selector_used(selector, used)
+            ]
+            if selectors:
+                output.append(f'{",".join(selectors)}{{{body}}}')
+    return ''.join(output)
+
+
+def template_classes(text: str) -> set:
+    """
+    Class names used in the ``class`` attributes of a template.
+    """
+    classes = set()
+    for attribute in CLASS_ATTR_RE.findall(text):
+        # Classes switched by template tags count as used.
+        tokens = TEMPLATE_TAG_RE.sub(' ', attribute).split()
+        classes.update(token for token in tokens if TOKEN_RE.match(token))
+    return classes
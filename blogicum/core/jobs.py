@@ -0,0 +1,33 @@
+"""
+Periodic maintenance of project infrastructure.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from .mail import purge_sent, rotate_email_files
+from .scheduler import periodic
+from .tasks import purge_finished
+
+KEEP_FINISHED = timedelta(days=7)
+KEEP_EMAILS = timedelta(days=30)
+
+
+@periodic(timedelta(hours=1))
+def rotate_emails():
+    purge_sent(KEEP_EMAILS)
+    if settings.OUTBOX_EMAIL_BACKEND.endswith('filebased.EmailBackend'):
+        rotate_email_files(
+            settings.EMAIL_FILE_PATH, timedelta(days=1), KEEP_EMAILS)
+
+
+@periodic(timedelta(days=1))
+def clear_sessions():
+    Session.objects.filter(expire_date__lt=timezone.now()).delete()
+
+
+@periodic(timedelta(hours=6))
+def purge_tasks():
+    purge_finished(KEEP_FINISHED)
@@ -0,0 +1,439 @@
+"""
+Load generation against a running server.
+
+A minimal HTTP/1.1 client on asyncio streams: ``Pool`` keeps up to
+``size`` keep-alive connections and every request waits for a free one,
+so the pool size is the number of requests in flight. ``Session`` adds
+cookies and the CSRF header on top, as a browser of one virtual user
+would. ``Stats`` collects latencies per action into percentiles and a
+histogram with the buckets of ``/metrics``.
+
+``run_mix`` drives virtual users picking weighted actions in a loop;
+``replay`` sends the requests of an access log with their original
+spacing, scaled by ``speed``.
+"""
+import asyncio
+import bisect
+import random
+import re
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from .bench import percentile
+from .metrics import DEFAULT_BUCKETS
+
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+# Combined log format of nginx and Apache, and the runserver log.
+LOG_LINE = re.compile(
+    r'\[(?P<time>[^\]]+)\]\s+"(?P<method>[A-Z]+) (?P<target>\S+) '
+    r'HTTP/[\d.]+"\s+(?P<status>\d{3})')
+LOG_TIME_FORMATS = ('%d/%b/%Y:%H:%M:%S %z', '%d/%b/%Y %H:%M:%S')
+
+
+class UnexpectedResponse(Exception):
+    """
+    Raised by actions when a response means the action failed even
+    though its status is not an error, e.g. a login form shown again.
+    """
+
+    def __init__(self, response):
+        super().__init__(response.status)
+        self.response = response
+
+
+class Response:
+
+    def __init__(self, status: int, headers: dict, cookies: list,
+                 body: bytes):
+        self.status = status
+        self.headers = headers
+        self.cookies = cookies
+        self.body = body
+
+    def text(self) -> str:
+        return self.body.decode('utf-8', 'replace')
+
+
+class Connection:
+    """
+    One keep-alive connection to the server.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+        self.reused = False
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port)
+
+    @property
+    def closed(self) -> bool:
+        return self.writer is None or self.writer.is_closing()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    async def request(self, method: str, target: str, headers: dict,
+                      body: bytes) -> Response:
+        lines = [f'{method} {target} HTTP/1.1']
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        if body or method not in SAFE_METHODS:
+            lines.append(f'Content-Length: {len(body)}')
+        self.writer.write(
+            ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed by the server')
+        status = int(status_line.split()[1])
+        response_headers, cookies = {}, []
+        while True:
+            line = (await self.reader.readline()).decode('latin-1').rstrip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                cookies.append(value)
+            response_headers[name] = value
+        response_body = await self._read_body(
+            method, status, response_headers)
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        self.reused = True
+        return Response(status, response_headers, cookies, response_body)
+
+    async def _read_body(self, method: str, status: int,
+                         headers: dict) -> bytes:
+        if method == 'HEAD' or status in (204, 304) or status < 200:
+            return b''
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if not size:
+                    await self.reader.readline()
+                    return b''.join(chunks)
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+        if 'content-length' in headers:
+            return await self.reader.readexactly(
+                int(headers['content-length']))
+        body = await self.reader.read()
+        self.close()
+        return body
+
+
+class Pool:
+    """
+    Keep-alive connections shared by the virtual users.
+    """
+
+    def __init__(self, host: str, port: int, size: int,
+                 timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.opened = 0
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def _connection(self) -> Connection:
+        while self._idle:
+            connection = self._idle.pop()
+            if not connection.closed:
+                return connection
+        connection = Connection(self.host, self.port)
+        await connection.open()
+        self.opened += 1
+        return connection
+
+    async def request(self, method: str, target: str, headers=None,
+                      body: bytes = b'') -> Response:
+        headers = {'Host': self.host, **(headers or {})}
+        async with self._slots:
+            connection = await self._connection()
+            try:
+                try:
+                    response = await asyncio.wait_for(
+                        connection.request(method, target, headers, body),
+                        self.timeout)
+                except ConnectionResetError:
+                    # The server may have dropped an idle connection
+                    # before the request reached it, or after it ran:
+                    # only safe methods can be sent again.
+                    if not connection.reused or method not in SAFE_METHODS:
+                        raise
+                    connection.close()
+                    connection = Connection(self.host, self.port)
+                    await connection.open()
+                    self.opened += 1
+                    response = await asyncio.wait_for(
+                        connection.request(method, target, headers, body),
+                        self.timeout)
+            except BaseException:
+                connection.close()
+                raise
+            if not connection.closed:
+                self._idle.append(connection)
+            return response
+
+    def close(self):
+        for connection in self._idle:
+            connection.close()
+        self._idle.clear()
+
+
+class Session:
+    """
+    Cookies of one virtual user, sent with its requests.
+    """
+
+    def __init__(self, pool: Pool):
+        self.pool = pool
+        self.cookies = {}
+
+    async def request(self, method: str, target: str, data=None,
+                      headers=None) -> Response:
+        headers = dict(headers or {})
+        body = b''
+        if data is not None:
+            body = urlencode(data).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if method not in SAFE_METHODS and 'csrftoken' in self.cookies:
+            headers['X-CSRFToken'] = self.cookies['csrftoken']
+        if self.cookies:
+            headers['Cookie'] = '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items())
+        response = await self.pool.request(method, target, headers, body)
+        for header in response.cookies:
+            for name, morsel in SimpleCookie(header).items():
+                if morsel['max-age'] == '0':
+                    self.cookies.pop(name, None)
+                else:
+                    self.cookies[name] = morsel.value
+        return response
+
+    async def get(self, target: str, **kwargs) -> Response:
+        return await self.request('GET', target, **kwargs)
+
+    async def post(self, target: str, data: dict, **kwargs) -> Response:
+        return await self.request('POST', target, data=data, **kwargs)
+
+
+class Stats:
+    """
+    Latencies, statuses and errors of the requests by action.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = {}
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, action: str, latency: float, status=None,
+               error: str = None):
+        self.latencies.setdefault(action, []).append(latency)
+        self.statuses.setdefault(action, Counter())[status or error] += 1
+        if error is not None or status >= 400:
+            self.errors.setdefault(action, Counter())[
+                error or str(status)] += 1
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def histogram(self, latencies: list) -> list:
+        """
+        Requests per bucket, the last one counting those over all bounds.
+        """
+        counts = [0] * (len(self.buckets) + 1)
+        for latency in latencies:
+            counts[bisect.bisect_left(self.buckets, latency)] += 1
+        return counts
+
+    def summary(self) -> dict:
+        actions = {}
+        total = errors = 0
+        for action, latencies in self.latencies.items():
+            latencies = sorted(latencies)
+            failed = sum(self.errors.get(action, Counter()).values())
+            total += len(latencies)
+            errors += failed
+            actions[action] = {
+                'requests': len(latencies),
+                'errors': failed,
+                'error_rate': round(failed / len(latencies), 4),
+                'statuses': {
+                    str(status): count for status, count
+                    in sorted(self.statuses[action].items(), key=str)},
+                'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+                'p90_ms': round(percentile(latencies, 0.9) * 1000, 3),
+                'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+                'max_ms': round(latencies[-1] * 1000, 3),
+                'histogram': self.histogram(latencies),
+            }
+        return {
+            'requests': total,
+            'errors': errors,
+            'error_rate': round(errors / total, 4) if total else 0.0,
+            'elapsed_s': round(self.elapsed, 3),
+            'throughput_rps': round(total / self.elapsed, 2),
+            'buckets': list(self.buckets),
+            'actions': actions,
+        }
+
+
+# Failures of a request that count as errors rather than abort the run.
+REQUEST_ERRORS = (
+    UnexpectedResponse, OSError, asyncio.TimeoutError,
+    asyncio.IncompleteReadError, ValueError)
+
+
+def error_name(error: Exception) -> str:
+    if isinstance(error, UnexpectedResponse):
+        return f'unexpected {error.response.status}'
+    return type(error).__name__
+
+
+async def timed(stats: Stats, action: str, call):
+    """
+    Await ``call()``, recording its latency and outcome as ``action``.
+    """
+    started = time.perf_counter()
+    try:
+        response = await call()
+    except REQUEST_ERRORS as error:
+        stats.record(
+            action, time.perf_counter() - started, error=error_name(error))
+        return None
+    stats.record(action, time.perf_counter() - started, response.status)
+    return response
+
+
+async def run_mix(pool: Pool, actions: dict, weights: dict, users: int,
+                  duration: float, requests: int = None, seed: int = None,
+                  setup=None, setup_action: str = 'setup') -> Stats:
+    """
+    Run ``users`` virtual users, each calling actions picked by weight
+    with its own ``Session`` until ``duration`` seconds or ``requests``
+    actions in total have passed.
+
+    Actions are coroutine functions taking the session and a
+    ``random.Random`` and returning the last ``Response``. ``setup`` runs
+    once per session before the loop, e.g. to log in, and is not timed.
+    A user whose setup fails stops, with an error of ``setup_action``.
+    """
+    names = [name for name in actions if weights.get(name)]
+    cum_weights = []
+    for name in names:
+        cum_weights.append((cum_weights[-1] if cum_weights else 0)
+                           + weights[name])
+    stats = Stats()
+    deadline = time.perf_counter() + duration
+    remaining = [requests]
+
+    def more() -> bool:
+        if time.perf_counter() >= deadline:
+            return False
+        if remaining[0] is None:
+            return True
+        remaining[0] -= 1
+        return remaining[0] >= 0
+
+    async def user(number: int):
+        rng = random.Random(None if seed is None else seed + number)
+        session = Session(pool)
+        if setup is not None:
+            started = time.perf_counter()
+            try:
+                await setup(session, number)
+            except REQUEST_ERRORS as error:
+                stats.record(
+                    setup_action, time.perf_counter() - started,
+                    error=error_name(error))
+                return
+        while more():
+            name = rng.choices(names, cum_weights=cum_weights)[0]
+            await timed(stats, name, lambda: actions[name](session, rng))
+
+    stats.started = time.perf_counter()
+    await asyncio.gather(*(user(number) for number in range(users)))
+    stats.stop()
+    return stats
+
+
+def parse_access_log(lines) -> list:
+    """
+    ``(seconds since the first request, method, target)`` of the log
+    lines, in log order. Lines in other formats are skipped.
+    """
+    entries = []
+    first = None
+    for line in lines:
+        match = LOG_LINE.search(line)
+        if not match:
+            continue
+        moment = None
+        for time_format in LOG_TIME_FORMATS:
+            try:
+                moment = datetime.strptime(match['time'], time_format)
+                break
+            except ValueError:
+                continue
+        if moment is None:
+            continue
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        if first is None:
+            first = moment
+        entries.append((
+            (moment - first).total_seconds(), match['method'],
+            match['target']))
+    return entries
+
+
+async def replay(pool: Pool, entries: list, speed: float = 1.0,
+                 label=None) -> tuple:
+    """
+    Send the requests of ``entries`` at their logged offsets divided by
+    ``speed``; with ``speed`` 0 all are sent at once, limited by the pool.
+
+    Bodies are not logged, so only safe methods are replayed: the result
+    is the ``Stats`` by ``label(method, target)``, the method by default,
+    and the number of skipped entries.
+    """
+    stats = Stats()
+    skipped = 0
+    tasks = []
+    started = time.perf_counter()
+    for offset, method, target in entries:
+        if method not in SAFE_METHODS:
+            skipped += 1
+            continue
+        if speed:
+            delay = started + offset / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(timed(
+            stats, label(method, target) if label else method,
+            lambda method=method, target=target: pool.request(
+                method, target))))
+    stats.started = started
+    await asyncio.gather(*tasks)
+    stats.stop()
+    return stats, skipped
@@ -0,0 +1,181 @@
+"""
+Outbox for outgoing email.
+
+``OutboxBackend`` is the ``EMAIL_BACKEND``: sending messages from a view
+only stores them, fully rendered, in the ``OutgoingEmail`` table and
+defers a ``send_emails`` task for them in the same transaction. Workers
+of ``core.tasks`` deliver each batch through ``OUTBOX_EMAIL_BACKEND``
+over one connection; messages that fail make the task fail, so it is
+retried with backoff and sends only what is still queued.
+``rotate_email_files`` compresses and expires old files of the file
+backend in ``EMAIL_FILE_PATH``.
+"""
+import email
+import gzip
+import logging
+import os
+import shutil
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.message import EmailMessage, MIMEMixin
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutgoingEmail
+from .tasks import task
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+
+class DeliveryError(Exception):
+    """
+    Some messages of a batch could not be sent.
+    """
+
+
+class OutboxBackend(BaseEmailBackend):
+    """
+    Email backend storing messages in the outbox instead of sending them.
+    """
+
+    def send_messages(self, email_messages):
+        # One INSERT per message: bulk_create does not return the keys
+        # on SQLite, and views rarely send more than one.
+        ids = [
+            OutgoingEmail.objects.create(
+                from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+                recipients=message.recipients(),
+                subject=str(message.subject)[:255],
+                raw=message.message().as_bytes(),
+            ).pk
+            for message in email_messages
+            if message.recipients()
+        ]
+        if ids:
+            send_emails.defer(ids)
+        return len(ids)
+
+
+class StoredMIMEMessage(MIMEMixin, email.message.Message):
+    """
+    Parsed stored message that serializes like Django's own.
+    """
+
+
+class StoredEmailMessage(EmailMessage):
+    """
+    Message rebuilt from the outbox, with headers such as ``Date`` and
+    ``Message-ID`` kept from the moment it was queued.
+    """
+
+    def __init__(self, row: OutgoingEmail):
+        super().__init__(subject=row.subject, from_email=row.from_email)
+        self.row = row
+        self._recipients = list(row.recipients)
+
+    def recipients(self):
+        return self._recipients
+
+    def message(self):
+        return email.message_from_bytes(
+            bytes(self.row.raw), _class=StoredMIMEMessage)
+
+
+@task(max_attempts=MAX_ATTEMPTS)
+def send_emails(ids):
+    """
+    Deliver the queued messages among ``ids`` over one connection.
+    """
+    rows = list(OutgoingEmail.objects.filter(
+        pk__in=ids, status=OutgoingEmail.QUEUED))
+    if not rows:
+        return
+    sent, failed = send_batch(rows)
+    if failed:
+        raise DeliveryError(f'{failed} of {len(rows)} message(s) not sent')
+
+
+def send_batch(rows: list) -> tuple:
+    """
+    Deliver messages over a single connection; return (sent, failed).
+    """
+    sent = failed = 0
+    connection = get_connection(settings.OUTBOX_EMAIL_BACKEND)
+    try:
+        connection.open()
+    except Exception as error:
+        # Nothing can be delivered; the whole batch waits for a retry.
+        for row in rows:
+            _failed(row, error)
+        return 0, len(rows)
+    try:
+        for row in rows:
+            try:
+                connection.send_messages([StoredEmailMessage(row)])
+            except Exception as error:
+                _failed(row, error)
+                failed += 1
+            else:
+                OutgoingEmail.objects.filter(pk=row.pk).update(
+                    status=OutgoingEmail.SENT, sent_at=timezone.now(),
+                    error='', attempts=F('attempts') + 1)
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def _failed(row: OutgoingEmail, error: Exception):
+    attempts = row.attempts + 1
+    logger.warning('Cannot send email %s (attempt %s): %r',
+                   row.pk, attempts, error)
+    fields = {'attempts': attempts, 'error': repr(error)}
+    if attempts >= MAX_ATTEMPTS:
+        # The task gives up after as many attempts.
+        fields['status'] = OutgoingEmail.FAILED
+    OutgoingEmail.objects.filter(pk=row.pk).update(**fields)
+
+
+def rotate_email_files(directory, compress_after: timedelta,
+                       delete_after: timedelta) -> tuple:
+    """
+    Gzip files written by the file backend and delete expired ones.
+
+    Returns the number of compressed and deleted files.
+    """
+    if not os.path.isdir(directory):
+        return 0, 0
+    now = time.time()
+    compressed = deleted = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            age = now - entry.stat().st_mtime
+            if age > delete_after.total_seconds():
+                os.remove(entry.path)
+                deleted += 1
+            elif (entry.name.endswith('.log')
+                    and age > compress_after.total_seconds()):
+                with open(entry.path, 'rb') as source, gzip.open(
+                        entry.path + '.gz', 'wb') as target:
+                    shutil.copyfileobj(source, target)
+                # Keep the age of the messages for expiry.
+                os.utime(entry.path + '.gz', (now, entry.stat().st_mtime))
+                os.remove(entry.path)
+                compressed += 1
+    return compressed, deleted
+
+
+def purge_sent(older_than: timedelta) -> int:
+    deleted, _ = OutgoingEmail.objects.filter(
+        status=OutgoingEmail.SENT,
+        sent_at__lt=timezone.now() - older_than
+    ).delete()
+    return deleted
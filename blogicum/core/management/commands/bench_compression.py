@@ -0,0 +1,66 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import Client, RequestFactory
+
+from core import middleware
+
+CHUNK_SIZE = 4096
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the CPU time CompressionMiddleware adds per request, '
+        'for each available encoding, on pages rendered by the site.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*', default=['/'],
+            help='Pages to render and compress.')
+        parser.add_argument(
+            '--repeat', type=int, default=200,
+            help='Compressions per page and encoding.')
+
+    def handle(self, *args, **options):
+        encodings = ['gzip'] + (['br'] if middleware.brotli else [])
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        factory = RequestFactory()
+        compression = middleware.CompressionMiddleware(lambda request: None)
+        for path in options['paths']:
+            page = client.get(path)
+            body = page.content
+            self.stdout.write(
+                f'{path}: {page.status_code}, {len(body)} bytes')
+            for encoding in encodings:
+                request = factory.get(path, HTTP_ACCEPT_ENCODING=encoding)
+                for streaming in (False, True):
+                    size, cpu = self.measure(
+                        compression, request, body, streaming,
+                        options['repeat'])
+                    kind = 'streaming' if streaming else 'buffered'
+                    self.stdout.write(
+                        f'  {encoding:<4} {kind:<9} {size:>7} bytes '
+                        f'({size / max(len(body), 1):.0%}), '
+                        f'{cpu * 1000:.3f} ms CPU per request')
+
+    @staticmethod
+    def measure(compression, request, body, streaming, repeat):
+        size = 0
+        started = time.process_time()
+        for _ in range(repeat):
+            if streaming:
+                chunks = [
+                    body[start:start + CHUNK_SIZE]
+                    for start in range(0, len(body), CHUNK_SIZE)]
+                response = StreamingHttpResponse(chunks)
+            else:
+                response = HttpResponse(body)
+            response = compression.process_response(request, response)
+            if streaming:
+                size = sum(map(len, response.streaming_content))
+            else:
+                size = len(response.content)
+        return size, (time.process_time() - started) / repeat
@@ -0,0 +1,151 @@
+import asyncio
+import io
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+
+HANDLERS = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the throughput of blog pages served by the WSGI handler '
+        'with sync views and by the ASGI handler with async views. Each '
+        'handler runs in its own process with BLOG_ASYNC_VIEWS set.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*', default=['/'],
+            help='Pages requested in turn.')
+        parser.add_argument(
+            '--handler', choices=HANDLERS + ('both',), default='both')
+        parser.add_argument(
+            '--requests', type=int, default=500,
+            help='Requests per handler.')
+        parser.add_argument(
+            '--concurrency', type=int, default=16,
+            help='Requests in flight at once.')
+
+    def handle(self, *args, **options):
+        if options['handler'] == 'both':
+            for handler in HANDLERS:
+                self.run_in_subprocess(handler, options)
+            return
+        handler = options['handler']
+        if settings.BLOG_ASYNC_VIEWS != (handler == 'asgi'):
+            raise CommandError(
+                f'Run {handler} with BLOG_ASYNC_VIEWS='
+                f'{"1" if handler == "asgi" else "0"}.')
+        paths = [
+            options['paths'][number % len(options['paths'])]
+            for number in range(options['requests'])
+        ]
+        bench = self.bench_asgi if handler == 'asgi' else self.bench_wsgi
+        started = time.perf_counter()
+        statuses, latencies = bench(paths, options['concurrency'])
+        elapsed = time.perf_counter() - started
+        errors = sum(status != 200 for status in statuses)
+        latencies.sort()
+        self.stdout.write(
+            f'{handler}: {len(paths) / elapsed:.1f} req/s, '
+            f'p50 {statistics.median(latencies) * 1000:.1f} ms, '
+            f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms, '
+            f'{errors} non-200 response(s)'
+        )
+
+    def run_in_subprocess(self, handler: str, options: dict):
+        env = dict(
+            os.environ,
+            BLOG_ASYNC_VIEWS='1' if handler == 'asgi' else '0',
+            DJANGO_SETTINGS_MODULE=os.environ.get(
+                'DJANGO_SETTINGS_MODULE', 'blogicum.settings'),
+        )
+        command = [
+            sys.executable, '-m', 'django', 'bench_handlers',
+            *options['paths'], '--handler', handler,
+            '--requests', str(options['requests']),
+            '--concurrency', str(options['concurrency']),
+        ]
+        result = subprocess.run(
+            command, env=env, cwd=settings.BASE_DIR,
+            capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(result.stderr.strip())
+        self.stdout.write(result.stdout.rstrip())
+
+    @staticmethod
+    def host() -> str:
+        if settings.ALLOWED_HOSTS:
+            return settings.ALLOWED_HOSTS[0]
+        return 'localhost'
+
+    def bench_wsgi(self, paths, concurrency):
+        application = WSGIHandler()
+        host = self.host()
+
+        def request(path):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path,
+                'SCRIPT_NAME': '', 'QUERY_STRING': '',
+                'SERVER_NAME': host, 'SERVER_PORT': '80',
+                'HTTP_HOST': host, 'REMOTE_ADDR': '127.0.0.1',
+                'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+                'wsgi.url_scheme': 'http',
+            }
+            status = []
+            started = time.perf_counter()
+            response = application(
+                environ, lambda line, headers: status.append(line))
+            b''.join(response)
+            response.close()
+            return int(status[0].split()[0]), time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(request, paths))
+        return [status for status, _ in results], [
+            latency for _, latency in results]
+
+    def bench_asgi(self, paths, concurrency):
+        application = ASGIHandler()
+        host = self.host()
+
+        async def request(path, semaphore):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'},
+                'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+                'path': path, 'root_path': '', 'query_string': b'',
+                'headers': [(b'host', host.encode())],
+                'server': (host, 80), 'client': ('127.0.0.1', 50000),
+            }
+            status = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'',
+                        'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            async with semaphore:
+                started = time.perf_counter()
+                await application(scope, receive, send)
+                return status[0], time.perf_counter() - started
+
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(
+                *(request(path, semaphore) for path in paths))
+
+        results = asyncio.run(main())
+        return [status for status, _ in results], [
+            latency for _, latency in results]
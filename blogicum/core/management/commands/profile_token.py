@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Profile
+from core.profiling import HEADER, make_token
+
+
+class Command(BaseCommand):
+    help = (
+        f'Print a signed token for the {HEADER} header, which profiles a '
+        'request on behalf of a staff user without a session.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--mode', choices=dict(Profile.MODE_CHOICES),
+            default=Profile.SAMPLE)
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(
+            username=options['username'], is_staff=True).first()
+        if user is None:
+            raise CommandError(
+                f'Staff user {options["username"]} does not exist.')
+        self.stdout.write(make_token(user, options['mode']))
@@ -0,0 +1,66 @@
+import signal
+import threading
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.models import ScheduledJob
+from core.scheduler import (
+    LEADER_LEASE, autodiscover, release_lease, run_due_jobs, sync_jobs)
+from core.tasks import worker_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Run periodic maintenance jobs. Start it on every node: only the '
+        'holder of the scheduler lease runs jobs, the others stand by.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tick', type=float, default=5,
+            help='Seconds between checks for due jobs.')
+        parser.add_argument(
+            '--lease', type=float, default=60,
+            help='Seconds leadership lasts without renewal.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Run the due jobs once and exit.')
+        parser.add_argument(
+            '--list', action='store_true',
+            help='Print the jobs with their statistics.')
+
+    def handle(self, *args, **options):
+        autodiscover()
+        sync_jobs()
+        if options['list']:
+            self.print_jobs()
+            return
+        holder = worker_name()
+        lease = timedelta(seconds=options['lease'])
+        if options['once']:
+            ran = run_due_jobs(holder, lease)
+            self.stdout.write(f'Ran {ran} job(s).')
+            return
+
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+        self.stdout.write(f'Scheduler {holder} started.')
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                run_due_jobs(holder, lease)
+                stop.wait(options['tick'])
+        finally:
+            # Let a standby node take over without waiting for expiry.
+            release_lease(LEADER_LEASE, holder)
+
+    def print_jobs(self):
+        for job in ScheduledJob.objects.all():
+            self.stdout.write(
+                f'{job.name}: next {job.next_run_at:%Y-%m-%d %H:%M:%S}, '
+                f'{job.runs} run(s), {job.failures} failure(s), '
+                f'last {job.last_duration:.2f}s'
+                + (f', error {job.last_error}' if job.last_error else ''))
@@ -0,0 +1,82 @@
+import signal
+import subprocess
+import sys
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.tasks import autodiscover, queue_stats, run_due, work, worker_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Run background task workers: threads in this process and, '
+        'with --processes, as many extra worker processes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Worker threads per process.')
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Worker processes, this one included.')
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Seconds an idle worker waits before polling again.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Run the due tasks in this thread and exit.')
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Only print the number of tasks per status.')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(
+                'Queued: {queued}, running: {running}, done: {done}, '
+                'failed: {failed}; oldest due task waits {oldest_wait:.1f}s'
+                .format(**queue_stats()))
+            return
+        autodiscover()
+        if options['once']:
+            processed = run_due()
+            self.stdout.write(f'Processed {processed} task(s).')
+            return
+
+        children = [
+            subprocess.Popen(
+                [sys.executable, '-m', 'django', 'run_workers',
+                 '--workers', str(options['workers']),
+                 '--poll', str(options['poll'])],
+                cwd=settings.BASE_DIR)
+            for _ in range(options['processes'] - 1)
+        ]
+        stop = threading.Event()
+
+        def shutdown(signum, frame):
+            # Running tasks finish; their leases are released normally.
+            stop.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        threads = [
+            threading.Thread(
+                target=work, args=(worker_name(index), stop, options['poll']),
+                name=f'task-worker-{index}')
+            for index in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(
+            f'Started {len(threads)} worker thread(s) '
+            f'and {len(children)} extra process(es).')
+        while not stop.wait(1):
+            pass
+        for child in children:
+            child.terminate()
+        for thread in threads:
+            thread.join()
+        for child in children:
+            child.wait()
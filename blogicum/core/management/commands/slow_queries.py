@@ -0,0 +1,87 @@
+import json
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+SORT_KEYS = ('total', 'count', 'max')
+
+
+class Command(BaseCommand):
+    help = (
+        'Aggregate the slow query log by normalized statement and print '
+        'the top offenders with their views and latest plan.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file', default=None,
+            help='Log file, SLOW_QUERY_LOG_FILE by default.')
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument(
+            '--sort', choices=SORT_KEYS, default='total',
+            help='Rank by total time, number of occurrences or worst time.')
+        parser.add_argument(
+            '--since', type=float, default=None,
+            help='Only entries from the last N hours.')
+        parser.add_argument(
+            '--no-plan', action='store_true',
+            help='Do not print query plans.')
+
+    def handle(self, *args, **options):
+        path = options['file'] or settings.SLOW_QUERY_LOG_FILE
+        cutoff = None
+        if options['since'] is not None:
+            cutoff = timezone.now() - timedelta(hours=options['since'])
+        try:
+            groups = self.aggregate(path, cutoff)
+        except FileNotFoundError:
+            raise CommandError(f'No slow query log at {path}.')
+        ranked = sorted(
+            groups.values(), key=lambda group: group[options['sort']],
+            reverse=True)[:options['top']]
+        if not ranked:
+            self.stdout.write('No slow queries logged.')
+        for number, group in enumerate(ranked, 1):
+            views = ', '.join(
+                f'{view or "-"} ({count})' for view, count in sorted(
+                    group['views'].items(), key=lambda item: -item[1]))
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{number}. {group["fingerprint"]}: {group["count"]} times, '
+                f'total {group["total"]:.0f} ms, '
+                f'avg {group["total"] / group["count"]:.1f} ms, '
+                f'max {group["max"]:.1f} ms, '
+                f'{len(group["params"])} distinct params'))
+            self.stdout.write(f'   views: {views}')
+            self.stdout.write(f'   {group["sql"]}')
+            if group['plan'] and not options['no_plan']:
+                for line in group['plan'].splitlines():
+                    self.stdout.write(f'   | {line}')
+
+    @staticmethod
+    def aggregate(path, cutoff) -> dict:
+        groups = defaultdict(lambda: {
+            'count': 0, 'total': 0.0, 'max': 0.0, 'views': defaultdict(int),
+            'params': set(), 'plan': '', 'sql': '', 'fingerprint': ''})
+        with open(path, encoding='utf-8') as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if cutoff and parse_datetime(entry['time']) < cutoff:
+                    continue
+                group = groups[entry['fingerprint']]
+                group['fingerprint'] = entry['fingerprint']
+                group['sql'] = entry['sql']
+                group['count'] += 1
+                group['total'] += entry['duration_ms']
+                group['max'] = max(group['max'], entry['duration_ms'])
+                group['views'][entry['view']] += 1
+                group['params'].add(entry['params_fingerprint'])
+                if entry.get('plan'):
+                    group['plan'] = entry['plan']
+        return groups
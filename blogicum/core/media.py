@@ -0,0 +1,219 @@
+"""
+Serving of uploaded media outside of DEBUG.
+
+After the access check the file is either handed off to the front web
+server (``X-Accel-Redirect`` for nginx, ``X-Sendfile`` for Apache and
+lighttpd) or streamed by Django. Streamed files go through
+``FileResponse``, which the WSGI server passes to ``wsgi.file_wrapper``;
+servers such as gunicorn then copy the bytes with ``os.sendfile`` without
+reading them into Python. Single byte ranges, ``ETag``/``If-None-Match``
+and long-lived caching of content-addressed names are supported.
+"""
+import mimetypes
+import os
+import re
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .storage import is_hashed_name
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+MUTABLE_CACHE = 'public, max-age=3600'
+
+
+class RangeFile:
+    """
+    File object exposing at most ``length`` bytes from its position.
+
+    ``fileno`` is kept so WSGI servers can still use ``sendfile``.
+    """
+
+    def __init__(self, fh, length: int):
+        self.fh = fh
+        self.remaining = length
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self) -> int:
+        return self.fh.fileno()
+
+    def tell(self) -> int:
+        return self.fh.tell()
+
+    def close(self):
+        self.fh.close()
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single ``Range`` header into inclusive byte offsets.
+
+    Returns None for headers that should be ignored (multiple or malformed
+    ranges) and raises ValueError for unsatisfiable ones.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        suffix = int(end)
+        if not suffix:
+            raise ValueError(header)
+        return max(0, size - suffix), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def make_etag(name: str, stat: os.stat_result) -> str:
+    if is_hashed_name(name):
+        return '"%s"' % os.path.basename(name).split('.')[0]
+    return '"%x-%x"' % (int(stat.st_mtime), stat.st_size)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+
+def _requested_range(request, etag: str, size: int):
+    """
+    The byte range asked for, if ``If-Range`` still matches the file.
+
+    Raises ValueError for unsatisfiable ranges.
+    """
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if not range_header or (if_range and if_range != etag):
+        return None
+    return parse_range(range_header, size)
+
+
+def _sendfile_response(name: str, full_path: str, content_type: str):
+    """
+    Empty response handing the file off to the front server, which
+    reads it itself, ranges included.
+    """
+    response = HttpResponse(content_type=content_type)
+    # Legacy uploads may have spaces or non-ASCII names; header values
+    # must be ASCII and both servers decode percent-escapes.
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = quote(
+            settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + name)
+    else:
+        response['X-Sendfile'] = quote(full_path)
+    return response
+
+
+def _streamed_response(full_path: str, size: int, byte_range,
+                       content_type: str):
+    """
+    Response streaming the file, or the requested range of it, through
+    ``wsgi.file_wrapper``.
+    """
+    fh = open(full_path, 'rb')
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+    fh.seek(start)
+    response = FileResponse(RangeFile(fh, length), content_type=content_type)
+    response['Content-Length'] = str(length)
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+def file_response(request, name: str, full_path: str):
+    """
+    Build the response for a media file, honouring caching and ranges.
+    """
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404('Файл не найден')
+    etag = make_etag(name, stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': (
+            IMMUTABLE_CACHE if is_hashed_name(name) else MUTABLE_CACHE),
+        'Accept-Ranges': 'bytes',
+    }
+    if _etag_matches(request.headers.get('If-None-Match', ''), etag):
+        response = HttpResponse(status=304)
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    size = stat.st_size
+    try:
+        byte_range = _requested_range(request, etag, size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    if settings.MEDIA_SENDFILE:
+        response = _sendfile_response(name, full_path, content_type)
+    else:
+        response = _streamed_response(
+            full_path, size, byte_range, content_type)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def _can_access(request, name: str) -> bool:
+    """
+    Originals of hidden posts are only shown to their authors and staff.
+
+    Renditions and other files have unguessable content-hash names
+    and are not checked.
+    """
+    from blog.models import Post
+
+    if Post.public_objects.filter(image=name).exists():
+        return True
+    posts = Post.objects.filter(image=name)
+    if not posts.exists():
+        return True
+    user = request.user
+    return user.is_staff or posts.filter(author_id=user.pk).exists()
+
+
+@require_safe
+def serve_media(request, path: str):
+    """
+    View serving files from ``MEDIA_ROOT``.
+    """
+    name = path.replace('\\', '/')
+    if any(part.startswith('.') for part in name.split('/')):
+        raise Http404('Файл не найден')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404('Файл не найден')
+    if not os.path.isfile(full_path) or not _can_access(request, name):
+        raise Http404('Файл не найден')
+    return file_response(request, name, full_path)
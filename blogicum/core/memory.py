@@ -0,0 +1,166 @@
+"""
+Allocation tracing of requests with ``tracemalloc``.
+
+``Tracing`` traces the allocations made in its block: the peak of
+traced memory, what is still allocated at the end and, grouped by site,
+the lines that allocated it. For a template response that includes the
+context, so querysets and their model instances show up. With
+``MEMORY_PROFILE_FRAMES`` above 1 each line also gets the innermost
+project code that called it, e.g. the view building a queryset; deeper
+tracebacks make tracing much slower still.
+
+``MemoryProfilingMiddleware`` traces a sampled share of the requests,
+``MEMORY_PROFILE_SAMPLE_RATE``, none by default: tracing slows the
+interpreter down several times. The peaks go to ``/metrics`` and requests
+peaking above ``MEMORY_PROFILE_LOG_KIB`` are logged with their top sites.
+``tracemalloc`` is global to the process, so one request is traced at a
+time and allocations of other threads meanwhile are counted too.
+"""
+import linecache
+import logging
+import os
+import threading
+import tracemalloc
+
+from django.conf import settings
+
+from . import context, metrics
+from .profiling import short_path
+
+logger = logging.getLogger(__name__)
+
+_busy = threading.Lock()
+
+MIDDLEWARE_FILE = os.path.join(os.path.dirname(__file__), 'middleware.py')
+IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+)
+
+
+def _project_path(filename: str):
+    base = str(settings.BASE_DIR) + os.sep
+    if filename.startswith(base) and filename != MIDDLEWARE_FILE:
+        return filename[len(base):]
+    return None
+
+
+def frame_label(frame) -> str:
+    path = _project_path(frame.filename) or short_path(frame.filename)
+    return f'{path}:{frame.lineno}'
+
+
+def caller_of(traceback):
+    """
+    The innermost frame of project code below the middleware, if the
+    traceback is deep enough to reach it.
+    """
+    for frame in reversed(traceback):
+        if _project_path(frame.filename) is not None:
+            return frame_label(frame)
+    return None
+
+
+def top_sites(snapshot, limit: int) -> list:
+    """
+    Lines holding the most memory in ``snapshot``, largest first, with
+    the project code that called them.
+    """
+    sites = {}
+    for stat in snapshot.filter_traces(IGNORED).statistics('traceback'):
+        key = (frame_label(stat.traceback[-1]), caller_of(stat.traceback))
+        size, count = sites.get(key, (0, 0))
+        sites[key] = (size + stat.size, count + stat.count)
+    top = sorted(sites.items(), key=lambda item: item[1][0], reverse=True)
+    return [
+        {
+            'site': site,
+            'caller': caller,
+            'size_kib': round(size / 1024, 1),
+            'count': count,
+        }
+        for (site, caller), (size, count) in top[:limit]
+    ]
+
+
+class Result:
+
+    def __init__(self):
+        self.peak = 0
+        self.retained = 0
+        self.snapshot = None
+
+    def top(self, limit: int) -> list:
+        if self.snapshot is None:
+            return []
+        return top_sites(self.snapshot, limit)
+
+
+class Tracing:
+    """
+    Context manager tracing the allocations of its block.
+
+    With ``snapshot`` the allocations still alive at the end of the block
+    are kept for ``Result.top``; taking it costs as much as a request, so
+    it is skipped when the peak stays below ``snapshot_above`` bytes.
+    """
+
+    def __init__(self, frames: int = None, snapshot: bool = True,
+                 snapshot_above: int = 0):
+        self.frames = frames or settings.MEMORY_PROFILE_FRAMES
+        self.snapshot = snapshot
+        self.snapshot_above = snapshot_above
+        self.result = Result()
+
+    def __enter__(self) -> Result:
+        self.start()
+        return self.result
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        if tracemalloc.is_tracing():
+            raise RuntimeError('tracemalloc is already tracing.')
+        tracemalloc.start(self.frames)
+
+    def stop(self):
+        try:
+            self.result.retained, self.result.peak = (
+                tracemalloc.get_traced_memory())
+            if self.snapshot and self.result.peak >= self.snapshot_above:
+                self.result.snapshot = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+
+
+def claim() -> bool:
+    """
+    Reserve tracing for the current request; ``release`` frees it.
+    """
+    if tracemalloc.is_tracing():
+        return False
+    return _busy.acquire(blocking=False)
+
+
+def release():
+    _busy.release()
+
+
+def report(request, response, result: Result):
+    route = context.view_name() or 'unmatched'
+    metrics.MEMORY_PEAK.observe(result.peak, route=route)
+    if result.peak < settings.MEMORY_PROFILE_LOG_KIB * 1024:
+        return
+    sites = '\n'.join(
+        f'  {site["size_kib"]:>10.1f} KiB {site["count"]:>7} blocks  '
+        f'{site["site"]}'
+        + (f' from {site["caller"]}' if site['caller'] else '')
+        for site in result.top(settings.MEMORY_PROFILE_TOP))
+    logger.warning(
+        'Memory peak of %.1f KiB in %s %s (%s), %.1f KiB still '
+        'allocated:\n%s',
+        result.peak / 1024, request.method, request.get_full_path(), route,
+        result.retained / 1024, sites)
@@ -0,0 +1,284 @@
+"""
+Metrics registry with Prometheus text output.
+
+Counters and histograms are kept per process and merged about once per
+``METRICS_FLUSH_INTERVAL`` seconds into ``METRICS_FILE``, a JSON file
+shared by all worker processes and updated under an exclusive lock, so
+the ``/metrics`` view reports the totals of every process, including
+ones that have exited. Gauges set in code keep the last value written
+by any process. Values that live in the database, such as queue depths,
+come from collectors called at scrape time; apps register them in their
+``metrics`` module.
+"""
+import json
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import autodiscover_modules
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+        '\n', r'\n')
+
+
+def format_labels(pairs) -> str:
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    type = None
+
+    def __init__(self, registry, name: str, help_text: str, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _pairs(self, labels: dict) -> list:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f'{self.name} expects labels {self.labelnames}, '
+                f'got {tuple(labels)}')
+        return [(name, labels[name]) for name in self.labelnames]
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        self.registry.add(
+            self.name, self.name + format_labels(self._pairs(labels)), amount)
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        self.registry.set(
+            self.name, self.name + format_labels(self._pairs(labels)), value)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, registry, name, help_text, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        pairs = self._pairs(labels)
+        # Buckets are stored cumulative, so merging is a plain sum.
+        samples = [
+            (f'{self.name}_bucket'
+             + format_labels(pairs + [('le', format_value(bound))]), 1)
+            for bound in self.buckets if value <= bound
+        ]
+        samples.append((f'{self.name}_sum' + format_labels(pairs), value))
+        samples.append((f'{self.name}_count' + format_labels(pairs), 1))
+        self.registry.add_many(self.name, samples)
+
+
+class GaugeFamily:
+    """
+    Gauge values produced by a collector at scrape time.
+    """
+    type = 'gauge'
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.samples = {}
+
+    def add(self, value: float, **labels):
+        pairs = [(name, labels[name]) for name in self.labelnames]
+        self.samples[self.name + format_labels(pairs)] = value
+        return self
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self._added = {}
+        self._set = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._discovered = False
+
+    def _register(self, metric: Metric) -> Metric:
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self._register(Counter(self, name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()) -> Gauge:
+        return self._register(Gauge(self, name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(),
+                  buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(
+            Histogram(self, name, help_text, labelnames, buckets))
+
+    def collector(self, func):
+        """
+        Register a function returning ``GaugeFamily`` objects.
+        """
+        self.collectors.append(func)
+        return func
+
+    def add(self, family: str, sample: str, amount: float):
+        with self._lock:
+            samples = self._added.setdefault(family, {})
+            samples[sample] = samples.get(sample, 0) + amount
+
+    def add_many(self, family: str, samples):
+        with self._lock:
+            pending = self._added.setdefault(family, {})
+            for sample, amount in samples:
+                pending[sample] = pending.get(sample, 0) + amount
+
+    def set(self, family: str, sample: str, value: float):
+        with self._lock:
+            self._set.setdefault(family, {})[sample] = value
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= (
+                settings.METRICS_FLUSH_INTERVAL):
+            self.flush()
+
+    def flush(self) -> dict:
+        """
+        Merge pending values into the shared file and return its content.
+        """
+        with self._lock:
+            added, self._added = self._added, {}
+            values, self._set = self._set, {}
+            self._last_flush = time.monotonic()
+        path = settings.METRICS_FILE
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, 'r+', encoding='utf-8') as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                data = json.loads(fh.read() or '{}')
+            except ValueError:
+                data = {}
+            for family, samples in added.items():
+                stored = data.setdefault(family, {})
+                for sample, amount in samples.items():
+                    stored[sample] = stored.get(sample, 0) + amount
+            for family, samples in values.items():
+                data.setdefault(family, {}).update(samples)
+            if added or values:
+                fh.seek(0)
+                fh.truncate()
+                json.dump(data, fh)
+                fh.flush()
+            # Closing the file releases the lock.
+        return data
+
+    def collect(self) -> list:
+        if not self._discovered:
+            autodiscover_modules('metrics')
+            self._discovered = True
+        families = []
+        for collector in self.collectors:
+            families.extend(collector())
+        return families
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        data = self.flush()
+        lines = []
+        families = [
+            (metric, data.get(name, {}))
+            for name, metric in sorted(self.metrics.items())
+        ] + [(family, family.samples) for family in self.collect()]
+        for family, samples in families:
+            lines.append(f'# HELP {family.name} {family.help}')
+            lines.append(f'# TYPE {family.name} {family.type}')
+            # Insertion order keeps the buckets of a histogram in order.
+            for sample, value in samples.items():
+                lines.append(f'{sample} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    'http_requests_total', 'HTTP requests by route, method and status.',
+    ('route', 'method', 'status'))
+LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'Request latency by route and status.',
+    ('route', 'status'))
+MEMORY_PEAK = registry.histogram(
+    'http_request_memory_peak_bytes',
+    'Peak memory allocated by requests traced with tracemalloc, by route.',
+    ('route',),
+    buckets=tuple(2 ** power * 1024 for power in range(6, 19, 2)))
+DB_QUERIES = registry.counter(
+    'db_queries_total', 'Database queries by connection alias.', ('alias',))
+
+
+def count_query(execute, sql, params, many, context):
+    DB_QUERIES.inc(alias=context['connection'].alias)
+    return execute(sql, params, many, context)
+
+
+def instrument_new_connection(sender, connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+@registry.collector
+def task_queues():
+    from .models import OutgoingEmail, Task
+    from .tasks import queue_stats
+
+    stats = queue_stats()
+    tasks = GaugeFamily('tasks', 'Background tasks by status.', ('status',))
+    for status, _ in Task.STATUS_CHOICES:
+        tasks.add(stats[status], status=status)
+    outbox = GaugeFamily(
+        'outbox_emails', 'Outgoing email by status.', ('status',))
+    for status, _ in OutgoingEmail.STATUS_CHOICES:
+        outbox.add(
+            OutgoingEmail.objects.filter(status=status).count(),
+            status=status)
+    return [
+        tasks,
+        GaugeFamily(
+            'tasks_oldest_wait_seconds', 'Age of the oldest due task.'
+        ).add(stats['oldest_wait']),
+        outbox,
+    ]
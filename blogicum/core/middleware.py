@@ -0,0 +1,351 @@
+"""
+Project middleware.
+"""
+import asyncio
+import random
+import re
+import time
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from . import context, memory, metrics, nplusone, profiling, timing
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/|application/(json|javascript|xml|xhtml\+xml|rss\+xml)'
+    r'|image/svg\+xml)'
+)
+ACCEPT_TOKEN_RE = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q=([\d.]+))?\s*$')
+# Smaller bodies fit in a packet anyway and are not worth the CPU.
+MIN_SIZE = 512
+GZIP_LEVEL = 6
+# Brotli quality 4-5 is close to gzip -6 in CPU and beats it in size.
+BROTLI_QUALITY = 5
+
+
+def accepted_encodings(header: str) -> set:
+    """
+    Content codings of an ``Accept-Encoding`` header, without q=0 ones.
+    """
+    accepted = set()
+    for token in header.split(','):
+        match = ACCEPT_TOKEN_RE.match(token)
+        if not match:
+            continue
+        coding, quality = match.groups()
+        try:
+            if quality is not None and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.lower())
+    return accepted
+
+
+def choose_encoding(header: str):
+    accepted = accepted_encodings(header)
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def _gzip_compressor():
+    # 16 + MAX_WBITS writes the gzip header and trailer.
+    return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    compressor = _gzip_compressor()
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding: str):
+    """
+    Compress an iterable of chunks, flushing after each one so every chunk
+    reaches the client as soon as it is produced.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    compressor = _gzip_compressor()
+    for chunk in chunks:
+        data = (compressor.compress(chunk)
+                + compressor.flush(zlib.Z_SYNC_FLUSH))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress text responses with brotli or gzip.
+
+    Small, non-text, partial and already encoded bodies are left alone.
+    Streaming responses are compressed chunk by chunk, never buffered.
+    """
+
+    def process_response(self, request, response):
+        if (response.has_header('Content-Encoding')
+                or response.has_header('Content-Range')
+                or response.status_code in (204, 304)
+                or not COMPRESSIBLE_TYPES.match(
+                    response.get('Content-Type', ''))):
+            return response
+        if not response.streaming and len(response.content) < MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            compressed = compress_bytes(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The representation changed, so a strong validator no longer holds.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+
+def sampled(rate: float) -> bool:
+    """
+    Whether to pick the current request, for a share ``rate`` from 0 to 1.
+    """
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+class HookMiddleware:
+    """
+    Base of middleware running hooks around the rest of the chain, in
+    sync and async stacks alike.
+
+    ``before`` returns the state of the request for ``after``, or None to
+    leave the request alone. ``after`` runs even if the chain raised, with
+    ``response`` None then, so it can reset what ``before`` set.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function, as
+            # MiddlewareMixin does, so Django awaits it.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state = self.before(request)
+        if state is None:
+            return self.get_response(request)
+        response = None
+        try:
+            response = self.get_response(request)
+        finally:
+            response = self.after(request, response, state)
+        return response
+
+    async def __acall__(self, request):
+        state = self.before(request)
+        if state is None:
+            return await self.get_response(request)
+        response = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            response = self.after(request, response, state)
+        return response
+
+    def before(self, request):
+        return None
+
+    def after(self, request, response, state):
+        return response
+
+
+class RequestContextMiddleware(HookMiddleware):
+    """
+    Make the current request available through ``core.context``.
+    """
+
+    def before(self, request):
+        return context.activate(request)
+
+    def after(self, request, response, token):
+        context.deactivate(token)
+        return response
+
+
+class ServerTimingMiddleware(HookMiddleware):
+    """
+    Measure database, template and total time of sampled requests.
+
+    The timings are sent in a ``Server-Timing`` header and logged as one
+    JSON line, each switchable in the settings.
+    """
+
+    def before(self, request):
+        if not sampled(settings.SERVER_TIMING_SAMPLE_RATE):
+            return None
+        if not self.is_async:
+            for connection in connections.all():
+                timing.instrument(connection)
+        request_timing = timing.RequestTiming()
+        return request_timing, timing.activate(request_timing)
+
+    def after(self, request, response, state):
+        request_timing, token = state
+        timing.deactivate(token)
+        if response is None:
+            return None
+        total = request_timing.elapsed()
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = request_timing.header(total)
+        if settings.SERVER_TIMING_LOG:
+            timing.log_request(request, response, request_timing, total)
+        return response
+
+    def process_template_response(self, request, response):
+        request_timing = timing.current()
+        if request_timing is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: request_timing.add(
+                    'tpl', time.perf_counter() - started))
+        return response
+
+
+class MetricsMiddleware(HookMiddleware):
+    """
+    Count requests and observe their latency per URL name and status.
+    """
+
+    def before(self, request):
+        return time.perf_counter()
+
+    def after(self, request, response, started):
+        if response is not None:
+            self.record(request, response, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def record(request, response, duration: float):
+        match = getattr(request, 'resolver_match', None)
+        # Raw paths would make the number of series unbounded.
+        route = match.view_name if match else 'unmatched'
+        status = str(response.status_code)
+        metrics.REQUESTS.inc(
+            route=route, method=request.method, status=status)
+        metrics.LATENCY.observe(duration, route=route, status=status)
+        metrics.registry.maybe_flush()
+
+
+class ProfilingMiddleware(HookMiddleware):
+    """
+    Run requests flagged by staff users under the profiler.
+
+    The profiler has to wrap the call of the chain itself, so this one
+    replaces the calls instead of using the hooks.
+    """
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if profiling.wanted(request):
+            allowed = profiling.requested(request)
+            if allowed is not None:
+                return profiling.profile_request(
+                    request, self.get_response, *allowed)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if profiling.wanted(request):
+            allowed = await sync_to_async(profiling.requested)(request)
+            if allowed is not None:
+                user, _ = allowed
+                return await profiling.aprofile_request(
+                    request, self.get_response, user)
+        return await self.get_response(request)
+
+
+class NPlusOneMiddleware(HookMiddleware):
+    """
+    Report queries repeated row by row within sampled requests.
+    """
+
+    def before(self, request):
+        if not sampled(settings.NPLUSONE_SAMPLE_RATE):
+            return None
+        return nplusone.activate()
+
+    def after(self, request, response, state):
+        tracker, token = state
+        nplusone.deactivate(token)
+        if response is not None:
+            nplusone.report(tracker)
+        return response
+
+
+class MemoryProfilingMiddleware(HookMiddleware):
+    """
+    Trace the allocations of sampled requests with ``tracemalloc``.
+
+    Streaming responses are rendered after the middleware returns, so
+    only their setup is traced.
+    """
+
+    def before(self, request):
+        if (not sampled(settings.MEMORY_PROFILE_SAMPLE_RATE)
+                or not memory.claim()):
+            return None
+        # Only requests that get logged need the allocation sites.
+        tracing = memory.Tracing(
+            snapshot_above=settings.MEMORY_PROFILE_LOG_KIB * 1024)
+        try:
+            tracing.start()
+        except RuntimeError:
+            # Something outside the middleware, e.g. a benchmark, traces.
+            memory.release()
+            return None
+        return tracing
+
+    def after(self, request, response, tracing):
+        try:
+            tracing.stop()
+        finally:
+            memory.release()
+        if response is not None:
+            memory.report(request, response, tracing.result)
+        return response
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.24 on 2026-10-19 08:28
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Lease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Название')),
+                ('holder', models.CharField(blank=True, max_length=100, verbose_name='Владелец')),
+                ('expires_at', models.DateTimeField(verbose_name='Истекает')),
+            ],
+            options={
+                'verbose_name': 'блокировка',
+                'verbose_name_plural': 'Блокировки',
+            },
+        ),
+        migrations.CreateModel(
+            name='ScheduledJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True, verbose_name='Задание')),
+                ('next_run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Следующий запуск')),
+                ('last_started_at', models.DateTimeField(blank=True, null=True, verbose_name='Последний запуск')),
+                ('last_duration', models.FloatField(default=0, verbose_name='Длительность, с')),
+                ('runs', models.PositiveIntegerField(default=0, verbose_name='Запусков')),
+                ('failures', models.PositiveIntegerField(default=0, verbose_name='Ошибок')),
+                ('last_error', models.TextField(blank=True, verbose_name='Ошибка')),
+            ],
+            options={
+                'verbose_name': 'периодическое задание',
+                'verbose_name_plural': 'Периодические задания',
+                'ordering': ('name',),
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.24 on 2026-10-19 08:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0004_lease_scheduledjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Снят')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.CharField(max_length=500, verbose_name='Путь')),
+                ('view', models.CharField(blank=True, max_length=200, verbose_name='Представление')),
+                ('status', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('mode', models.CharField(choices=[('sample', 'Сэмплирование'), ('cprofile', 'cProfile')], max_length=10, verbose_name='Профилировщик')),
+                ('duration', models.FloatField(verbose_name='Длительность, с')),
+                ('samples', models.PositiveIntegerField(default=0, verbose_name='Сэмплов')),
+                ('stacks_file', models.CharField(help_text='Свёрнутые стеки для flamegraph.pl или speedscope.', max_length=255, verbose_name='Файл стеков')),
+                ('top', models.JSONField(default=list, verbose_name='Самые затратные функции')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Запросил')),
+            ],
+            options={
+                'verbose_name': 'профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ('-created_at',),
+            },
+        ),
+    ]
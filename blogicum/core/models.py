@@ -0,0 +1,272 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class MediaFile(models.Model):
+    """
+    Model recording a stored content-addressed media file.
+    """
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Имя файла'
+    )
+    size = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Размер, байт'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Добавлено'
+    )
+
+    class Meta:
+        verbose_name = 'медиафайл'
+        verbose_name_plural = 'Медиафайлы'
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class Task(models.Model):
+    """
+    Model representing a deferred call of a function registered with
+    ``core.tasks.task``.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(max_length=200, verbose_name='Задача')
+    args = models.JSONField(default=list, verbose_name='Аргументы')
+    kwargs = models.JSONField(
+        default=dict,
+        verbose_name='Именованные аргументы'
+    )
+    priority = models.SmallIntegerField(
+        default=0,
+        verbose_name='Приоритет',
+        help_text='Задачи с большим приоритетом выполняются раньше.'
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попытки'
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=5,
+        verbose_name='Максимум попыток'
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Выполнить после'
+    )
+    locked_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Занята до'
+    )
+    worker = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Обработчик'
+    )
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Добавлено'
+    )
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'tasks'
+        ordering = ('-priority', 'run_at', 'pk')
+        indexes = (
+            models.Index(
+                fields=('status', 'priority', 'run_at'),
+                name='tasks_due_idx'
+            ),
+        )
+        verbose_name = 'фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+
+    def __str__(self) -> str:
+        return f'{self.name}: {self.get_status_display()}'
+
+
+class OutgoingEmail(models.Model):
+    """
+    Model representing a message waiting in the outbox to be delivered.
+    """
+    QUEUED = 'queued'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    from_email = models.CharField(max_length=254, verbose_name='Отправитель')
+    recipients = models.JSONField(default=list, verbose_name='Получатели')
+    subject = models.CharField(max_length=255, verbose_name='Тема')
+    raw = models.BinaryField(verbose_name='Сообщение')
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попытки'
+    )
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Добавлено'
+    )
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Отправлено'
+    )
+
+    class Meta:
+        ordering = ('created_at', 'pk')
+        verbose_name = 'исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+
+    def __str__(self) -> str:
+        return f'{self.subject}: {self.get_status_display()}'
+
+
+class Lease(models.Model):
+    """
+    Model representing a named lock held by one process until it expires.
+    """
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Название'
+    )
+    holder = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Владелец'
+    )
+    expires_at = models.DateTimeField(verbose_name='Истекает')
+
+    class Meta:
+        verbose_name = 'блокировка'
+        verbose_name_plural = 'Блокировки'
+
+    def __str__(self) -> str:
+        return f'{self.name}: {self.holder}'
+
+
+class ScheduledJob(models.Model):
+    """
+    Model recording the schedule and statistics of a periodic job.
+    """
+    name = models.CharField(
+        max_length=200,
+        unique=True,
+        verbose_name='Задание'
+    )
+    next_run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Следующий запуск'
+    )
+    last_started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Последний запуск'
+    )
+    last_duration = models.FloatField(
+        default=0,
+        verbose_name='Длительность, с'
+    )
+    runs = models.PositiveIntegerField(default=0, verbose_name='Запусков')
+    failures = models.PositiveIntegerField(default=0, verbose_name='Ошибок')
+    last_error = models.TextField(blank=True, verbose_name='Ошибка')
+
+    class Meta:
+        ordering = ('name',)
+        verbose_name = 'периодическое задание'
+        verbose_name_plural = 'Периодические задания'
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class Profile(models.Model):
+    """
+    Model representing the profile of one request taken on demand.
+    """
+    SAMPLE = 'sample'
+    CPROFILE = 'cprofile'
+    MODE_CHOICES = (
+        (SAMPLE, 'Сэмплирование'),
+        (CPROFILE, 'cProfile'),
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Снят'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name='Запросил'
+    )
+    method = models.CharField(max_length=10, verbose_name='Метод')
+    path = models.CharField(max_length=500, verbose_name='Путь')
+    view = models.CharField(
+        max_length=200,
+        blank=True,
+        verbose_name='Представление'
+    )
+    status = models.PositiveSmallIntegerField(verbose_name='Код ответа')
+    mode = models.CharField(
+        max_length=10,
+        choices=MODE_CHOICES,
+        verbose_name='Профилировщик'
+    )
+    duration = models.FloatField(verbose_name='Длительность, с')
+    samples = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Сэмплов'
+    )
+    stacks_file = models.CharField(
+        max_length=255,
+        verbose_name='Файл стеков',
+        help_text='Свёрнутые стеки для flamegraph.pl или speedscope.'
+    )
+    top = models.JSONField(
+        default=list,
+        verbose_name='Самые затратные функции'
+    )
+
+    class Meta:
+        ordering = ('-created_at',)
+        verbose_name = 'профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+
+    def __str__(self) -> str:
+        return f'{self.method} {self.path} ({self.created_at:%d.%m.%Y %H:%M})'
@@ -0,0 +1,154 @@
+"""
+Detection of N+1 queries.
+
+While a request is tracked, ``query_tracker`` records every query by its
+normalized SQL and by the place that caused it: the template line for
+queries run while rendering, otherwise the innermost frame of project
+code. The same statement repeated ``NPLUSONE_THRESHOLD`` times from one
+place is a relation loaded row by row, e.g. ``post.author`` in a loop
+over a queryset without ``select_related``. Such repeats are logged as
+warnings; with ``NPLUSONE_RAISE``, which the ``nplusone`` fixture of the
+tests sets, they fail the request with ``NPlusOneError``.
+"""
+import logging
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.base import Node
+
+from . import context
+from .slow_queries import fingerprint, normalize
+
+logger = logging.getLogger(__name__)
+
+_tracker = ContextVar('nplusone_tracker', default=None)
+
+RENDER_CODE = Node.render_annotated.__code__
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+class Repeat:
+
+    def __init__(self, sql: str, location: str):
+        self.sql = sql
+        self.location = location
+        self.count = 0
+
+    def __str__(self) -> str:
+        return f'{self.count} x {self.location}: {self.sql}'
+
+
+class Tracker:
+    """
+    Queries of one request, grouped by statement and location.
+    """
+
+    def __init__(self, threshold: int):
+        self.threshold = threshold
+        self.queries = {}
+        # Async views run the queries of a request in several threads.
+        self._lock = threading.Lock()
+
+    def add(self, sql: str, location: str):
+        normalized = normalize(sql)
+        key = (fingerprint(normalized), location)
+        with self._lock:
+            repeat = self.queries.get(key)
+            if repeat is None:
+                repeat = self.queries[key] = Repeat(normalized, location)
+            repeat.count += 1
+
+    def repeats(self) -> list:
+        return sorted(
+            (repeat for repeat in self.queries.values()
+             if repeat.count >= self.threshold),
+            key=lambda repeat: repeat.count, reverse=True)
+
+
+def _project_path(filename: str):
+    base = str(settings.BASE_DIR) + os.sep
+    if filename.startswith(base):
+        return filename[len(base):]
+    return None
+
+
+def location(skip_codes=()) -> str:
+    """
+    The template line or project code that caused the current query.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if code is RENDER_CODE:
+            node = frame.f_locals['self']
+            name = node.origin.template_name or node.origin.name
+            return f'{name}:{node.token.lineno}'
+        if code not in skip_codes:
+            path = _project_path(code.co_filename)
+            if path is not None:
+                return f'{path}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    return '?'
+
+
+def query_tracker(execute, sql, params, many, context_):
+    tracker = _tracker.get()
+    if tracker is not None:
+        # Other execute wrappers of the project are not the cause.
+        skip = {
+            wrapper.__code__
+            for wrapper in context_['connection'].execute_wrappers
+            if hasattr(wrapper, '__code__')
+        }
+        tracker.add(sql, location(skip))
+    return execute(sql, params, many, context_)
+
+
+def instrument_new_connection(sender, connection, **kwargs):
+    if query_tracker not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_tracker)
+
+
+def activate() -> tuple:
+    tracker = Tracker(settings.NPLUSONE_THRESHOLD)
+    return tracker, _tracker.set(tracker)
+
+
+def deactivate(token):
+    _tracker.reset(token)
+
+
+def report(tracker: Tracker):
+    """
+    Log the repeated queries and raise if the settings ask to.
+    """
+    repeats = tracker.repeats()
+    if not repeats:
+        return
+    view = context.view_name() or '-'
+    for repeat in repeats:
+        logger.warning('N+1 queries in %s: %s', view, repeat)
+    if settings.NPLUSONE_RAISE:
+        raise NPlusOneError(
+            f'Повторяющиеся запросы в {view}:\n'
+            + '\n'.join(str(repeat) for repeat in repeats))
+
+
+@contextmanager
+def detect():
+    """
+    Track the queries run in the block as one request.
+    """
+    tracker, token = activate()
+    try:
+        yield tracker
+    finally:
+        deactivate(token)
+    report(tracker)
@@ -0,0 +1,281 @@
+"""
+Profiling of single requests on demand.
+
+A staff user adds ``?_profile=sample`` (or ``=cprofile``) to a URL; tools
+without a session send the ``X-Profile`` header with a token signed by
+``manage.py profile_token``. The request then runs under a sampler thread
+that records the stack of the request thread every
+``PROFILE_SAMPLE_INTERVAL`` seconds, and in ``cprofile`` mode under
+``cProfile`` as well, which gives exact call counts at a higher overhead.
+The stacks are written in the collapsed format read by ``flamegraph.pl``
+and speedscope to ``PROFILE_DIR``; a ``Profile`` row with the
+``PROFILE_TOP`` most expensive functions is browsable in the admin.
+
+Async requests spread over the event loop and the database pool, so they
+are always sampled, across all threads. One request per process is
+profiled at a time; others run normally meanwhile.
+"""
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+
+from . import context
+from .models import Profile
+
+PARAM = '_profile'
+HEADER = 'X-Profile'
+SALT = 'core.profiling'
+
+_busy = threading.Lock()
+
+
+def make_token(user, mode: str = Profile.SAMPLE) -> str:
+    return signing.dumps({'user': user.pk, 'mode': mode}, salt=SALT)
+
+
+def wanted(request) -> bool:
+    """
+    Cheap check for the flag before anything touches the database.
+    """
+    return PARAM in request.GET or HEADER in request.headers
+
+
+def requested(request):
+    """
+    The user and mode of an authorized profiling request, or None.
+    """
+    token = request.headers.get(HEADER)
+    if token:
+        try:
+            data = signing.loads(
+                token, salt=SALT, max_age=settings.PROFILE_TOKEN_MAX_AGE)
+        except signing.BadSignature:
+            return None
+        user = get_user_model().objects.filter(
+            pk=data['user'], is_active=True, is_staff=True).first()
+        mode = data['mode']
+    else:
+        user = request.user
+        if not (user.is_authenticated and user.is_staff):
+            return None
+        mode = request.GET[PARAM]
+    if user is None:
+        return None
+    if mode not in dict(Profile.MODE_CHOICES):
+        mode = Profile.SAMPLE
+    return user, mode
+
+
+@lru_cache(maxsize=None)
+def short_path(filename: str) -> str:
+    for prefix in sorted(sys.path, key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+def frame_label(code) -> str:
+    filename = short_path(code.co_filename)
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+class Sampler:
+    """
+    Thread counting the stacks of other threads in collapsed form.
+    """
+
+    def __init__(self, interval: float, thread_ids=None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {
+                thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (
+                        self.thread_ids and ident not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                if self.thread_ids is None:
+                    stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+
+class Result:
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.duration = 0.0
+        self.samples = 0
+        self.stacks = Counter()
+        self.top = []
+
+    def collapsed(self) -> str:
+        return ''.join(
+            f'{stack} {count}\n'
+            for stack, count in sorted(self.stacks.items()))
+
+
+def top_from_samples(stacks: Counter, duration: float, limit: int) -> list:
+    """
+    Functions with the most samples on top of the stack.
+    """
+    own, total = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    samples = sum(stacks.values())
+    per_sample = duration * 1000 / samples if samples else 0
+    return [
+        {
+            'function': function,
+            'calls': None,
+            'self_ms': round(count * per_sample, 3),
+            'total_ms': round(total[function] * per_sample, 3),
+        }
+        for function, count in own.most_common(limit)
+    ]
+
+
+def top_from_profile(profile: cProfile.Profile, limit: int) -> list:
+    """
+    Functions with the largest own time measured by ``cProfile``.
+    """
+    stats = pstats.Stats(profile).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)
+    top = []
+    for (filename, line, name), (_, calls, own, total, _) in rows[:limit]:
+        if filename == '~':
+            function = name
+        else:
+            function = f'{name} ({short_path(filename)}:{line})'
+        top.append({
+            'function': function,
+            'calls': calls,
+            'self_ms': round(own * 1000, 3),
+            'total_ms': round(total * 1000, 3),
+        })
+    return top
+
+
+class Profiling:
+    """
+    Context manager profiling the code run inside it.
+    """
+
+    def __init__(self, mode: str, thread_ids=None):
+        self.result = Result(mode)
+        self.sampler = Sampler(settings.PROFILE_SAMPLE_INTERVAL, thread_ids)
+        self.profile = (
+            cProfile.Profile() if mode == Profile.CPROFILE else None)
+
+    def __enter__(self) -> Result:
+        # The sampler can only look at other threads when it gets the
+        # GIL, which CPU-bound code hands over once per switch interval.
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(
+            min(self._switch_interval, self.sampler.interval))
+        self.sampler.start()
+        if self.profile is not None:
+            self.profile.enable()
+        self._started = time.perf_counter()
+        return self.result
+
+    def __exit__(self, *exc_info):
+        result = self.result
+        result.duration = time.perf_counter() - self._started
+        if self.profile is not None:
+            self.profile.disable()
+        self.sampler.stop()
+        sys.setswitchinterval(self._switch_interval)
+        result.stacks = self.sampler.stacks
+        result.samples = self.sampler.samples
+        if self.profile is not None:
+            result.top = top_from_profile(self.profile, settings.PROFILE_TOP)
+        else:
+            result.top = top_from_samples(
+                result.stacks, result.duration, settings.PROFILE_TOP)
+
+
+def save(request, response, user, result: Result) -> Profile:
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    profile = Profile.objects.create(
+        user=user,
+        method=request.method,
+        path=request.get_full_path()[:500],
+        view=context.view_name()[:200],
+        status=response.status_code,
+        mode=result.mode,
+        duration=result.duration,
+        samples=result.samples,
+        top=result.top,
+    )
+    profile.stacks_file = f'{profile.pk}.folded'
+    with open(stacks_path(profile), 'w', encoding='utf-8') as fh:
+        fh.write(result.collapsed())
+    profile.save(update_fields=('stacks_file',))
+    return profile
+
+
+def stacks_path(profile: Profile) -> str:
+    return os.path.join(settings.PROFILE_DIR, profile.stacks_file)
+
+
+def profile_request(request, get_response, user, mode: str):
+    """
+    Handle a request synchronously under the profiler.
+    """
+    if not _busy.acquire(blocking=False):
+        return get_response(request)
+    try:
+        with Profiling(mode, {threading.get_ident()}) as result:
+            response = get_response(request)
+    finally:
+        _busy.release()
+    save(request, response, user, result)
+    return response
+
+
+async def aprofile_request(request, get_response, user):
+    """
+    Handle an async request under the sampler, looking at all threads.
+    """
+    if not _busy.acquire(blocking=False):
+        return await get_response(request)
+    try:
+        with Profiling(Profile.SAMPLE) as result:
+            response = await get_response(request)
+    finally:
+        _busy.release()
+    await sync_to_async(save)(request, response, user, result)
+    return response
@@ -0,0 +1,146 @@
+"""
+Periodic maintenance jobs.
+
+Jobs are functions declared with ``@periodic(interval)`` in the ``jobs``
+module of an app. Any number of ``run_scheduler`` processes may run on
+different nodes: they compete for the ``scheduler`` lease row, and only
+its holder runs jobs. Each run is also claimed by moving the job's
+``next_run_at`` forward with a conditional UPDATE, so a run happens once
+even while leadership changes hands. Durations and failures are stored
+in ``ScheduledJob``.
+"""
+import logging
+import time
+from datetime import timedelta
+from typing import Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Lease, ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+LEADER_LEASE = 'scheduler'
+
+registry = {}
+
+
+class PeriodicJob:
+
+    def __init__(self, func, name: str, interval: timedelta):
+        self.func = func
+        self.name = name
+        self.interval = interval
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+
+def periodic(interval: timedelta, name: str = None):
+    """
+    Register a function to run every ``interval``.
+    """
+    def register(func):
+        job_name = name or f'{func.__module__}.{func.__qualname__}'
+        registry[job_name] = PeriodicJob(func, job_name, interval)
+        return registry[job_name]
+
+    return register
+
+
+def autodiscover():
+    """
+    Import the ``jobs`` module of every installed app.
+    """
+    autodiscover_modules('jobs')
+
+
+def acquire_lease(name: str, holder: str, ttl: timedelta) -> bool:
+    """
+    Take or renew the lease ``name``; False while another holder has it.
+    """
+    now = timezone.now()
+    renewed = Lease.objects.filter(
+        Q(holder=holder) | Q(expires_at__lt=now), name=name
+    ).update(holder=holder, expires_at=now + ttl)
+    if renewed:
+        return True
+    try:
+        with transaction.atomic():
+            Lease.objects.create(
+                name=name, holder=holder, expires_at=now + ttl)
+    except IntegrityError:
+        # The row exists and is held by someone else.
+        return False
+    return True
+
+
+def release_lease(name: str, holder: str):
+    Lease.objects.filter(name=name, holder=holder).update(
+        expires_at=timezone.now())
+
+
+def sync_jobs():
+    """
+    Create the state rows of registered jobs; new jobs are due at once.
+    """
+    existing = set(ScheduledJob.objects.values_list('name', flat=True))
+    for name in registry.keys() - existing:
+        try:
+            with transaction.atomic():
+                ScheduledJob.objects.create(name=name)
+        except IntegrityError:
+            pass
+
+
+def claim_run(job: PeriodicJob) -> Optional[ScheduledJob]:
+    """
+    Reserve the current run of a due job.
+    """
+    now = timezone.now()
+    claimed = ScheduledJob.objects.filter(
+        name=job.name, next_run_at__lte=now
+    ).update(next_run_at=now + job.interval, last_started_at=now)
+    if not claimed:
+        return None
+    return ScheduledJob.objects.get(name=job.name)
+
+
+def run_job(job: PeriodicJob) -> bool:
+    """
+    Run a job if it is due, recording its duration and any failure.
+    """
+    if claim_run(job) is None:
+        return False
+    started = time.perf_counter()
+    error = ''
+    try:
+        job.func()
+    except Exception as exception:
+        logger.exception('Periodic job %s failed', job.name)
+        error = repr(exception)
+    duration = time.perf_counter() - started
+    ScheduledJob.objects.filter(name=job.name).update(
+        last_duration=duration,
+        runs=F('runs') + 1,
+        failures=F('failures') + (1 if error else 0),
+        last_error=error,
+    )
+    logger.info('Periodic job %s took %.2fs', job.name, duration)
+    return True
+
+
+def run_due_jobs(holder: str, ttl: timedelta) -> int:
+    """
+    Run the due jobs if this process is the leader; return how many ran.
+    """
+    ran = 0
+    for job in sorted(registry.values(), key=lambda job: job.name):
+        # Renew between jobs so a long run does not hand over leadership.
+        if not acquire_lease(LEADER_LEASE, holder, ttl):
+            break
+        ran += run_job(job)
+    return ran
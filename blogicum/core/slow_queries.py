@@ -0,0 +1,144 @@
+"""
+Log of slow database queries.
+
+``slow_query_logger`` is installed as an execute wrapper on every
+connection. A query slower than ``SLOW_QUERY_THRESHOLD_MS`` is handed to
+a background thread, which runs ``EXPLAIN`` (``EXPLAIN QUERY PLAN`` on
+SQLite) for SELECT statements on its own connection and appends a JSON
+line to ``SLOW_QUERY_LOG_FILE``. The request only pays for the timing.
+A plan is captured once per normalized statement per
+``SLOW_QUERY_EXPLAIN_INTERVAL`` seconds. ``manage.py slow_queries``
+aggregates the file.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from . import context
+
+logger = logging.getLogger(__name__)
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\bIN \((?:\s*(?:%s|\?|\$\d+)\s*,?)+\)', re.I)
+SPACE_RE = re.compile(r'\s+')
+
+_explaining = ContextVar('explaining_slow_query', default=False)
+_executor = None
+_executor_lock = threading.Lock()
+_last_explained = {}
+
+
+def normalize(sql: str) -> str:
+    """
+    SQL with literals replaced and ``IN`` lists collapsed, so that
+    statements differing only in values compare equal.
+    """
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(value) -> str:
+    return hashlib.sha1(str(value).encode()).hexdigest()[:12]
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # One thread: it also serializes writes to the log file.
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='slow-query')
+        return _executor
+
+
+def slow_query_logger(execute, sql, params, many, context_):
+    if _explaining.get():
+        return execute(sql, params, many, context_)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context_)
+    finally:
+        duration = (time.perf_counter() - started) * 1000
+        if duration >= settings.SLOW_QUERY_THRESHOLD_MS:
+            record(context_['connection'].alias, sql, params, many,
+                   duration)
+
+
+def record(alias: str, sql: str, params, many: bool, duration: float):
+    normalized = normalize(sql)
+    entry = {
+        'time': timezone.now().isoformat(),
+        'view': context.view_name(),
+        'alias': alias,
+        'duration_ms': round(duration, 2),
+        'fingerprint': fingerprint(normalized),
+        'sql': normalized,
+        'params_fingerprint': fingerprint(params),
+    }
+    logger.warning('Slow query %s (%.1f ms) in %s',
+                   entry['fingerprint'], duration, entry['view'] or '-')
+    explain = (
+        not many and sql.lstrip()[:6].upper() == 'SELECT'
+        and _should_explain(entry['fingerprint']))
+    _get_executor().submit(
+        _write, entry, sql if explain else None, params)
+
+
+def _should_explain(key: str) -> bool:
+    now = time.monotonic()
+    if now - _last_explained.get(key, -1e9) < (
+            settings.SLOW_QUERY_EXPLAIN_INTERVAL):
+        return False
+    _last_explained[key] = now
+    return True
+
+
+def explain(alias: str, sql: str, params) -> str:
+    connection = connections[alias]
+    prefix = connection.ops.explain_query_prefix()
+    token = _explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+    finally:
+        _explaining.reset(token)
+
+
+def _write(entry: dict, sql, params):
+    try:
+        if sql is not None:
+            try:
+                entry['plan'] = explain(entry['alias'], sql, params)
+            except Exception as error:
+                entry['plan_error'] = repr(error)
+            finally:
+                connections[entry['alias']].close()
+        with open(settings.SLOW_QUERY_LOG_FILE, 'a', encoding='utf-8') as fh:
+            fh.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    except Exception:
+        logger.exception('Cannot record slow query %s', entry['fingerprint'])
+
+
+def flush():
+    """
+    Wait until the queued entries are written.
+    """
+    _get_executor().submit(lambda: None).result()
+
+
+def instrument_new_connection(sender, connection, **kwargs):
+    if slow_query_logger not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_logger)
@@ -0,0 +1,249 @@
+"""
+Production pipeline for static files.
+
+``collectstatic`` stores every file under a content-hashed name recorded in
+a manifest and writes gzip (and brotli, when the ``brotli`` package is
+installed) copies of text assets next to it. ``StaticFilesMiddleware`` wraps
+the WSGI application, ``ASGIStaticFilesMiddleware`` the ASGI one, and
+they serve these files before Django is reached, choosing the best
+encoding the client accepts and marking hashed names as immutable.
+"""
+import asyncio
+import gzip
+import json
+import mimetypes
+import os
+import re
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.map', '.svg', '.html', '.txt', '.json', '.xml', '.ico')
+# Compressed copies that save less than this share are not worth keeping.
+MIN_SAVING = 0.05
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+MUTABLE_CACHE = 'public, max-age=60'
+# Content codings by preference, with the suffix of their files.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+QVALUE_RE = re.compile(r';\s*q=0(\.0*)?\s*$')
+
+
+def compress(data: bytes) -> dict:
+    """
+    Compressed variants of ``data`` keyed by file suffix.
+    """
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data)
+    return {
+        suffix: content for suffix, content in variants.items()
+        if len(content) < len(data) * (1 - MIN_SAVING)
+    }
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage that also precompresses the hashed files.
+
+    Missing manifest entries fall back to the plain name instead
+    of failing the page when ``collectstatic`` has not been run.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, *args, **kwargs):
+        yield from super().post_process(*args, **kwargs)
+        if kwargs.get('dry_run'):
+            return
+        # Intermediate names of earlier passes are gone; use the final ones.
+        for hashed_name in sorted(set(self.hashed_files.values())):
+            if hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.write_compressed(hashed_name)
+
+    def write_compressed(self, name: str):
+        with self.open(name) as fh:
+            data = fh.read()
+        for suffix, content in compress(data).items():
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(content))
+
+
+class StaticFile:
+    """
+    A collected file with its precompressed variants and headers.
+    """
+
+    def __init__(self, path: str, immutable: bool):
+        self.variants = {}
+        for encoding, suffix in ENCODINGS:
+            if os.path.isfile(path + suffix):
+                self.variants[encoding] = self._describe(path + suffix)
+        self.variants[None] = self._describe(path)
+        content_type, _ = mimetypes.guess_type(path)
+        self.headers = [
+            ('Content-Type', content_type or 'application/octet-stream'),
+            ('Cache-Control', IMMUTABLE_CACHE if immutable else MUTABLE_CACHE),
+        ]
+        if len(self.variants) > 1:
+            self.headers.append(('Vary', 'Accept-Encoding'))
+
+    @staticmethod
+    def _describe(path: str) -> tuple:
+        stat = os.stat(path)
+        etag = '"%x-%x"' % (int(stat.st_mtime), stat.st_size)
+        return path, stat.st_size, etag, http_date(stat.st_mtime)
+
+    def choose(self, accept_encoding: str):
+        accepted = {
+            token.split(';')[0].strip()
+            for token in accept_encoding.split(',')
+            if not QVALUE_RE.search(token)
+        }
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and encoding in accepted:
+                return encoding, self.variants[encoding]
+        return None, self.variants[None]
+
+
+class StaticFilesMiddleware:
+    """
+    WSGI middleware serving ``STATIC_ROOT`` ahead of the Django application.
+
+    Files are indexed once at startup; unknown paths fall through
+    to the wrapped application.
+    """
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.prefix = prefix or settings.STATIC_URL
+        self.files = self.scan(str(root or settings.STATIC_ROOT))
+
+    @staticmethod
+    def scan(root: str) -> dict:
+        if not os.path.isdir(root):
+            return {}
+        manifest_path = os.path.join(root, 'staticfiles.json')
+        hashed = set()
+        if os.path.isfile(manifest_path):
+            with open(manifest_path, encoding='utf-8') as fh:
+                hashed = set(json.load(fh).get('paths', {}).values())
+        suffixes = tuple(suffix for _, suffix in ENCODINGS)
+        files = {}
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.endswith(suffixes):
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                files[name] = StaticFile(path, immutable=name in hashed)
+        return files
+
+    def find(self, path: str):
+        if not path.startswith(self.prefix):
+            return None
+        return self.files.get(path[len(self.prefix):])
+
+    @staticmethod
+    def respond(static_file: StaticFile, method: str, accept_encoding: str,
+                if_none_match: str) -> tuple:
+        """
+        Status, headers and the path of the body to send, if any.
+        """
+        if method not in ('GET', 'HEAD'):
+            return 405, [('Allow', 'GET, HEAD')], None
+        encoding, (path, size, etag, modified) = static_file.choose(
+            accept_encoding)
+        headers = static_file.headers + [
+            ('ETag', etag), ('Last-Modified', modified)]
+        if if_none_match == etag:
+            return 304, headers, None
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        headers.append(('Content-Length', str(size)))
+        return 200, headers, path if method == 'GET' else None
+
+    def __call__(self, environ, start_response):
+        static_file = self.find(environ.get('PATH_INFO', ''))
+        if static_file is None:
+            return self.application(environ, start_response)
+        status, headers, path = self.respond(
+            static_file, environ.get('REQUEST_METHOD'),
+            environ.get('HTTP_ACCEPT_ENCODING', ''),
+            environ.get('HTTP_IF_NONE_MATCH'))
+        start_response(f'{status} {HTTPStatus(status).phrase}', headers)
+        if path is None:
+            return [b'']
+        fh = open(path, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(fh, CHUNK_SIZE)
+        return self._read(fh)
+
+    @staticmethod
+    def _read(fh):
+        with fh:
+            while True:
+                chunk = fh.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+
+class ASGIStaticFilesMiddleware(StaticFilesMiddleware):
+    """
+    The same for ASGI; files are read in the default executor so the
+    event loop never blocks on the disk.
+    """
+
+    async def __call__(self, scope, receive, send):
+        static_file = None
+        if scope['type'] == 'http':
+            static_file = self.find(scope['path'])
+        if static_file is None:
+            return await self.application(scope, receive, send)
+        request_headers = {
+            name.decode('latin-1'): value.decode('latin-1')
+            for name, value in scope['headers']
+        }
+        status, headers, path = self.respond(
+            static_file, scope['method'],
+            request_headers.get('accept-encoding', ''),
+            request_headers.get('if-none-match'))
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ],
+        })
+        if path is None:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        loop = asyncio.get_running_loop()
+        with open(path, 'rb') as fh:
+            while True:
+                chunk = await loop.run_in_executor(None, fh.read, CHUNK_SIZE)
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': bool(chunk),
+                })
+                if not chunk:
+                    break
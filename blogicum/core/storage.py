@@ -0,0 +1,91 @@
+"""
+Content-addressed storage for uploaded media.
+
+Files are named by the SHA-256 of their content and sharded into two
+levels of subdirectories, e.g. ``blog_images/3f/a2/3fa2...e1.jpg``, so no
+directory grows past a few thousand entries. Identical uploads share one
+file, recorded once in ``MediaFile``. Since a name always points to the
+same bytes, the URLs can be cached forever.
+
+A shared file cannot be deleted on behalf of one post, so deleting a
+post or replacing its image leaves the file: ``gc_media`` is the only
+owner of deletions and removes files no post or rendition references.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+from .models import MediaFile
+
+HASHED_NAME = re.compile(
+    r'^(?:[^/]+/)?[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.[0-9a-z]+)?$'
+)
+
+
+def file_digest(content) -> str:
+    """
+    SHA-256 of a file, read chunk by chunk and rewound afterwards.
+
+    Uploads hashed while they were received are not read again.
+    """
+    precomputed = getattr(content, 'sha256', None)
+    if precomputed:
+        return precomputed
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def is_hashed_name(name: str) -> bool:
+    return bool(HASHED_NAME.match(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names, shards and deduplicates files
+    by their content.
+    """
+
+    def hashed_name(self, name: str, digest: str) -> str:
+        """
+        Build the sharded name, keeping the top directory (``upload_to``)
+        and the extension of the requested name.
+        """
+        directory = name.split('/', 1)[0] if '/' in name else ''
+        extension = os.path.splitext(name)[1].lower()
+        return '/'.join(filter(None, (
+            directory, digest[:2], digest[2:4], digest + extension)))
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save; an existing
+        # hashed name already holds that content, so never pick another.
+        if is_hashed_name(name) and self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, file_digest(content))
+        if self.exists(name):
+            # Refresh the modification time, so the media garbage collector
+            # gives the reused file a new grace period.
+            os.utime(self.path(name))
+            self._register(name, content.size)
+            return name
+        try:
+            name = super()._save(name, content)
+        except FileExistsError:
+            # Another request stored the same content concurrently.
+            pass
+        self._register(name, content.size)
+        return name
+
+    def _register(self, name: str, size: int):
+        # get_or_create copes with a concurrent insert of the same name.
+        MediaFile.objects.get_or_create(name=name, defaults={'size': size})
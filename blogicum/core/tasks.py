@@ -0,0 +1,235 @@
+"""
+Background tasks stored in the database.
+
+Functions decorated with ``@task`` are deferred with ``.defer()``, which
+only inserts a row into the ``tasks`` table as part of the current
+transaction, so a task exists exactly when the data it works on was
+committed. ``manage.py run_workers`` claims due tasks by priority with a
+conditional UPDATE (safe on SQLite and PostgreSQL without a broker) and
+retries failures with exponential backoff.
+
+A claimed task holds a lease of ``TASK_LEASE`` seconds. When its worker
+dies, the lease expires and another worker runs the task again: delivery
+is at least once, so tasks must be idempotent.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+# Candidates fetched per claim; a few in case others win the race.
+CLAIM_BATCH = 5
+BACKOFF_BASE = 10
+BACKOFF_MAX = 3600
+
+registry = {}
+
+
+class TaskFunction:
+    """
+    A registered task; calling it runs the function inline.
+    """
+
+    def __init__(self, func, name: str, priority: int, max_attempts: int):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def defer(self, *args, **kwargs) -> Task:
+        """
+        Queue a call with JSON-serializable arguments.
+        """
+        return self.schedule(args, kwargs)
+
+    def schedule(self, args=(), kwargs=None, priority: Optional[int] = None,
+                 delay: Optional[timedelta] = None) -> Task:
+        return Task.objects.create(
+            name=self.name,
+            args=list(args),
+            kwargs=kwargs or {},
+            priority=self.priority if priority is None else priority,
+            max_attempts=self.max_attempts,
+            run_at=timezone.now() + (delay or timedelta()),
+        )
+
+
+def task(func=None, *, name: str = None, priority: int = 0,
+         max_attempts: int = 5):
+    """
+    Register a function as a task, with or without arguments.
+    """
+    def register(func):
+        task_name = name or f'{func.__module__}.{func.__qualname__}'
+        registry[task_name] = TaskFunction(
+            func, task_name, priority, max_attempts)
+        return registry[task_name]
+
+    return register(func) if func is not None else register
+
+
+def autodiscover():
+    """
+    Import the ``tasks`` module of every installed app.
+    """
+    autodiscover_modules('tasks')
+
+
+def worker_name(index: int = 0) -> str:
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def backoff(attempts: int) -> timedelta:
+    """
+    Delay before the next attempt: exponential, capped, with jitter.
+    """
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(attempts - 1, 0))
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def _claimable(now):
+    # Running tasks whose lease expired belong to a dead worker.
+    return Q(status=Task.QUEUED) | Q(status=Task.RUNNING, locked_until__lt=now)
+
+
+def claim(worker: str) -> Optional[Task]:
+    """
+    Take the most urgent due task, or return None when there is none.
+    """
+    now = timezone.now()
+    due = Task.objects.filter(_claimable(now), run_at__lte=now)
+    for pk in list(due.values_list('pk', flat=True)[:CLAIM_BATCH]):
+        claimed = Task.objects.filter(_claimable(now), pk=pk).update(
+            status=Task.RUNNING,
+            locked_until=now + timedelta(seconds=settings.TASK_LEASE),
+            worker=worker,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def _finish(task_row: Task, **fields) -> bool:
+    # Only the current holder of the lease may record the outcome.
+    return bool(Task.objects.filter(
+        pk=task_row.pk, worker=task_row.worker, attempts=task_row.attempts
+    ).update(locked_until=None, **fields))
+
+
+def run_task(task_row: Task) -> bool:
+    """
+    Run a claimed task and record the outcome; return True on success.
+    """
+    function = registry.get(task_row.name)
+    if function is None:
+        _finish(task_row, status=Task.FAILED,
+                error='Задача не зарегистрирована',
+                finished_at=timezone.now())
+        logger.error('Unknown task %s (%s)', task_row.name, task_row.pk)
+        return False
+    if task_row.attempts > task_row.max_attempts:
+        # Its workers kept dying; running it again will not help.
+        _finish(task_row, status=Task.FAILED,
+                error='Превышено число попыток',
+                finished_at=timezone.now())
+        return False
+    try:
+        function.func(*task_row.args, **task_row.kwargs)
+    except Exception as error:
+        if task_row.attempts >= task_row.max_attempts:
+            logger.exception('Task %s (%s) failed for good',
+                             task_row.name, task_row.pk)
+            _finish(task_row, status=Task.FAILED, error=repr(error),
+                    finished_at=timezone.now())
+        else:
+            delay = backoff(task_row.attempts)
+            logger.warning('Task %s (%s) failed, retrying in %ss: %r',
+                           task_row.name, task_row.pk,
+                           int(delay.total_seconds()), error)
+            _finish(task_row, status=Task.QUEUED, error=repr(error),
+                    run_at=timezone.now() + delay)
+        return False
+    _finish(task_row, status=Task.DONE, error='',
+            finished_at=timezone.now())
+    return True
+
+
+def run_due(worker: str = None, limit: int = None) -> int:
+    """
+    Run due tasks in the current thread until none are left.
+    """
+    worker = worker or worker_name()
+    processed = 0
+    while limit is None or processed < limit:
+        task_row = claim(worker)
+        if task_row is None:
+            break
+        run_task(task_row)
+        processed += 1
+    return processed
+
+
+def work(worker: str, stop: threading.Event, poll: float = 1.0):
+    """
+    Worker loop: run due tasks, sleep ``poll`` seconds when idle.
+    """
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                task_row = claim(worker)
+                if task_row is not None:
+                    run_task(task_row)
+            except Exception:
+                # A database hiccup must not kill the thread; the lease
+                # of a task caught in it expires and the task reruns.
+                logger.exception('Worker %s failed', worker)
+                task_row = None
+            if task_row is None:
+                stop.wait(poll)
+    finally:
+        connection.close()
+
+
+def purge_finished(older_than: timedelta) -> int:
+    """
+    Delete tasks that finished, successfully or not, before the cutoff.
+    """
+    deleted, _ = Task.objects.filter(
+        status__in=(Task.DONE, Task.FAILED),
+        finished_at__lt=timezone.now() - older_than
+    ).delete()
+    return deleted
+
+
+def queue_stats() -> dict:
+    """
+    Number of tasks per status and the age of the oldest due one.
+    """
+    now = timezone.now()
+    stats = {status: 0 for status, _ in Task.STATUS_CHOICES}
+    for status, count in Task.objects.order_by().values_list(
+            'status').annotate(count=Count('pk')):
+        stats[status] = count
+    oldest = Task.objects.filter(
+        status=Task.QUEUED, run_at__lte=now
+    ).order_by('run_at').values_list('run_at', flat=True).first()
+    stats['oldest_wait'] = (now - oldest).total_seconds() if oldest else 0.0
+    return stats
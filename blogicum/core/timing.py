@@ -0,0 +1,120 @@
+"""
+Per-request timing of database queries and template rendering.
+
+Every database connection gets ``query_timer`` as an execute wrapper. It
+only measures while a ``RequestTiming`` is active in the current context,
+so queries outside sampled requests cost a context variable lookup.
+Threads that run queries for a request, such as the pool of the async
+views, must run in a copy of the request context.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """
+    Durations collected for one request, in seconds.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.spans = {}
+        # Async views run the queries of a request in several threads.
+        self._lock = threading.Lock()
+
+    def add_query(self, duration: float):
+        with self._lock:
+            self.queries += 1
+            self.db += duration
+
+    def add(self, name: str, duration: float):
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + duration
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def header(self, total: float) -> str:
+        metrics = [
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"']
+        metrics.extend(
+            f'{name};dur={duration * 1000:.1f}'
+            for name, duration in self.spans.items())
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+def current():
+    return _current.get()
+
+
+def activate(timing: RequestTiming):
+    return _current.set(timing)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def measure(name: str):
+    """
+    Add the time spent in the block to the span ``name`` of the request.
+    """
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - started)
+
+
+def query_timer(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.add_query(time.perf_counter() - started)
+
+
+def instrument(connection):
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+def instrument_new_connection(sender, connection, **kwargs):
+    instrument(connection)
+
+
+def log_request(request, response, timing: RequestTiming, total: float):
+    """
+    Write one JSON line with the timings of a request.
+    """
+    logger.info(json.dumps({
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'total_ms': round(total * 1000, 2),
+        'db_ms': round(timing.db * 1000, 2),
+        'db_queries': timing.queries,
+        **{
+            f'{name}_ms': round(duration * 1000, 2)
+            for name, duration in timing.spans.items()
+        },
+    }))
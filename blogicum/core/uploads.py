@@ -0,0 +1,40 @@
+"""
+Upload handling with bounded memory.
+
+Every uploaded file is streamed chunk by chunk into a temporary file on
+disk, whatever its size, and hashed on the way. The SHA-256 is kept on the
+file, so content-addressed storage does not read the file a second time.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream uploads to disk while computing their SHA-256.
+
+    Data past ``FILE_UPLOAD_MAX_SIZE`` is discarded and the file
+    is marked as ``truncated`` for the form to reject it.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+        self.received = 0
+        self.file.truncated = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.FILE_UPLOAD_MAX_SIZE:
+            self.file.truncated = True
+            return None
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = None if file.truncated else self.digest.hexdigest()
+        return file
@@ -1,5 +1,30 @@
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .metrics import registry
 
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html', status=403)
+
+
+def metrics_allowed(request) -> bool:
+    """
+    Scrapers send ``Authorization: Bearer <METRICS_TOKEN>``;
+    staff users may open the page in the browser.
+    """
+    token = settings.METRICS_TOKEN
+    header = request.headers.get('Authorization', '')
+    if token and constant_time_compare(header, f'Bearer {token}'):
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def metrics(request):
+    if not metrics_allowed(request):
+        return HttpResponse('Доступ запрещён', status=403)
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -72,6 +72,7 @@ pytest_plugins = [
     'fixtures.locations',
     'fixtures.categories',
     'fixtures.comments',
+    'fixtures.query_budget',
     'adapters.comment',
 ]
 
@@ -81,6 +82,35 @@ def mixer():
     return _mixer
 
 
+@pytest.fixture(autouse=True)
+def inline_image_jobs(settings):
+    settings.BLOG_IMAGE_INLINE = True
+
+
+@pytest.fixture(autouse=True)
+def instrumentation_files(settings, tmp_path):
+    """
+    Keep the metrics and slow query files out of the source tree.
+    """
+    settings.METRICS_FILE = tmp_path / 'metrics.json'
+    settings.SLOW_QUERY_LOG_FILE = tmp_path / 'slow_queries.log'
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+@pytest.fixture
+def nplusone(settings):
+    """
+    Fail requests that repeat a query for every row of a list.
+    """
+    settings.NPLUSONE_SAMPLE_RATE = 1
+    settings.NPLUSONE_RAISE = True
+
+
 @pytest.fixture
 def user(mixer):
     User = get_user_model()
@@ -333,8 +363,7 @@ def cleanup(request):
 
     for root, dirs, files in os.walk(image_dir):
         for filename in files:
-            if (filename.endswith('.jpg') or filename.endswith(
-                    '.gif') or filename.endswith('.png')):
+            if filename.endswith(('.jpg', '.gif', '.png', '.webp')):
                 file_path = os.path.join(root, filename)
                 if os.path.getmtime(file_path) >= start_time:
                     os.remove(file_path)
@@ -0,0 +1,203 @@
+"""
+Query budgets of the named routes.
+
+``budget_dataset`` seeds a fixed dataset, ``query_recorder`` counts the
+queries of a block, the rows Django fetched and the columns they had,
+and ``query_budget`` compares the numbers with ``tests/query_budget.json``.
+Run ``pytest tests/test_query_budget.py --update-query-budget`` to
+rewrite the file after an intended change.
+"""
+import json
+from contextvars import ContextVar
+from datetime import timedelta
+from pathlib import Path
+from textwrap import shorten
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.backends.utils import CursorWrapper
+from django.utils import timezone
+
+from core.slow_queries import normalize
+
+BUDGET_FILE = Path(__file__).resolve().parent.parent / 'query_budget.json'
+METRICS = ('queries', 'rows', 'columns')
+
+_recording = ContextVar('query_budget_recording', default=None)
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--update-query-budget', action='store_true',
+        help='Записать текущие показатели в tests/query_budget.json.')
+
+
+class Recording:
+
+    def __init__(self):
+        self.statements = []
+        self.rows = 0
+        self.columns = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.statements.append(normalize(sql))
+        result = execute(sql, params, many, context)
+        description = context['cursor'].description
+        if description:
+            self.columns += len(description)
+        return result
+
+    def as_dict(self) -> dict:
+        return {
+            'queries': len(self.statements),
+            'rows': self.rows,
+            'columns': self.columns,
+        }
+
+
+def _counting(name):
+    def fetch(self, *args):
+        result = getattr(self.cursor, name)(*args)
+        recording = _recording.get()
+        if recording is not None:
+            if name == 'fetchone':
+                recording.rows += result is not None
+            else:
+                recording.rows += len(result)
+        return result
+
+    return fetch
+
+
+@pytest.fixture
+def query_recorder(monkeypatch):
+    """
+    Context manager recording the queries of the block.
+    """
+    # CursorWrapper hands fetches to the DB-API cursor in __getattr__.
+    for name in ('fetchone', 'fetchmany', 'fetchall'):
+        monkeypatch.setattr(
+            CursorWrapper, name, _counting(name), raising=False)
+
+    class Recorder:
+
+        def __enter__(self):
+            self.recording = Recording()
+            self._wrapper = connection.execute_wrapper(self.recording)
+            self._wrapper.__enter__()
+            self._token = _recording.set(self.recording)
+            return self.recording
+
+        def __exit__(self, *exc_info):
+            _recording.reset(self._token)
+            self._wrapper.__exit__(*exc_info)
+
+    return Recorder
+
+
+class QueryBudget:
+
+    def __init__(self, path: Path, update: bool):
+        self.path = path
+        self.update = update
+        self.budgets = (
+            json.loads(path.read_text(encoding='utf-8'))
+            if path.exists() else {})
+        self.changed = False
+
+    def check(self, route: str, status: int, recording: Recording):
+        actual = {'status': status, **recording.as_dict()}
+        budget = self.budgets.get(route)
+        if self.update:
+            if budget != actual:
+                self.budgets[route] = actual
+                self.changed = True
+            return
+        if budget is None:
+            raise AssertionError(
+                f'Для маршрута `{route}` нет бюджета запросов. Запустите '
+                f'`pytest tests/test_query_budget.py --update-query-budget`.')
+        lines = []
+        if actual['status'] != budget['status']:
+            lines.append(
+                f'  status:  {budget["status"]} -> {actual["status"]}')
+        for metric in METRICS:
+            if actual[metric] > budget[metric]:
+                lines.append(
+                    f'  {metric + ":":<8} {budget[metric]} -> '
+                    f'{actual[metric]} (+{actual[metric] - budget[metric]})')
+        if lines:
+            statements = '\n'.join(
+                f'  {number}. {shorten(sql, 200)}'
+                for number, sql in enumerate(recording.statements, 1))
+            raise AssertionError(
+                f'Маршрут `{route}` превысил бюджет запросов '
+                f'из {self.path.name}:\n' + '\n'.join(lines)
+                + f'\nВыполненные запросы:\n{statements}\n'
+                'Если рост оправдан, обновите бюджет ключом '
+                '--update-query-budget.')
+
+    def save(self):
+        if self.changed:
+            self.path.write_text(
+                json.dumps(self.budgets, indent=2, sort_keys=True) + '\n',
+                encoding='utf-8')
+
+
+@pytest.fixture(scope='session')
+def query_budget(request):
+    budget = QueryBudget(
+        BUDGET_FILE, request.config.getoption('--update-query-budget'))
+    yield budget
+    budget.save()
+
+
+@pytest.fixture
+def budget_dataset(db):
+    """
+    Fixed dataset: five authors, published and hidden categories and
+    locations, posts in the past and the future, comments falling off
+    with the age of the post.
+    """
+    from blog.models import Category, Comment, Location, Post
+
+    User = get_user_model()
+    User.objects.bulk_create(
+        User(username=f'author{number}') for number in range(5))
+    users = list(User.objects.order_by('pk'))
+    Category.objects.bulk_create(
+        Category(title=f'Категория {number}', description='Описание',
+                 slug=f'category-{number}', is_published=number != 3)
+        for number in range(4))
+    categories = list(Category.objects.order_by('pk'))
+    Location.objects.bulk_create(
+        Location(name=f'Место {number}', is_published=number != 3)
+        for number in range(4))
+    locations = list(Location.objects.order_by('pk'))
+    now = timezone.now()
+    posts = []
+    for number in range(40):
+        posts.append(Post(
+            title=f'Публикация {number}',
+            text='Текст публикации ' * 20,
+            pub_date=now + timedelta(
+                days=number if number % 13 == 12 else -number - 1),
+            author=users[number % 3],
+            category=categories[number % 4],
+            location=locations[number % 4] if number % 5 else None,
+            is_published=number % 17 != 16,
+        ))
+    Post.objects.bulk_create(posts)
+    posts = list(Post.objects.order_by('pk'))
+    Comment.objects.bulk_create(
+        Comment(text=f'Комментарий {number}', post=post,
+                author=users[number % 5])
+        for index, post in enumerate(posts)
+        for number in range(12 // (index + 1)))
+    return {
+        'users': users,
+        'categories': categories,
+        'locations': locations,
+        'posts': posts,
+    }
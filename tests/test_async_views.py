@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404
+from django.test import RequestFactory
+
+from blog import async_views, views
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def get(view_class, path, **kwargs):
+    request = RequestFactory().get(path)
+    request.user = AnonymousUser()
+    return request, view_class.as_view(), kwargs
+
+
+def sync_content(view_class, path, **kwargs):
+    request, view, kwargs = get(view_class, path, **kwargs)
+    return view(request, **kwargs).render().content
+
+
+def async_content(view_class, path, **kwargs):
+    request, view, kwargs = get(view_class, path, **kwargs)
+    return async_to_sync(view)(request, **kwargs).content
+
+
+def test_views_are_coroutine_functions():
+    for name in ('BlogListView', 'ByCategoryListView',
+                 'ByProfileListView', 'PostDetailView'):
+        view = getattr(async_views, name).as_view()
+        assert asyncio.iscoroutinefunction(view), (
+            f'Убедитесь, что `{name}` работает асинхронно')
+
+
+@pytest.mark.parametrize('path', ['/', '/?page=2', '/?page=last'])
+def test_index_matches_sync_view(
+        many_posts_with_published_locations, comment, path):
+    assert (
+        async_content(async_views.BlogListView, path)
+        == sync_content(views.BlogListView, path)
+    )
+
+
+def test_category_and_profile_match_sync_views(
+        many_posts_with_published_locations, published_category, user):
+    slug = published_category.slug
+    assert async_content(
+        async_views.ByCategoryListView, '/', category_slug=slug
+    ) == sync_content(views.ByCategoryListView, '/', category_slug=slug)
+    username = user.username
+    assert async_content(
+        async_views.ByProfileListView, '/', username=username
+    ) == sync_content(views.ByProfileListView, '/', username=username)
+
+
+def test_detail_matches_sync_view(comment):
+    pk = comment.post.pk
+    assert async_content(async_views.PostDetailView, '/', pk=pk) == (
+        sync_content(views.PostDetailView, '/', pk=pk))
+
+
+@pytest.mark.parametrize('view_class, path, kwargs', [
+    (async_views.ByCategoryListView, '/', {'category_slug': 'missing'}),
+    (async_views.ByProfileListView, '/', {'username': 'missing'}),
+    (async_views.PostDetailView, '/', {'pk': 404}),
+    (async_views.BlogListView, '/?page=50', {}),
+    (async_views.BlogListView, '/?page=abc', {}),
+])
+def test_missing_objects_raise_404(view_class, path, kwargs):
+    request, view, kwargs = get(view_class, path, **kwargs)
+    with pytest.raises(Http404):
+        async_to_sync(view)(request, **kwargs)
+
+
+def test_post_not_allowed():
+    request = RequestFactory().post('/')
+    response = async_to_sync(async_views.BlogListView.as_view())(request)
+    assert response.status_code == 405
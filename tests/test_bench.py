@@ -0,0 +1,66 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from blog.models import Location
+from core import bench
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert bench.percentile(values, 0.5) == 50
+    assert bench.percentile(values, 0.99) == 99
+    assert bench.percentile([7], 0.9) == 7
+
+
+def test_compare_flags_regressions():
+    baseline = {'index': {'p50_ms': 10.0, 'p90_ms': 12.0, 'queries': 3}}
+    current = {
+        'index': {'p50_ms': 10.5, 'p90_ms': 20.0, 'queries': 4},
+        'detail': {'p50_ms': 1.0, 'queries': 2},
+    }
+    rows, regressions = bench.compare(baseline, current, 0.1)
+    assert regressions == [
+        'index p90_ms: 12.0 -> 20.0', 'index queries: 3 -> 4'], (
+        'Рост времени сверх допуска и любой рост числа запросов '
+        'должны считаться регрессией.'
+    )
+    assert ('detail', '', '', '', 'new') in rows
+
+
+@pytest.mark.django_db
+def test_run_rolls_back_writes():
+    def create():
+        Location.objects.create(name='Место')
+        return type('Response', (), {'status_code': 201, 'content': b'ok'})
+
+    result = bench.run(create, iterations=5, warmup=1)
+    assert not Location.objects.exists(), (
+        'Замеряемые запросы не должны оставлять изменений в базе.'
+    )
+    assert result['status'] == 201
+    assert result['queries'] == 1
+    assert result['p50_ms'] <= result['p99_ms']
+    assert result['alloc_peak_kib'] > 0
+
+
+def test_bench_views_compares_results(tmp_path):
+    baseline = tmp_path / 'baseline.json'
+    results = tmp_path / 'results.json'
+    for path, queries in ((baseline, 3), (results, 5)):
+        path.write_text(json.dumps({
+            'environment': {'revision': 'abc'},
+            'results': {'index': {'p50_ms': 1.0, 'queries': queries}},
+        }))
+    out = StringIO()
+    with pytest.raises(CommandError, match='index queries: 3 -> 5'):
+        call_command(
+            'bench_views', results=str(results), baseline=str(baseline),
+            stdout=out)
+    assert 'abc' in out.getvalue()
+    call_command(
+        'bench_views', results=str(baseline), baseline=str(baseline),
+        stdout=StringIO())
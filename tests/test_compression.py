@@ -0,0 +1,84 @@
+import gzip
+import zlib
+
+import pytest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+
+from core.middleware import (
+    CompressionMiddleware, accepted_encodings, choose_encoding)
+
+HTML = ('<p>' + 'Текст поста. ' * 200 + '</p>').encode()
+
+
+def process(response, accept='gzip, deflate'):
+    request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+    middleware = CompressionMiddleware(lambda request: response)
+    return middleware(request)
+
+
+def test_accept_encoding_negotiation():
+    assert accepted_encodings('gzip;q=0, br, identity;q=0.5') == {
+        'br', 'identity'}
+    assert choose_encoding('deflate') is None
+    assert choose_encoding('*') == 'gzip'
+    assert choose_encoding('gzip;q=0') is None
+
+
+def test_html_response_compressed():
+    response = HttpResponse(HTML)
+    response['ETag'] = '"abc"'
+    response = process(response)
+    assert response['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.content) == HTML
+    assert response['Content-Length'] == str(len(response.content))
+    assert 'Accept-Encoding' in response['Vary']
+    assert response['ETag'] == 'W/"abc"'
+
+
+@pytest.mark.parametrize('response', [
+    HttpResponse(b'<p>short</p>'),
+    HttpResponse(HTML, content_type='image/png'),
+    HttpResponse(HTML, headers={'Content-Encoding': 'br'}),
+    HttpResponse(HTML, status=206, headers={'Content-Range': 'bytes 0-9/99'}),
+])
+def test_responses_left_alone(response):
+    body = response.content
+    response = process(response)
+    assert response.content == body
+    assert response.get('Content-Encoding') in (None, 'br')
+
+
+def test_identity_client_gets_plain_body():
+    response = process(HttpResponse(HTML), accept='identity')
+    assert not response.has_header('Content-Encoding')
+    assert response.content == HTML
+    assert 'Accept-Encoding' in response['Vary']
+
+
+def test_streaming_response_compressed_per_chunk():
+    produced = []
+
+    def chunks():
+        for number in range(3):
+            produced.append(number)
+            yield HTML
+
+    response = process(StreamingHttpResponse(chunks()))
+    assert response['Content-Encoding'] == 'gzip'
+    assert not response.has_header('Content-Length')
+    stream = iter(response.streaming_content)
+    first = next(stream)
+    assert produced == [0], 'Ответ не должен буферизоваться целиком'
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decompressor.decompress(first) == HTML
+    rest = b''.join(stream)
+    assert decompressor.decompress(rest) == HTML * 2
+
+
+@pytest.mark.django_db
+def test_index_page_compressed(client):
+    response = client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+    assert response.status_code == 200
+    assert response['Content-Encoding'] == 'gzip'
+    assert b'<html' in gzip.decompress(response.content)
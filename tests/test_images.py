@@ -0,0 +1,255 @@
+import hashlib
+import struct
+import zlib
+from io import BytesIO
+
+import pytest
+from bs4 import BeautifulSoup
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+from blog import image_queue
+from blog.forms import ImageHeaderField
+from blog.image_queue import queue_stats
+from blog.models import ImageJob, Post, PostImage
+from core.models import Task
+from core.tasks import run_due
+
+
+def make_image_file(size=(2000, 1500), name='photo.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 120, 40)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@pytest.fixture
+def post_with_image(mixer, user, published_category, media_root,
+                    django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        return mixer.blend(
+            'blog.Post', author=user, category=published_category,
+            location=None, image=make_image_file())
+
+
+@pytest.mark.django_db
+def test_renditions_created(post_with_image, media_root):
+    meta = PostImage.objects.get(post=post_with_image)
+    assert (meta.width, meta.height) == (2000, 1500)
+    assert meta.source == post_with_image.image.name
+    assert meta.format == 'JPEG'
+    assert meta.size == post_with_image.image.size
+    assert meta.color.startswith('#c') and len(meta.color) == 7
+    assert meta.placeholder.startswith('data:image/jpeg;base64,')
+    widths = {
+        fmt: [item['width'] for item in meta.renditions
+              if item['format'] == fmt]
+        for fmt in ('webp', 'jpg')}
+    assert widths == {'webp': [640, 960, 1280], 'jpg': [640, 960, 1280]}, (
+        'Убедитесь, что для изображения создаются уменьшенные копии '
+        'в форматах WebP и JPEG.'
+    )
+    for item in meta.renditions:
+        with Image.open(media_root / item['name']) as image:
+            assert image.size == (item['width'], item['height'])
+
+
+@pytest.mark.django_db
+def test_small_image_not_upscaled(
+        mixer, user, media_root, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        post = mixer.blend(
+            'blog.Post', author=user, image=make_image_file(size=(300, 200)))
+    meta = PostImage.objects.get(post=post)
+    assert {item['width'] for item in meta.renditions} == {300}
+
+
+@pytest.mark.django_db
+def test_image_replaced(post_with_image, django_capture_on_commit_callbacks):
+    post_with_image.image = make_image_file(size=(800, 600), name='new.jpg')
+    with django_capture_on_commit_callbacks(execute=True):
+        post_with_image.save()
+    meta = PostImage.objects.get(post=post_with_image)
+    assert meta.source == post_with_image.image.name
+    assert (meta.width, meta.height) == (800, 600)
+
+
+@pytest.mark.django_db
+def test_feed_uses_srcset(client, post_with_image):
+    response = client.get('/')
+    img = BeautifulSoup(
+        response.content.decode('utf-8'), features='html.parser'
+    ).find('img', srcset=True)
+    assert img is not None, (
+        'Убедитесь, что в ленте изображение выводится с атрибутом `srcset`.'
+    )
+    card = next(
+        item for item in PostImage.objects.get(
+            post=post_with_image).renditions
+        if item['format'] == 'jpg' and item['width'] == 640)
+    assert img['src'].endswith(card['name'])
+    assert (img['width'], img['height']) == ('640', '480')
+    assert post_with_image.image.url not in img['srcset']
+
+
+@pytest.mark.django_db
+def test_placeholder_until_processed(
+        client, settings, mixer, user, published_category, media_root):
+    settings.BLOG_IMAGE_INLINE = False
+    post = mixer.blend(
+        'blog.Post', author=user, category=published_category,
+        location=None, image=make_image_file())
+    job = ImageJob.objects.get(post=post)
+    assert job.status == ImageJob.PENDING
+    assert queue_stats()['pending'] == 1
+    meta = PostImage.objects.get(post=post)
+    assert (meta.width, meta.height, meta.renditions) == (2000, 1500, []), (
+        'Убедитесь, что размеры изображения сохраняются при загрузке.'
+    )
+
+    img = BeautifulSoup(
+        client.get('/').content.decode('utf-8'), features='html.parser'
+    ).find('img', alt='Изображение обрабатывается')
+    assert img is not None, (
+        'Убедитесь, что до обработки изображения выводится заглушка.'
+    )
+    assert img['src'].startswith('data:image/svg+xml')
+    assert (img['width'], img['height']) == ('640', '480')
+
+    assert run_due() == 1
+    job.refresh_from_db()
+    assert job.status == ImageJob.DONE
+    assert PostImage.objects.filter(post=post).exists()
+    assert queue_stats()['pending'] == 0
+
+
+@pytest.mark.django_db
+def test_inline_job_error_fails_job(
+        monkeypatch, mixer, user, media_root,
+        django_capture_on_commit_callbacks):
+    def crash(post):
+        raise RuntimeError('Сбой')
+
+    monkeypatch.setattr(image_queue, 'process_post_image', crash)
+    with django_capture_on_commit_callbacks(execute=True):
+        post = mixer.blend('blog.Post', author=user, image=make_image_file())
+    job = ImageJob.objects.get(post=post)
+    assert job.status == ImageJob.FAILED, (
+        'Ошибка обработки после сохранения не должна доходить '
+        'до пользователя.'
+    )
+    assert 'Сбой' in job.error
+
+
+@pytest.mark.django_db
+def test_broken_image_job_fails(settings, mixer, user, media_root):
+    settings.BLOG_IMAGE_INLINE = False
+    post = mixer.blend(
+        'blog.Post', author=user,
+        image=SimpleUploadedFile('broken.jpg', b'not an image'))
+    run_due()
+    job = ImageJob.objects.get(post=post)
+    assert job.status == ImageJob.FAILED
+    assert job.error
+
+
+@pytest.mark.django_db
+def test_unreadable_image_shown_as_is(client, mixer, user, media_root):
+    post = mixer.blend(
+        'blog.Post', author=user,
+        image=SimpleUploadedFile('broken.jpg', b'not an image'))
+    img = BeautifulSoup(
+        client.get(f'/posts/{post.pk}/').content.decode('utf-8'),
+        features='html.parser'
+    ).find('img', src=post.image.url)
+    assert img is not None, (
+        'Убедитесь, что изображение без метаданных выводится как есть, '
+        'а не заглушкой.'
+    )
+
+
+@pytest.mark.django_db
+def test_backfill_image_meta(post_with_image):
+    PostImage.objects.all().delete()
+    ImageJob.objects.all().delete()
+    call_command('backfill_image_meta', batch_size=1)
+    meta = PostImage.objects.get(post=post_with_image)
+    assert (meta.width, meta.height, meta.format) == (2000, 1500, 'JPEG')
+    assert ImageJob.objects.filter(
+        post=post_with_image, status=ImageJob.PENDING).count() == 1
+    assert Task.objects.filter(
+        name='blog.image_queue.process_image').count() == 1
+    call_command('backfill_image_meta')
+    assert ImageJob.objects.count() == 1
+
+
+def png_header(width, height):
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data)))
+
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        + chunk(b'IDAT', zlib.compress(b''))
+        + chunk(b'IEND', b'')
+    )
+
+
+@pytest.mark.parametrize(('content', 'code'), [
+    (png_header(12000, 12000), 'too_many_pixels'),
+    (png_header(50000, 50000), 'too_many_pixels'),
+    (png_header(9000, 9000), 'too_many_pixels'),
+])
+def test_image_header_rejected(content, code):
+    field = ImageHeaderField()
+    with pytest.raises(ValidationError) as error:
+        field.clean(SimpleUploadedFile('bomb.png', content, 'image/png'))
+    assert error.value.code == code, (
+        'Убедитесь, что слишком большие изображения отклоняются '
+        'по заголовку файла.'
+    )
+
+
+def test_image_format_rejected():
+    buffer = BytesIO()
+    Image.new('RGB', (10, 10)).save(buffer, 'BMP')
+    with pytest.raises(ValidationError) as error:
+        ImageHeaderField().clean(
+            SimpleUploadedFile('image.bmp', buffer.getvalue()))
+    assert error.value.code == 'unsupported_format'
+
+
+def test_mpo_accepted_as_jpeg():
+    buffer = BytesIO()
+    image = Image.new('RGB', (40, 30))
+    image.save(buffer, 'MPO', save_all=True, append_images=[image])
+    upload = ImageHeaderField().clean(
+        SimpleUploadedFile('camera.jpg', buffer.getvalue(), 'image/jpeg'))
+    assert upload.content_type == 'image/jpeg', (
+        'Снимки камер в формате MPO должны приниматься как JPEG.'
+    )
+
+
+@pytest.mark.django_db
+def test_upload_streamed_and_hashed(user_client, published_category,
+                                    media_root, settings):
+    image = make_image_file(size=(100, 100))
+    content = image.read()
+    image.seek(0)
+    data = {
+        'title': 'Заголовок', 'text': 'Текст', 'pub_date': '2020-01-01',
+        'category': published_category.pk, 'is_published': True,
+        'image': image,
+    }
+    user_client.post('/posts/create/', data=data)
+    post = Post.objects.get(title='Заголовок')
+    assert hashlib.sha256(content).hexdigest() in post.image.name
+
+    settings.FILE_UPLOAD_MAX_SIZE = 100
+    data['image'] = make_image_file(size=(100, 100))
+    data['title'] = 'Слишком большой'
+    response = user_client.post('/posts/create/', data=data)
+    assert 'image' in response.context['form'].errors
+    assert not Post.objects.filter(title='Слишком большой').exists()
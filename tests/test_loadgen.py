@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+from django.core.management.base import CommandError
+
+from blog.management.commands.load_test import parse_mix
+from core import loadgen
+
+LOG = '''\
+10.0.0.1 - - [19/Oct/2026:10:00:00 +0000] "GET / HTTP/1.1" 200 512 "-" "-"
+10.0.0.1 - - [19/Oct/2026:10:00:02 +0000] "POST /posts/1/comment/ HTTP/1.1" \
+302 0 "-" "-"
+не строка журнала
+[19/Oct/2026 10:00:03] "GET /posts/1/?x=1 HTTP/1.1" 200 256
+'''
+
+
+async def serve(handle_requests):
+    """
+    Server answering with the responses ``handle_requests`` gives for
+    the request heads it reads, counting the connections.
+    """
+    state = {'connections': 0, 'requests': []}
+
+    async def handle(reader, writer):
+        state['connections'] += 1
+        while True:
+            head = await reader.readuntil(b'\r\n\r\n')
+            lines = head.decode().split('\r\n')
+            headers = dict(
+                line.split(': ', 1) for line in lines[1:] if line)
+            body = await reader.readexactly(
+                int(headers.get('Content-Length', 0)))
+            state['requests'].append((lines[0], headers, body))
+            writer.write(handle_requests(lines[0]))
+            await writer.drain()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[1], state
+
+
+def answer(request_line: str) -> bytes:
+    if request_line.startswith('GET /chunked'):
+        return (b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n'
+                b'3\r\nabc\r\n2\r\nde\r\n0\r\n\r\n')
+    if request_line.startswith('GET /login'):
+        return (b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n'
+                b'Set-Cookie: csrftoken=token; Path=/\r\n\r\nok')
+    return b'HTTP/1.1 302 Found\r\nContent-Length: 0\r\nLocation: /\r\n\r\n'
+
+
+def test_pool_keeps_connections_and_session_cookies():
+    async def main():
+        server, port, state = await serve(answer)
+        pool = loadgen.Pool('127.0.0.1', port, size=1)
+        session = loadgen.Session(pool)
+        chunked = await session.get('/chunked')
+        await session.get('/login')
+        posted = await session.post('/posts/create/', {'title': 'Тест'})
+        pool.close()
+        server.close()
+        return chunked, posted, state
+
+    chunked, posted, state = asyncio.run(main())
+    assert chunked.body == b'abcde'
+    assert posted.status == 302
+    assert state['connections'] == 1, (
+        'Запросы одного слота пула должны идти по одному соединению.'
+    )
+    request_line, headers, body = state['requests'][-1]
+    assert request_line == 'POST /posts/create/ HTTP/1.1'
+    assert headers['X-CSRFToken'] == 'token'
+    assert headers['Cookie'] == 'csrftoken=token'
+    assert body == b'title=%D0%A2%D0%B5%D1%81%D1%82'
+
+
+def test_run_mix_records_errors():
+    async def main():
+        server, port, _ = await serve(answer)
+        pool = loadgen.Pool('127.0.0.1', port, size=2)
+
+        async def ok(session, rng):
+            return await session.get('/')
+
+        async def fail(session, rng):
+            raise loadgen.UnexpectedResponse(await session.get('/login'))
+
+        stats = await loadgen.run_mix(
+            pool, {'ok': ok, 'fail': fail}, {'ok': 3, 'fail': 1},
+            users=3, duration=10, requests=40, seed=1)
+        pool.close()
+        server.close()
+        return stats.summary()
+
+    summary = asyncio.run(main())
+    assert summary['requests'] == 40
+    actions = summary['actions']
+    assert actions['fail']['errors'] == actions['fail']['requests'] > 0
+    assert actions['fail']['statuses'] == {
+        'unexpected 200': actions['fail']['requests']}
+    assert actions['ok']['errors'] == 0
+    assert sum(actions['ok']['histogram']) == actions['ok']['requests']
+
+
+def test_failed_setup_recorded():
+    async def main():
+        server, port, _ = await serve(answer)
+        pool = loadgen.Pool('127.0.0.1', port, size=2)
+
+        async def ok(session, rng):
+            return await session.get('/')
+
+        async def login(session, number):
+            if number == 0:
+                raise loadgen.UnexpectedResponse(await session.get('/login'))
+
+        stats = await loadgen.run_mix(
+            pool, {'ok': ok}, {'ok': 1}, users=2, duration=10, requests=5,
+            setup=login, setup_action='login')
+        pool.close()
+        server.close()
+        return stats.summary()
+
+    actions = asyncio.run(main())['actions']
+    assert actions['login']['statuses'] == {'unexpected 200': 1}, (
+        'Неудачный вход должен считаться ошибкой, а не прерывать тест.'
+    )
+    assert actions['ok']['requests'] == 5
+
+
+def test_parse_access_log():
+    assert loadgen.parse_access_log(LOG.splitlines()) == [
+        (0.0, 'GET', '/'),
+        (2.0, 'POST', '/posts/1/comment/'),
+        (3.0, 'GET', '/posts/1/?x=1'),
+    ]
+
+
+def test_stats_histogram():
+    stats = loadgen.Stats(buckets=(0.01, 0.1))
+    assert stats.histogram([0.005, 0.01, 0.05, 2]) == [2, 1, 1]
+
+
+def test_parse_mix():
+    assert parse_mix('feed=3,comment=1') == {'feed': 3.0, 'comment': 1.0}
+    with pytest.raises(CommandError):
+        parse_mix('feed=3,delete=1')
+    with pytest.raises(CommandError):
+        parse_mix('feed')
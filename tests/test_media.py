@@ -0,0 +1,140 @@
+import os
+import time
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+from blog.models import Post
+from core.models import MediaFile
+from core.storage import is_hashed_name
+
+
+@pytest.mark.django_db
+def test_identical_uploads_deduplicated(media_root):
+    first = default_storage.save('blog_images/a.jpg', ContentFile(b'photo'))
+    second = default_storage.save('blog_images/b.JPG', ContentFile(b'photo'))
+    other = default_storage.save('blog_images/c.jpg', ContentFile(b'other'))
+    assert first == second != other
+    assert is_hashed_name(first), (
+        'Убедитесь, что файлы называются по хешу содержимого '
+        'и раскладываются по вложенным каталогам.'
+    )
+    assert first.startswith('blog_images/') and first.endswith('.jpg')
+    assert MediaFile.objects.filter(name=first).count() == 1
+
+
+@pytest.mark.django_db
+def test_migrate_media(media_root, mixer, user):
+    post = mixer.blend('blog.Post', author=user, image='')
+    legacy = media_root / 'blog_images' / 'legacy.gif'
+    legacy.parent.mkdir()
+    legacy.write_bytes(b'GIF89a legacy')
+    Post.objects.filter(pk=post.pk).update(image='blog_images/legacy.gif')
+
+    call_command('migrate_media', dry_run=True)
+    assert legacy.exists()
+
+    call_command('migrate_media')
+    post.refresh_from_db()
+    assert is_hashed_name(post.image.name)
+    assert not legacy.exists()
+    assert (media_root / post.image.name).read_bytes() == b'GIF89a legacy'
+
+
+@pytest.fixture
+def stored_file(media_root):
+    return default_storage.save(
+        'blog_images/file.jpg', ContentFile(b'0123456789'))
+
+
+@pytest.mark.django_db
+def test_serve_media_full(client, stored_file):
+    response = client.get(f'/media/{stored_file}')
+    assert response.status_code == 200
+    assert b''.join(response.streaming_content) == b'0123456789'
+    assert response['Content-Length'] == '10'
+    assert response['Content-Type'] == 'image/jpeg'
+    assert 'immutable' in response['Cache-Control']
+    assert response['Accept-Ranges'] == 'bytes'
+
+    response = client.get(
+        f'/media/{stored_file}', HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(('header', 'body', 'content_range'), [
+    ('bytes=2-5', b'2345', 'bytes 2-5/10'),
+    ('bytes=7-', b'789', 'bytes 7-9/10'),
+    ('bytes=-2', b'89', 'bytes 8-9/10'),
+])
+def test_serve_media_range(client, stored_file, header, body, content_range):
+    response = client.get(f'/media/{stored_file}', HTTP_RANGE=header)
+    assert response.status_code == 206
+    assert b''.join(response.streaming_content) == body
+    assert response['Content-Range'] == content_range
+
+
+@pytest.mark.django_db
+def test_serve_media_errors(client, stored_file):
+    response = client.get(f'/media/{stored_file}', HTTP_RANGE='bytes=20-')
+    assert response.status_code == 416
+    assert client.get('/media/../manage.py').status_code == 404
+    assert client.get('/media/blog_images/missing.jpg').status_code == 404
+
+
+@pytest.mark.django_db
+def test_serve_media_sendfile(client, stored_file, settings):
+    settings.MEDIA_SENDFILE = 'x-accel-redirect'
+    response = client.get(f'/media/{stored_file}')
+    assert response['X-Accel-Redirect'] == f'/protected-media/{stored_file}'
+    assert response.content == b''
+
+
+@pytest.mark.django_db
+def test_serve_media_sendfile_quotes_legacy_names(
+        client, media_root, settings):
+    settings.MEDIA_SENDFILE = 'x-accel-redirect'
+    (media_root / 'blog_images').mkdir()
+    (media_root / 'blog_images' / 'моё фото.jpg').write_bytes(b'photo')
+    response = client.get('/media/blog_images/моё фото.jpg')
+    assert response['X-Accel-Redirect'] == (
+        '/protected-media/blog_images/'
+        '%D0%BC%D0%BE%D1%91%20%D1%84%D0%BE%D1%82%D0%BE.jpg'
+    ), 'Имя файла в заголовке должно быть закодировано.'
+
+
+@pytest.mark.django_db
+def test_hidden_post_image(client, user_client, mixer, user, stored_file):
+    mixer.blend(
+        'blog.Post', author=user, is_published=False, image=stored_file)
+    assert client.get(f'/media/{stored_file}').status_code == 404
+    assert user_client.get(f'/media/{stored_file}').status_code == 200
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('bloom', [False, True])
+def test_gc_media(media_root, mixer, user, bloom):
+    kept = default_storage.save('blog_images/kept.jpg', ContentFile(b'kept'))
+    mixer.blend('blog.Post', author=user, image=kept)
+    orphan = default_storage.save('blog_images/old.jpg', ContentFile(b'old'))
+    fresh = default_storage.save('blog_images/new.jpg', ContentFile(b'new'))
+    past = time.time() - 48 * 3600
+    for name in (kept, orphan):
+        os.utime(media_root / name, (past, past))
+
+    call_command('gc_media', dry_run=True, bloom=bloom, rate=0)
+    assert default_storage.exists(orphan)
+
+    call_command('gc_media', bloom=bloom, rate=0)
+    assert default_storage.exists(kept)
+    assert default_storage.exists(fresh), (
+        'Убедитесь, что недавно загруженные файлы не удаляются.'
+    )
+    assert not default_storage.exists(orphan), (
+        'Убедитесь, что файлы без ссылок на них удаляются.'
+    )
+    assert not MediaFile.objects.filter(name=orphan).exists()
+    assert not (media_root / orphan).parent.exists()
@@ -0,0 +1,74 @@
+import logging
+import re
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from core import memory
+from core.metrics import registry
+
+
+def count(text: str) -> float:
+    match = re.search(
+        r'^http_request_memory_peak_bytes_count'
+        r'\{route="blog:post_detail"\} (\S+)$', text, re.M)
+    return float(match.group(1)) if match else 0
+
+
+def allocate(kib: int):
+    return [bytes(1024) for _ in range(kib)]
+
+
+def test_tracing_reports_peak_and_sites(settings):
+    settings.MEMORY_PROFILE_FRAMES = 5
+    # The tests are project code for the site and its caller.
+    settings.BASE_DIR = Path(__file__).resolve().parent.parent
+    with memory.Tracing() as result:
+        allocate(4000)
+        kept = allocate(1000)
+    assert not tracemalloc.is_tracing()
+    assert result.peak >= 4000 * 1024, (
+        'Пиковый объём должен учитывать освобождённые в блоке данные.'
+    )
+    assert 1000 * 1024 <= result.retained < 2000 * 1024
+    site = result.top(1)[0]
+    assert site['site'].startswith('tests/test_memory.py:'), site
+    assert site['caller'] == site['site']
+    assert site['size_kib'] >= 1000
+    del kept
+
+
+def test_snapshot_skipped_below_threshold():
+    with memory.Tracing(snapshot_above=1024 ** 3) as result:
+        allocate(100)
+    assert result.peak >= 100 * 1024
+    assert result.snapshot is None, (
+        'Снимок памяти не нужен запросам с небольшим пиком.'
+    )
+    assert result.top(5) == []
+
+
+@pytest.mark.django_db
+def test_middleware_logs_large_requests(
+        client, settings, caplog, post_with_published_location):
+    settings.MEMORY_PROFILE_SAMPLE_RATE = 1
+    settings.MEMORY_PROFILE_LOG_KIB = 0
+    before = registry.render()
+    with caplog.at_level(logging.WARNING, logger='core.memory'):
+        response = client.get(f'/posts/{post_with_published_location.pk}/')
+    assert response.status_code == 200
+    assert not tracemalloc.is_tracing()
+    assert 'blog:post_detail' in caplog.text, (
+        'Запрос с большим пиком памяти должен попадать в журнал.'
+    )
+    assert count(registry.render()) == count(before) + 1
+
+
+@pytest.mark.django_db
+def test_middleware_off_by_default(
+        client, caplog, post_with_published_location):
+    post = post_with_published_location
+    with caplog.at_level(logging.WARNING, logger='core.memory'):
+        client.get(f'/posts/{post.pk}/')
+    assert not caplog.records
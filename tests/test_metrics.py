@@ -0,0 +1,89 @@
+import re
+
+import pytest
+
+from blog.models import ImageJob
+from core.metrics import Registry
+
+
+@pytest.fixture
+def metrics_file(settings, tmp_path):
+    settings.METRICS_FILE = tmp_path / 'metrics.json'
+    settings.METRICS_TOKEN = 'secret'
+    return settings.METRICS_FILE
+
+
+def sample(text, name):
+    match = re.search(rf'^{re.escape(name)} (\S+)$', text, re.M)
+    assert match, f'Метрика `{name}` не найдена:\n{text}'
+    return float(match.group(1))
+
+
+def test_histogram_buckets_are_cumulative(metrics_file):
+    registry = Registry()
+    latency = registry.histogram(
+        'latency_seconds', 'Latency.', ('route',), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 2):
+        latency.observe(value, route='blog:index')
+    text = registry.render()
+    assert '# TYPE latency_seconds histogram' in text
+    labels = 'route="blog:index"'
+    assert sample(text, f'latency_seconds_bucket{{{labels},le="0.1"}}') == 1
+    assert sample(text, f'latency_seconds_bucket{{{labels},le="1"}}') == 2
+    assert sample(text, f'latency_seconds_bucket{{{labels},le="+Inf"}}') == 3
+    assert sample(text, f'latency_seconds_count{{{labels}}}') == 3
+    assert sample(text, f'latency_seconds_sum{{{labels}}}') == 2.55
+
+
+def test_processes_merged_through_file(metrics_file):
+    first, second = Registry(), Registry()
+    for registry in (first, second):
+        registry.counter('jobs_total', 'Jobs.').inc(2)
+        registry.flush()
+    first.counter('jobs_total', 'Jobs.').inc()
+    assert sample(second.render(), 'jobs_total') == 4
+    assert sample(first.render(), 'jobs_total') == 5
+
+
+def test_labels_checked(metrics_file):
+    counter = Registry().counter('hits_total', 'Hits.', ('route',))
+    with pytest.raises(ValueError):
+        counter.inc(path='/')
+
+
+@pytest.mark.django_db
+def test_endpoint_requires_token_or_staff(client, admin_client, metrics_file):
+    assert client.get('/metrics').status_code == 403
+    assert client.get(
+        '/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code == 403
+    response = client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    assert admin_client.get('/metrics').status_code == 200
+
+
+@pytest.mark.django_db
+def test_requests_counted_per_route(client, metrics_file):
+    client.get('/pages/about/')
+    client.get('/pages/about/')
+    client.get('/no-such-page/')
+    text = client.get(
+        '/metrics', HTTP_AUTHORIZATION='Bearer secret').content.decode()
+    assert sample(
+        text, 'http_requests_total{route="pages:about",method="GET",'
+        'status="200"}') == 2
+    assert sample(
+        text, 'http_request_duration_seconds_count{route="unmatched",'
+        'status="404"}') == 1
+    assert sample(text, 'db_queries_total{alias="default"}') > 0
+
+
+@pytest.mark.django_db
+def test_queue_gauges(client, metrics_file, post_with_published_location):
+    ImageJob.objects.create(post=post_with_published_location)
+    pending = ImageJob.objects.filter(status=ImageJob.PENDING).count()
+    text = client.get(
+        '/metrics', HTTP_AUTHORIZATION='Bearer secret').content.decode()
+    assert sample(text, 'blog_image_jobs{status="pending"}') == pending
+    assert sample(text, 'tasks{status="queued"}') == 0
+    assert sample(text, 'outbox_emails{status="queued"}') == 0
@@ -0,0 +1,62 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.template import Context, Template
+from django.test import RequestFactory
+
+from blog import async_views
+from blog.models import Post
+from conftest import N_PER_PAGE
+from core.nplusone import NPlusOneError, detect
+
+
+@pytest.mark.django_db
+def test_repeated_queries_detected(
+        nplusone, many_posts_with_published_locations):
+    with pytest.raises(NPlusOneError):
+        with detect():
+            for post in Post.objects.all():
+                post.author.username
+    with detect() as tracker:
+        for post in Post.objects.select_related('author'):
+            post.author.username
+    assert not tracker.repeats()
+
+
+@pytest.mark.django_db
+def test_template_line_reported(
+        caplog, many_posts_with_published_locations):
+    template = Template(
+        '{% for post in posts %}{{ post.author.username }}{% endfor %}')
+    with detect():
+        template.render(Context({'posts': Post.objects.all()}))
+    assert 'N+1 queries' in caplog.text
+    assert f'{N_PER_PAGE * 2} x <unknown source>:1' in caplog.text
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', (
+    '/',
+    '/category/{category}/',
+    '/profile/{username}/',
+    '/posts/{post}/',
+))
+def test_pages_without_repeated_queries(
+        nplusone, mixer, user_client, user,
+        many_posts_with_published_locations, url):
+    post = many_posts_with_published_locations[0]
+    mixer.cycle(5).blend('blog.Comment', post=post)
+    response = user_client.get(url.format(
+        category=post.category.slug, username=user.username, post=post.pk))
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_profile_without_repeated_queries(
+        nplusone, user, many_posts_with_published_locations):
+    view = async_views.ByProfileListView.as_view()
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+    with detect():
+        response = async_to_sync(view)(request, username=user.username)
+    assert response.status_code == 200
@@ -0,0 +1,108 @@
+import gzip
+import os
+import time
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.utils import timezone
+
+from core.mail import rotate_email_files
+from core.models import OutgoingEmail, Task
+from core.tasks import run_due
+
+
+class FailingBackend(BaseEmailBackend):
+
+    def send_messages(self, email_messages):
+        raise ConnectionError('SMTP недоступен')
+
+
+@pytest.fixture
+def outbox(settings):
+    settings.EMAIL_BACKEND = 'core.mail.OutboxBackend'
+    settings.OUTBOX_EMAIL_BACKEND = (
+        'django.core.mail.backends.locmem.EmailBackend')
+
+
+@pytest.mark.django_db
+def test_password_reset_only_queues_message(outbox, client, user):
+    user.email = 'reader@example.com'
+    user.save()
+    response = client.post(
+        '/auth/password_reset/', {'email': user.email})
+    assert response.status_code == 302
+    assert mail.outbox == [], 'Письмо не должно отправляться в запросе'
+    queued = OutgoingEmail.objects.get()
+    assert queued.recipients == [user.email]
+    assert queued.status == OutgoingEmail.QUEUED
+
+    call_command('run_workers', '--once')
+    assert len(mail.outbox) == 1
+    delivered = mail.outbox[0].message()
+    assert delivered['To'] == user.email
+    assert delivered['Message-ID'] in bytes(queued.raw).decode()
+    queued.refresh_from_db()
+    assert queued.status == OutgoingEmail.SENT
+
+
+@pytest.mark.django_db
+def test_bcc_kept_out_of_headers(outbox):
+    mail.EmailMessage(
+        'Тема', 'Текст', 'blog@example.com', ['a@example.com'],
+        bcc=['hidden@example.com']).send()
+    run_due()
+    assert mail.outbox[0].recipients() == [
+        'a@example.com', 'hidden@example.com']
+    assert 'hidden@example.com' not in mail.outbox[0].message().as_string()
+
+
+@pytest.mark.django_db
+def test_batch_shares_one_file(outbox, settings, tmp_path):
+    settings.OUTBOX_EMAIL_BACKEND = (
+        'django.core.mail.backends.filebased.EmailBackend')
+    settings.EMAIL_FILE_PATH = tmp_path
+    mail.send_mass_mail([
+        (f'Письмо {number}', 'Текст', None, ['a@example.com'])
+        for number in range(3)
+    ])
+    assert Task.objects.count() == 1, 'Пакет писем должен быть одной задачей'
+    assert run_due() == 1
+    files = list(tmp_path.iterdir())
+    assert len(files) == 1
+    assert files[0].read_bytes().count(b'Message-ID') == 3
+    assert OutgoingEmail.objects.filter(
+        status=OutgoingEmail.SENT).count() == 3
+
+
+@pytest.mark.django_db
+def test_failed_delivery_retried_later(outbox, settings):
+    settings.OUTBOX_EMAIL_BACKEND = 'test_outbox.FailingBackend'
+    mail.send_mail('Тема', 'Текст', None, ['a@example.com'])
+    assert run_due() == 1
+    queued = OutgoingEmail.objects.get()
+    assert queued.status == OutgoingEmail.QUEUED
+    assert queued.attempts == 1
+    assert 'SMTP' in queued.error
+    retry = Task.objects.get()
+    assert retry.status == Task.QUEUED
+    assert retry.run_at > timezone.now()
+    assert run_due() == 0, 'Повтор должен ждать паузы'
+
+
+def test_rotate_email_files(tmp_path):
+    day = 24 * 3600
+    fresh = tmp_path / 'fresh.log'
+    old = tmp_path / 'old.log'
+    expired = tmp_path / 'expired.log.gz'
+    for path, age in ((fresh, 0), (old, 2 * day), (expired, 40 * day)):
+        path.write_bytes(b'Subject: test\n')
+        os.utime(path, (time.time() - age, time.time() - age))
+    assert rotate_email_files(
+        tmp_path, timedelta(days=1), timedelta(days=30)) == (1, 1)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        'fresh.log', 'old.log.gz']
+    assert gzip.decompress(
+        (tmp_path / 'old.log.gz').read_bytes()) == b'Subject: test\n'
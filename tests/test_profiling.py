@@ -0,0 +1,72 @@
+import re
+import time
+
+import pytest
+
+from core.models import Profile
+from core.profiling import Profiling, make_token, stacks_path
+
+STACK_LINE_RE = re.compile(r'^\S.* \d+$')
+
+
+@pytest.fixture
+def profile_settings(settings, tmp_path):
+    settings.PROFILE_DIR = tmp_path
+    settings.PROFILE_SAMPLE_INTERVAL = 0.0005
+    return settings
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_sampler_collapses_stacks(profile_settings):
+    with Profiling(Profile.SAMPLE, None) as result:
+        busy(0.05)
+    assert result.samples > 0
+    text = result.collapsed()
+    assert all(STACK_LINE_RE.match(line) for line in text.splitlines())
+    assert 'busy (' in text
+    assert result.top and {'function', 'self_ms', 'total_ms'} <= set(
+        result.top[0])
+
+
+@pytest.mark.django_db
+def test_staff_flag_profiles_post_detail(
+        admin_client, profile_settings, post_with_published_location):
+    url = f'/posts/{post_with_published_location.pk}/'
+    response = admin_client.get(url, {'_profile': 'cprofile'})
+    assert response.status_code == 200
+    profile = Profile.objects.get()
+    assert profile.view == 'blog:post_detail'
+    assert profile.mode == Profile.CPROFILE
+    assert profile.top and profile.top[0]['calls']
+    with open(stacks_path(profile), encoding='utf-8') as fh:
+        assert all(STACK_LINE_RE.match(line) for line in fh)
+
+    change = admin_client.get(f'/admin/core/profile/{profile.pk}/change/')
+    assert change.status_code == 200
+    stacks = admin_client.get(f'/admin/core/profile/{profile.pk}/stacks/')
+    assert stacks.status_code == 200
+
+
+@pytest.mark.django_db
+def test_flag_ignored_for_other_users(
+        user_client, profile_settings, post_with_published_location):
+    user_client.get(
+        f'/posts/{post_with_published_location.pk}/', {'_profile': '1'})
+    assert not Profile.objects.exists(), (
+        'Профилировать запросы могут только сотрудники.'
+    )
+
+
+@pytest.mark.django_db
+def test_signed_header(client, admin_user, profile_settings):
+    client.get('/pages/about/', HTTP_X_PROFILE='forged')
+    assert not Profile.objects.exists()
+    client.get('/pages/about/', HTTP_X_PROFILE=make_token(admin_user))
+    profile = Profile.objects.get()
+    assert profile.user == admin_user
+    assert profile.mode == Profile.SAMPLE
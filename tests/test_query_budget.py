@@ -0,0 +1,50 @@
+import pytest
+from django.test import Client
+from django.urls import reverse
+
+from blog import urls as blog_urls
+from pages import urls as pages_urls
+
+ROUTES = [
+    (f'{module.app_name}:{pattern.name}', tuple(pattern.pattern.converters))
+    for module in (blog_urls, pages_urls)
+    for pattern in module.urlpatterns
+    if pattern.name
+]
+# Routes without a page of their own are measured on form submission.
+POST_DATA = {
+    'blog:add_comment': {'text': 'Новый комментарий'},
+}
+
+
+def url_arguments(dataset) -> dict:
+    """
+    Objects of the dataset owned by its first user, who makes the
+    requests, so the edit and delete pages open too.
+    """
+    author = dataset['users'][0]
+    post = next(
+        post for post in dataset['posts']
+        if post.author_id == author.pk and post.comments.exists())
+    return {
+        'pk': post.pk,
+        'comment_pk': post.comments.filter(author=author).first().pk,
+        'username': author.username,
+        'category_slug': dataset['categories'][0].slug,
+    }
+
+
+@pytest.mark.parametrize(
+    'route, arguments', ROUTES, ids=[route for route, _ in ROUTES])
+def test_query_budget(
+        route, arguments, budget_dataset, query_recorder, query_budget):
+    client = Client()
+    client.force_login(budget_dataset['users'][0])
+    values = url_arguments(budget_dataset)
+    url = reverse(route, kwargs={name: values[name] for name in arguments})
+    with query_recorder() as recording:
+        if route in POST_DATA:
+            response = client.post(url, POST_DATA[route])
+        else:
+            response = client.get(url)
+    query_budget.check(route, response.status_code, recording)
@@ -0,0 +1,65 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+
+from blog import async_views, views
+from blog.models import Post, PostImage
+from blog.rows import PostRow, post_rows
+
+
+def render(view_class, path):
+    request = RequestFactory().get(path)
+    request.user = AnonymousUser()
+    view = view_class.as_view()
+    if view_class is async_views.BlogListView:
+        return async_to_sync(view)(request).content
+    return view(request).render().content
+
+
+@pytest.fixture
+def feed(budget_dataset):
+    post = budget_dataset['posts'][1]
+    Post.objects.filter(pk=post.pk).update(image='blog_images/a.jpg')
+    PostImage.objects.create(
+        post=post, source='blog_images/a.jpg', width=800, height=600,
+        color='#336699', renditions=[
+            {'name': 'renditions/a-480.jpg', 'width': 480, 'height': 360,
+             'format': 'jpg'},
+            {'name': 'renditions/a-480.webp', 'width': 480, 'height': 360,
+             'format': 'webp'},
+        ])
+    return budget_dataset
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('view_class', [
+    views.BlogListView, async_views.BlogListView])
+@pytest.mark.parametrize('path', ['/', '/?page=2', '/?page=last'])
+def test_rows_render_like_models(feed, settings, view_class, path):
+    settings.BLOG_FEED_ROWS = False
+    expected = render(view_class, path)
+    settings.BLOG_FEED_ROWS = True
+    assert render(view_class, path) == expected, (
+        'Лента из строк `PostRow` должна выглядеть так же, как из моделей.'
+    )
+    if path == '/':
+        assert b'renditions/a-480.webp' in expected
+
+
+@pytest.mark.django_db
+def test_rows_have_card_attributes(feed):
+    queryset = views.BlogListView().get_queryset()
+    rows = list(post_rows(queryset[:20]))
+    posts = list(queryset[:20])
+    assert all(isinstance(row, PostRow) for row in rows)
+    assert [row.pk for row in rows] == [post.pk for post in posts]
+    for row, post in zip(rows, posts):
+        assert row.author.username == post.author.username
+        assert str(row.author) == str(post.author)
+        assert row.category.slug == post.category.slug
+        assert row.comment_count == post.comment_count
+        assert (row.location is None) == (post.location is None)
+        assert bool(row.image) == bool(post.image)
+    with pytest.raises(AttributeError):
+        rows[0].extra = 1
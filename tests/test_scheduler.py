@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from core import scheduler
+from core.models import Lease, ScheduledJob
+
+LEASE = timedelta(seconds=30)
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    monkeypatch.setattr(scheduler, 'registry', {})
+    calls = []
+
+    @scheduler.periodic(timedelta(minutes=5), name='tick')
+    def tick():
+        calls.append('tick')
+
+    @scheduler.periodic(timedelta(hours=1), name='broken')
+    def broken():
+        raise RuntimeError('Сбой задания')
+
+    scheduler.sync_jobs()
+    return calls
+
+
+@pytest.mark.django_db
+def test_only_one_holder_gets_lease():
+    assert scheduler.acquire_lease('scheduler', 'node-a', LEASE)
+    assert not scheduler.acquire_lease('scheduler', 'node-b', LEASE)
+    assert scheduler.acquire_lease('scheduler', 'node-a', LEASE), (
+        'Владелец должен продлевать блокировку')
+    Lease.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+    assert scheduler.acquire_lease('scheduler', 'node-b', LEASE)
+    assert Lease.objects.get().holder == 'node-b'
+
+
+@pytest.mark.django_db
+def test_leader_runs_due_jobs_once(jobs):
+    assert scheduler.run_due_jobs('node-a', LEASE) == 2
+    assert jobs == ['tick']
+    assert scheduler.run_due_jobs('node-b', LEASE) == 0, (
+        'Задания должен выполнять только лидер')
+    assert scheduler.run_due_jobs('node-a', LEASE) == 0, (
+        'Задание не должно запускаться раньше интервала')
+    tick = ScheduledJob.objects.get(name='tick')
+    assert tick.runs == 1 and tick.failures == 0
+    assert tick.next_run_at > timezone.now() + timedelta(minutes=4)
+
+
+@pytest.mark.django_db
+def test_failure_recorded(jobs):
+    scheduler.run_due_jobs('node-a', LEASE)
+    broken = ScheduledJob.objects.get(name='broken')
+    assert broken.runs == 1 and broken.failures == 1
+    assert 'Сбой задания' in broken.last_error
+
+
+@pytest.mark.django_db
+def test_release_hands_over_leadership():
+    scheduler.acquire_lease('scheduler', 'node-a', LEASE)
+    scheduler.release_lease('scheduler', 'node-a')
+    assert scheduler.acquire_lease('scheduler', 'node-b', LEASE)
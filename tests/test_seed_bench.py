@@ -0,0 +1,71 @@
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+
+from blog.models import Comment, ImageJob, Location, Post, PostImage
+from core.models import Profile
+
+OPTIONS = (
+    '--users=5', '--categories=3', '--locations=4', '--posts=60',
+    '--comments=300', '--future=0.1', '--today=2026-10-19', '--seed=7')
+
+
+def seed(*args):
+    call_command('seed_bench', *OPTIONS, *args, stdout=StringIO())
+    return (
+        list(Post.objects.order_by('pk').values_list(
+            'title', 'pub_date', 'author__username', 'category__slug',
+            'is_published')),
+        list(Comment.objects.order_by('pk').values_list(
+            'post__title', 'author__username', 'text', 'created_at')),
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_seed_is_deterministic():
+    posts, comments = seed()
+    assert len(posts) == 60
+    assert len(comments) == 300
+    assert seed('--clear') == (posts, comments), (
+        'Один и тот же seed должен давать те же данные.'
+    )
+    assert Location.objects.count() == 4, (
+        'Очистка должна удалять и созданные местоположения.'
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_seed_distributions():
+    seed()
+    assert Post.objects.filter(pub_date__date__gt='2026-10-19').exists()
+    per_post = sorted(
+        (post.comments.count() for post in Post.objects.all()),
+        reverse=True)
+    assert per_post[0] > 3 * (300 / 60), (
+        'Комментарии должны распределяться неравномерно.'
+    )
+    for comment in Comment.objects.select_related('post')[:50]:
+        assert comment.created_at >= comment.post.created_at
+
+
+@pytest.mark.django_db(transaction=True)
+def test_clear_with_dependent_rows(mixer, post_with_published_location):
+    post = post_with_published_location
+    generated = seed()
+    bench_post = Post.objects.filter(author__username__startswith='bench_')[0]
+    author = bench_post.author
+    mixer.blend(PostImage, post=bench_post)
+    mixer.blend(ImageJob, post=bench_post)
+    mixer.blend(Profile, user=author)
+    mixer.blend(Comment, post=post, author=author)
+    Group.objects.create(name='Авторы').user_set.add(author)
+    assert seed('--clear') == generated
+    assert not PostImage.objects.filter(post=bench_post.pk).exists()
+    assert not ImageJob.objects.filter(post=bench_post.pk).exists()
+    assert not Comment.objects.filter(post=post).exists(), (
+        'Очистка должна удалять и строки, ссылающиеся на данные бенчмарка.'
+    )
+    assert Profile.objects.get().user is None
+    assert not Group.objects.get().user_set.exists()
@@ -0,0 +1,69 @@
+import json
+import logging
+import re
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+
+from blog import async_views
+from core.middleware import ServerTimingMiddleware
+
+TIMING_RE = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+@pytest.fixture(autouse=True)
+def measure_all(settings):
+    settings.SERVER_TIMING_SAMPLE_RATE = 1
+
+
+def parse(header):
+    return {
+        item.split(';')[0]: float(re.search(r'dur=([\d.]+)', item).group(1))
+        for item in header.split(', ')
+    }
+
+
+@pytest.mark.django_db
+def test_server_timing_header(client, post_with_published_location):
+    response = client.get('/')
+    header = response['Server-Timing']
+    metrics = parse(header)
+    assert {'db', 'tpl', 'total'} <= set(metrics)
+    assert int(TIMING_RE.search(header).group(1)) >= 2
+    assert metrics['total'] >= metrics['tpl']
+
+
+@pytest.mark.django_db
+def test_unsampled_requests_not_measured(client, settings):
+    settings.SERVER_TIMING_SAMPLE_RATE = 0
+    assert not client.get('/').has_header('Server-Timing')
+
+
+@pytest.mark.django_db
+def test_timing_logged_as_json(client, settings, caplog):
+    settings.SERVER_TIMING_LOG = True
+    with caplog.at_level(logging.INFO, logger='core.timing'):
+        client.get('/pages/about/')
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record['path'] == '/pages/about/'
+    assert record['status'] == 200
+    assert {'total_ms', 'db_ms', 'db_queries'} <= set(record)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_view_queries_counted(post_with_published_location):
+    view = async_views.PostDetailView.as_view()
+
+    async def get_response(request):
+        return await view(request, pk=post_with_published_location.pk)
+
+    middleware = ServerTimingMiddleware(get_response)
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+    response = async_to_sync(middleware)(request)
+    header = response['Server-Timing']
+    assert int(TIMING_RE.search(header).group(1)) >= 2, (
+        'Запросы из пула потоков должны учитываться')
+    assert 'tpl' in parse(header)
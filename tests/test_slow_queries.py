@@ -0,0 +1,82 @@
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+
+from core import slow_queries
+
+
+@pytest.fixture
+def slow_log(settings, tmp_path):
+    settings.SLOW_QUERY_THRESHOLD_MS = 0
+    settings.SLOW_QUERY_LOG_FILE = tmp_path / 'slow.log'
+    slow_queries._last_explained.clear()
+    return settings.SLOW_QUERY_LOG_FILE
+
+
+def read(path):
+    slow_queries.flush()
+    with open(path, encoding='utf-8') as fh:
+        return [json.loads(line) for line in fh]
+
+
+def test_normalize():
+    assert slow_queries.normalize(
+        "SELECT * FROM t WHERE id IN (%s, %s, %s) AND a = 'x''y' LIMIT 21"
+    ) == 'SELECT * FROM t WHERE id IN (...) AND a = ? LIMIT ?'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_slow_queries_logged_with_view_and_plan(client, slow_log):
+    client.get('/')
+    entries = read(slow_log)
+    assert entries, 'Медленные запросы должны попадать в журнал'
+    index_entries = [
+        entry for entry in entries if entry['view'] == 'blog:index']
+    assert index_entries
+    entry = index_entries[0]
+    assert {'sql', 'fingerprint', 'params_fingerprint', 'duration_ms'} <= (
+        set(entry))
+    assert 'blog_post' in entry['sql']
+    assert entry.get('plan'), 'Для SELECT должен сохраняться план запроса'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_plan_captured_once_per_statement(client, slow_log):
+    client.get('/')
+    client.get('/')
+    entries = read(slow_log)
+    by_statement = {}
+    for entry in entries:
+        by_statement.setdefault(entry['fingerprint'], []).append(entry)
+    repeated = [group for group in by_statement.values() if len(group) > 1]
+    assert repeated
+    for group in repeated:
+        assert sum('plan' in entry for entry in group) <= 1
+
+
+def test_command_aggregates_top_offenders(tmp_path):
+    path = tmp_path / 'slow.log'
+    lines = [
+        {'time': '2026-01-01T00:00:00+00:00', 'view': 'blog:index',
+         'alias': 'default', 'duration_ms': 120, 'fingerprint': 'aaa',
+         'sql': 'SELECT a', 'params_fingerprint': 'p1', 'plan': 'SCAN a'},
+        {'time': '2026-01-01T00:00:01+00:00', 'view': 'blog:index',
+         'alias': 'default', 'duration_ms': 180, 'fingerprint': 'aaa',
+         'sql': 'SELECT a', 'params_fingerprint': 'p2'},
+        {'time': '2026-01-01T00:00:02+00:00', 'view': 'blog:profile',
+         'alias': 'default', 'duration_ms': 250, 'fingerprint': 'bbb',
+         'sql': 'SELECT b', 'params_fingerprint': 'p1'},
+    ]
+    path.write_text('\n'.join(json.dumps(line) for line in lines) + '\n')
+    out = io.StringIO()
+    call_command('slow_queries', file=str(path), stdout=out)
+    output = out.getvalue()
+    assert output.index('aaa') < output.index('bbb')
+    assert '2 times, total 300 ms' in output
+    assert '2 distinct params' in output
+    assert '| SCAN a' in output
+    out = io.StringIO()
+    call_command('slow_queries', file=str(path), sort='max', stdout=out)
+    assert out.getvalue().index('bbb') < out.getvalue().index('aaa')
@@ -0,0 +1,172 @@
+import asyncio
+import gzip
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+
+from core.css import purge, template_classes
+from core.static import ASGIStaticFilesMiddleware, StaticFilesMiddleware
+
+
+@pytest.fixture(scope='module')
+def static_root(tmp_path_factory):
+    return tmp_path_factory.mktemp('static')
+
+
+@pytest.fixture
+def collected(settings, static_root):
+    settings.STATIC_ROOT = static_root
+    if not (static_root / 'staticfiles.json').exists():
+        call_command('collectstatic', interactive=False, verbosity=0)
+    with open(static_root / 'staticfiles.json', encoding='utf-8') as fh:
+        return json.load(fh)['paths']
+
+
+def fallback_app(environ, start_response):
+    start_response('404 Not Found', [])
+    return [b'django']
+
+
+def call(middleware, path, **environ):
+    result = {}
+
+    def start_response(status, headers):
+        result['status'] = status
+        result['headers'] = dict(headers)
+
+    environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET', **environ}
+    body = b''.join(middleware(environ, start_response))
+    return result['status'], result['headers'], body
+
+
+def test_collectstatic_hashes_and_compresses(collected, static_root):
+    hashed = collected['css/bootstrap.min.css']
+    assert hashed != 'css/bootstrap.min.css', (
+        'Убедитесь, что collectstatic сохраняет файлы под хешированными '
+        'именами.'
+    )
+    original = (static_root / hashed).read_bytes()
+    compressed = (static_root / (hashed + '.gz')).read_bytes()
+    assert gzip.decompress(compressed) == original
+    assert len(compressed) < len(original)
+
+
+def test_middleware_negotiates_encoding(collected, static_root):
+    middleware = StaticFilesMiddleware(fallback_app, static_root, '/static/')
+    path = '/static/' + collected['css/bootstrap.min.css']
+
+    status, headers, body = call(
+        middleware, path, HTTP_ACCEPT_ENCODING='gzip, deflate')
+    assert status == '200 OK'
+    assert headers['Content-Encoding'] == 'gzip'
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert 'immutable' in headers['Cache-Control']
+    assert gzip.GzipFile(fileobj=io.BytesIO(body)).read()
+
+    status, headers, body = call(
+        middleware, path, HTTP_ACCEPT_ENCODING='gzip;q=0')
+    assert 'Content-Encoding' not in headers
+    assert int(headers['Content-Length']) == len(body)
+
+    status, _, _ = call(middleware, path, HTTP_IF_NONE_MATCH=headers['ETag'])
+    assert status == '304 Not Modified'
+
+    status, headers, _ = call(middleware, '/static/css/bootstrap.min.css')
+    assert 'immutable' not in headers['Cache-Control']
+
+    assert call(middleware, '/static/missing.css')[2] == b'django'
+    assert call(middleware, '/posts/1/')[2] == b'django'
+
+
+async def fallback_asgi(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': 404, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b'django'})
+
+
+def call_asgi(middleware, path, method='GET', **headers):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        'type': 'http', 'path': path, 'method': method,
+        'headers': [
+            (name.encode(), value.encode()) for name, value in headers.items()
+        ],
+    }
+    asyncio.run(middleware(scope, None, send))
+    start, *body = messages
+    assert not body[-1].get('more_body')
+    return (
+        start['status'],
+        {name.decode(): value.decode() for name, value in start['headers']},
+        b''.join(message['body'] for message in body),
+    )
+
+
+def test_asgi_middleware_serves_static(collected, static_root):
+    middleware = ASGIStaticFilesMiddleware(
+        fallback_asgi, static_root, '/static/')
+    path = '/static/' + collected['css/bootstrap.min.css']
+    original = (static_root / collected['css/bootstrap.min.css']).read_bytes()
+
+    status, headers, body = call_asgi(
+        middleware, path, **{'accept-encoding': 'br;q=0, gzip'})
+    assert status == 200, (
+        'Убедитесь, что под ASGI статические файлы тоже отдаются '
+        'до Django.'
+    )
+    assert headers['content-encoding'] == 'gzip'
+    assert gzip.decompress(body) == original
+
+    status, headers, body = call_asgi(middleware, path)
+    assert body == original
+    assert int(headers['content-length']) == len(original)
+
+    status, _, body = call_asgi(
+        middleware, path, **{'if-none-match': headers['etag']})
+    assert (status, body) == (304, b'')
+    assert call_asgi(middleware, path, 'HEAD')[2] == b''
+    assert call_asgi(middleware, path, 'POST')[0] == 405
+    assert call_asgi(middleware, '/static/missing.css')[2] == b'django'
+
+
+def test_purge_keeps_used_rules():
+    css = (
+        '@charset "UTF-8";/* banner */:root{--c:red}body{margin:0}'
+        '.card,.unused{padding:1rem}.card .card-body{margin:0}'
+        '.card:not(.unused)>a{color:red}.unused .card{color:blue}'
+        '@media (min-width:576px){.container{max-width:540px}'
+        '.unused{display:none}}@media print{.unused{display:none}}'
+        '@keyframes spin{to{transform:rotate(360deg)}}'
+    )
+    assert purge(css, {'card', 'card-body', 'container'}) == (
+        '@charset "UTF-8";:root{--c:red}body{margin:0}'
+        '.card{padding:1rem}.card .card-body{margin:0}'
+        '.card:not(.unused)>a{color:red}'
+        '@media (min-width:576px){.container{max-width:540px}}'
+        '@keyframes spin{to{transform:rotate(360deg)}}'
+    )
+
+
+def test_template_classes():
+    html = '<a class="btn {% if x %}active{% endif %} mb-2" class="">'
+    assert template_classes(html) == {'btn', 'active', 'mb-2'}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(('url', 'inlined'), (
+    ('/', True),
+    ('/auth/login/', False),
+    ('/pages/about/', False),
+))
+def test_critical_css_only_on_feed(client, url, inlined):
+    content = client.get(url).content.decode('utf-8')
+    assert ('<style>' in content) == inlined, (
+        'Критический CSS должен встраиваться только в страницы ленты.'
+    )
+    assert ('rel="preload"' in content) == inlined
+    assert 'blogicum.min.css' in content
@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from core.models import Task
+from core.tasks import claim, run_due, run_task, task
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task(name='tests.flaky', max_attempts=2)
+def flaky():
+    raise RuntimeError('Сбой')
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    calls.clear()
+
+
+@pytest.mark.django_db
+def test_defer_only_inserts_row():
+    task_row = record.defer('a')
+    assert calls == [], 'Задача не должна выполняться в запросе'
+    assert task_row.status == Task.QUEUED
+    assert task_row.name == 'test_tasks.record'
+    assert Task._meta.db_table == 'tasks'
+
+
+@pytest.mark.django_db
+def test_tasks_run_by_priority():
+    record.defer('low')
+    record.schedule(('high',), priority=10)
+    record.schedule(('later',), delay=timedelta(hours=1))
+    assert run_due() == 2
+    assert calls == ['high', 'low']
+    assert Task.objects.filter(status=Task.DONE).count() == 2
+    assert Task.objects.get(args=['later']).status == Task.QUEUED
+
+
+@pytest.mark.django_db
+def test_failed_task_retried_with_backoff_then_failed():
+    task_row = flaky.defer()
+    assert run_due() == 1
+    task_row.refresh_from_db()
+    assert task_row.status == Task.QUEUED
+    assert task_row.attempts == 1
+    assert task_row.run_at > timezone.now() + timedelta(seconds=4)
+    assert 'Сбой' in task_row.error
+
+    Task.objects.filter(pk=task_row.pk).update(run_at=timezone.now())
+    assert run_due() == 1
+    task_row.refresh_from_db()
+    assert task_row.status == Task.FAILED
+    assert task_row.attempts == 2
+
+
+@pytest.mark.django_db
+def test_expired_lease_is_claimed_again():
+    task_row = record.defer('again')
+    first = claim('dead-worker')
+    assert first.pk == task_row.pk
+    assert claim('other') is None, 'Задача уже занята'
+    Task.objects.filter(pk=task_row.pk).update(
+        locked_until=timezone.now() - timedelta(seconds=1))
+    second = claim('other')
+    assert second.pk == task_row.pk and second.attempts == 2
+    # A worker that lost its lease may not record an outcome.
+    run_task(first)
+    assert Task.objects.get(pk=task_row.pk).status == Task.RUNNING
+    assert run_task(second)
+    assert calls == ['again', 'again']
+    second.refresh_from_db()
+    assert second.status == Task.DONE and second.worker == 'other'
+
+
+@pytest.mark.django_db
+def test_unknown_task_fails():
+    Task.objects.create(name='tests.missing')
+    call_command('run_workers', '--once')
+    assert Task.objects.get().status == Task.FAILED